@@ -0,0 +1,245 @@
+"""
+In-process cache of article metadata in front of the article_cache table
+
+Feed pages used to join article_cache in Postgres on every read. Pages
+now carry only recommendation columns, and the article fields are
+hydrated from this cache: a dictionary lookup for the hot set of
+articles, with one batched article_cache query for the misses and one
+batched Dell news_articles query for articles article_cache lacks.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from async_database import dell_database_available, execute_query, get_db_cursor
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ArticleMetadata:
+    """Display fields of one article"""
+
+    __slots__ = ("title", "source", "url", "description", "published_at", "expires_at")
+
+    def __init__(
+        self,
+        title: str,
+        source: Optional[str],
+        url: Optional[str],
+        description: Optional[str],
+        published_at: Optional[datetime],
+        expires_at: float
+    ):
+        self.title = title
+        self.source = source
+        self.url = url
+        self.description = description
+        self.published_at = published_at
+        self.expires_at = expires_at
+
+
+class ArticleMetadataCache:
+    """LRU of ArticleMetadata keyed by article_id, with a TTL"""
+
+    def __init__(self, max_entries: int = 50_000, ttl_seconds: int = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[int, ArticleMetadata]" = OrderedDict()
+
+    def get_many(self, article_ids: Iterable[int]) -> Tuple[Dict[int, ArticleMetadata], List[int]]:
+        """Return (cached articles by id, ids that missed)"""
+        now = time.monotonic()
+        found, missing = {}, []
+        for article_id in dict.fromkeys(article_ids):
+            entry = self._entries.get(article_id)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    del self._entries[article_id]
+                missing.append(article_id)
+                continue
+            self._entries.move_to_end(article_id)
+            found[article_id] = entry
+
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def put(
+        self,
+        article_id: int,
+        title: str,
+        source: Optional[str],
+        url: Optional[str],
+        description: Optional[str],
+        published_at: Optional[datetime],
+        ttl_seconds: Optional[float] = None
+    ) -> ArticleMetadata:
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        entry = ArticleMetadata(title, source, url, description, published_at, time.monotonic() + ttl)
+        self._entries[article_id] = entry
+        self._entries.move_to_end(article_id)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        return entry
+
+    def invalidate(self, article_ids: Iterable[int]):
+        """Drop articles whose article_cache rows were rewritten"""
+        for article_id in article_ids:
+            self._entries.pop(article_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "articles": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+article_metadata_cache = ArticleMetadataCache(
+    max_entries=settings.ARTICLE_METADATA_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CACHE_TTL_SECONDS
+)
+
+
+# Rows expire after CACHE_TTL_SECONDS, the same TTL as the in-process cache
+ARTICLE_CACHE_UPSERT = """
+    INSERT INTO article_cache (article_id, title, source, url, published_at, description, expires_at)
+    SELECT s.*, NOW() + make_interval(secs => %s) FROM unnest(
+        %s::int[], %s::text[], %s::text[], %s::text[], %s::timestamptz[], %s::text[]
+    ) AS s
+    ON CONFLICT (article_id) DO UPDATE SET
+        title = EXCLUDED.title,
+        source = EXCLUDED.source,
+        url = EXCLUDED.url,
+        published_at = EXCLUDED.published_at,
+        description = EXCLUDED.description,
+        cached_at = NOW(),
+        expires_at = EXCLUDED.expires_at
+"""
+
+# Article loads in progress, shared by concurrent hydrations of the same IDs
+_in_flight: Dict[int, asyncio.Future] = {}
+
+
+async def upsert_article_cache(cursor, articles: Iterable[tuple]):
+    """Upsert (article_id, title, source, url, published_at, description) rows"""
+    # A repeated article in one statement would make ON CONFLICT DO UPDATE
+    # fail, and a fixed article order keeps concurrent writers from deadlocking
+    by_id = {article[0]: article for article in articles}
+    if not by_id:
+        return
+    ordered = [by_id[article_id] for article_id in sorted(by_id)]
+    await cursor.execute(
+        ARTICLE_CACHE_UPSERT, [settings.CACHE_TTL_SECONDS] + [list(c) for c in zip(*ordered)]
+    )
+
+
+async def hydrate_articles(article_ids: Iterable[int]) -> Dict[int, ArticleMetadata]:
+    """
+    Look up article metadata, reading through to article_cache and Dell
+
+    Cache misses are loaded with one article_cache query; articles missing
+    or expired there are fetched with one Dell news_articles query and
+    written back with one upsert. Concurrent calls share in-flight loads.
+
+    Args:
+        article_ids: Article IDs, in any order and possibly repeated
+
+    Returns:
+        Metadata by article_id; articles found nowhere are absent
+    """
+    found, missing = article_metadata_cache.get_many(article_ids)
+    if not missing:
+        return found
+
+    waiting = {}
+    mine = []
+    for article_id in missing:
+        if article_id in _in_flight:
+            waiting[article_id] = _in_flight[article_id]
+        else:
+            mine.append(article_id)
+
+    if mine:
+        future = asyncio.get_running_loop().create_future()
+        for article_id in mine:
+            _in_flight[article_id] = future
+        loaded = {}
+        try:
+            loaded = await _load_articles(mine)
+        except Exception as e:
+            logger.error(f"Error hydrating {len(mine)} articles: {e}")
+        finally:
+            for article_id in mine:
+                _in_flight.pop(article_id, None)
+            future.set_result(loaded)
+        found.update(loaded)
+
+    for article_id, future in waiting.items():
+        article = (await asyncio.shield(future)).get(article_id)
+        if article is not None:
+            found[article_id] = article
+
+    return found
+
+
+async def _load_articles(article_ids: List[int]) -> Dict[int, ArticleMetadata]:
+    """Load articles from article_cache, then from Dell for what is left"""
+    loaded, stale = {}, {}
+    rows = await execute_query("""
+        SELECT article_id, title, source, url, description, published_at,
+               EXTRACT(EPOCH FROM expires_at - NOW())
+        FROM article_cache
+        WHERE article_id = ANY(%s)
+    """, (article_ids,))
+
+    for article_id, title, source, url, description, published_at, remaining in rows:
+        # Never keep a row in memory past its article_cache expiry
+        ttl = float(remaining) if remaining is not None else None
+        if ttl is not None and ttl <= 0:
+            stale[article_id] = ArticleMetadata(title, source, url, description, published_at, 0)
+            continue
+        loaded[article_id] = article_metadata_cache.put(
+            article_id, title, source, url, description, published_at, ttl
+        )
+
+    remaining_ids = [article_id for article_id in article_ids if article_id not in loaded]
+    if remaining_ids and dell_database_available():
+        try:
+            loaded.update(await _fetch_from_dell(remaining_ids))
+        except Exception as e:
+            logger.warning(f"Could not fetch {len(remaining_ids)} articles from Dell server: {e}")
+
+    # Expired rows the Dell server could not refresh are still better than nothing
+    for article_id, article in stale.items():
+        loaded.setdefault(article_id, article)
+    return loaded
+
+
+async def _fetch_from_dell(article_ids: List[int]) -> Dict[int, ArticleMetadata]:
+    """Fetch articles from Dell news_articles and write them to article_cache"""
+    rows = await execute_query("""
+        SELECT id, title, source, url, published_at, description
+        FROM news_articles
+        WHERE id = ANY(%s)
+    """, (article_ids,), use_dell_server=True)
+    if not rows:
+        return {}
+
+    async with get_db_cursor() as cursor:
+        await upsert_article_cache(cursor, rows)
+
+    return {
+        article_id: article_metadata_cache.put(article_id, title, source, url, description, published_at)
+        for article_id, title, source, url, published_at, description in rows
+    }
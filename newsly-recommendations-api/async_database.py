@@ -0,0 +1,521 @@
+"""Async database access with psycopg 3 connection pools
+
+Mirrors the helpers in database.py, but every call awaits the network
+instead of blocking the event loop, so a slow query only stalls the
+request that issued it.
+
+The Dell pool goes through a reverse SSH tunnel that can drop at any
+time. A background monitor opens it lazily (it may be down at startup),
+probes it with SELECT 1, and drives a circuit breaker; while the breaker
+is open, Dell calls fail immediately instead of waiting on TCP connects.
+
+Pool sizes, checkout timeout and connection lifetime come from Settings.
+Checkouts queue first-come first-served inside psycopg_pool, connections
+are checked before they are handed out, and PoolMetrics records checkout
+waits and connections in use; pool_stats() reports them with the pools'
+own idle, waiting and lost-connection counts.
+
+Hot queries are registered once by name in `statements` and run with
+execute_statement(), which prepares them server-side on each pooled
+connection the first time that connection sees them, so later calls
+skip parsing and planning. The registry keeps per-statement call counts
+and cumulative execution time.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+import psycopg
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from circuit_breaker import CircuitBreaker, CLOSED
+from config import settings
+from metrics import histogram_samples, registry
+from query_tracing import DellTracedAsyncCursor, TracedAsyncCursor, tracing_paused
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Async connection pools for both databases
+local_async_pool = None
+dell_async_pool = None
+
+dell_breaker = CircuitBreaker(
+    "dell_db",
+    failure_threshold=settings.DELL_DB_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout_seconds=settings.DELL_DB_CIRCUIT_RESET_SECONDS
+)
+_dell_monitor_task: Optional[asyncio.Task] = None
+
+
+class DatabaseUnavailableError(Exception):
+    """Raised when the Dell database is known to be unreachable"""
+
+
+# Upper bounds (ms) of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    """Checkout wait and in-use counters for one connection pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        # Per-bucket counts for WAIT_BUCKETS_MS, plus one overflow bucket
+        self.wait_buckets: List[int] = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def _record_wait(self, wait_ms: float):
+        self.checkouts += 1
+        self.wait_ms_total += wait_ms
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        for i, bound in enumerate(WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                self.wait_buckets[i] += 1
+                return
+        self.wait_buckets[-1] += 1
+
+    @asynccontextmanager
+    async def checkout(self, pool: AsyncConnectionPool, timeout: Optional[float] = None):
+        """Check a connection out of pool, recording the wait"""
+        start = time.perf_counter()
+        acquired = False
+        try:
+            async with pool.connection(timeout=timeout) as conn:
+                acquired = True
+                self._record_wait((time.perf_counter() - start) * 1000)
+                self.in_use += 1
+                try:
+                    yield conn
+                finally:
+                    self.in_use -= 1
+        except PoolTimeout:
+            if not acquired:
+                self.timeouts += 1
+                logger.warning(f"{self.name} pool checkout timed out after {time.perf_counter() - start:.1f}s")
+            raise
+
+    def stats(self, pool: Optional[AsyncConnectionPool]) -> dict:
+        pool_stats = pool.get_stats() if pool is not None else {}
+        return {
+            "size": pool_stats.get("pool_size", 0),
+            "max_size": pool_stats.get("pool_max", 0),
+            "in_use": self.in_use,
+            "idle": pool_stats.get("pool_available", 0),
+            "waiting": pool_stats.get("requests_waiting", 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0,
+            "max_wait_ms": round(self.wait_ms_max, 3),
+            "connections_lost": pool_stats.get("connections_lost", 0),
+            "returns_bad": pool_stats.get("returns_bad", 0),
+        }
+
+
+local_pool_metrics = PoolMetrics("local")
+dell_pool_metrics = PoolMetrics("dell")
+
+
+def pool_stats() -> dict:
+    """Size, usage and checkout wait metrics of both pools"""
+    return {
+        "local": local_pool_metrics.stats(local_async_pool),
+        "dell": dell_pool_metrics.stats(dell_async_pool),
+    }
+
+
+def _collect_pool_metrics():
+    """Export pool_stats() and the checkout wait histograms at scrape time"""
+    stats = pool_stats()
+    pools = (("local", local_pool_metrics), ("dell", dell_pool_metrics))
+    wait_buckets = [bound / 1000 for bound in WAIT_BUCKETS_MS]
+    return [
+        ("db_pool_connections", "gauge", "Pooled connections by state", [
+            ("db_pool_connections", {"database": name, "state": state}, stats[name][state])
+            for name, _ in pools for state in ("in_use", "idle")
+        ]),
+        ("db_pool_max_size", "gauge", "Maximum pool size", [
+            ("db_pool_max_size", {"database": name}, stats[name]["max_size"]) for name, _ in pools
+        ]),
+        ("db_pool_waiting", "gauge", "Requests waiting for a connection", [
+            ("db_pool_waiting", {"database": name}, stats[name]["waiting"]) for name, _ in pools
+        ]),
+        ("db_pool_checkout_timeouts_total", "counter", "Checkouts that timed out", [
+            ("db_pool_checkout_timeouts_total", {"database": name}, stats[name]["timeouts"])
+            for name, _ in pools
+        ]),
+        ("db_pool_connections_lost_total", "counter", "Connections found broken and replaced", [
+            ("db_pool_connections_lost_total", {"database": name}, stats[name]["connections_lost"])
+            for name, _ in pools
+        ]),
+        ("db_pool_checkout_wait_seconds", "histogram", "Time spent waiting for a pooled connection", [
+            sample
+            for name, metrics in pools
+            for sample in histogram_samples(
+                "db_pool_checkout_wait_seconds", {"database": name}, wait_buckets,
+                metrics.wait_buckets, metrics.wait_ms_total / 1000
+            )
+        ]),
+    ]
+
+
+registry.add_collector(_collect_pool_metrics)
+
+
+async def _validate_connection(conn):
+    # Health checks are not queries of the request that triggered the checkout
+    with tracing_paused():
+        await AsyncConnectionPool.check_connection(conn)
+
+
+def _check_connection():
+    """Callback validating connections before checkout, if enabled"""
+    return _validate_connection if settings.DB_POOL_CHECK_CONNECTIONS else None
+
+
+def _conninfo(host: str, port: int, dbname: str, user: str, password: str, connect_timeout: int = 10) -> str:
+    """Build a libpq connection string"""
+    return (
+        f"host={host} port={port} dbname={dbname} user={user} password={password} "
+        f"connect_timeout={connect_timeout}"
+    )
+
+
+def dell_database_available() -> bool:
+    """True if the Dell pool is open and its breaker is closed"""
+    return dell_async_pool is not None and dell_breaker.state == CLOSED
+
+
+def dell_database_status() -> str:
+    """Breaker state of the Dell pool, or "down" if it has never opened"""
+    return "down" if dell_async_pool is None else dell_breaker.state
+
+
+async def _open_dell_pool() -> bool:
+    """Try to open the Dell pool; returns True on success"""
+    global dell_async_pool
+
+    pool = AsyncConnectionPool(
+        conninfo=_conninfo(
+            settings.DELL_SERVER_DB_HOST,
+            settings.DELL_SERVER_DB_PORT,
+            settings.DELL_SERVER_DB_NAME,
+            settings.DELL_SERVER_DB_USER,
+            settings.DELL_SERVER_DB_PASSWORD,
+            settings.DELL_DB_CONNECT_TIMEOUT_SECONDS
+        ),
+        min_size=settings.DELL_DB_POOL_MIN_SIZE,
+        max_size=settings.DELL_DB_POOL_MAX_SIZE,
+        kwargs={"cursor_factory": DellTracedAsyncCursor},
+        timeout=settings.DELL_DB_CHECKOUT_TIMEOUT_SECONDS,
+        max_waiting=settings.DB_POOL_MAX_WAITING,
+        max_lifetime=settings.DELL_DB_POOL_MAX_LIFETIME_SECONDS,
+        max_idle=settings.DB_POOL_MAX_IDLE_SECONDS,
+        check=_check_connection(),
+        name="dell",
+        open=False
+    )
+    try:
+        await pool.open(wait=True, timeout=settings.DELL_DB_CONNECT_TIMEOUT_SECONDS + 1)
+    except Exception as e:
+        logger.warning(f"Dell server database connection failed (will retry in background): {e}")
+        await pool.close()
+        return False
+
+    dell_async_pool = pool
+    dell_breaker.record_success()
+    logger.info("Dell server async connection pool initialized")
+    return True
+
+
+async def _probe_dell_pool():
+    """Run SELECT 1 on the Dell pool and feed the result to the breaker"""
+    try:
+        async with dell_async_pool.connection(timeout=settings.DELL_DB_CHECKOUT_TIMEOUT_SECONDS) as conn:
+            await asyncio.wait_for(conn.execute("SELECT 1"), settings.DELL_DB_CONNECT_TIMEOUT_SECONDS)
+        dell_breaker.record_success()
+    except Exception as e:
+        logger.warning(f"Dell server database health probe failed: {e!r}")
+        dell_breaker.record_failure()
+
+
+async def _monitor_dell_pool():
+    """Open the Dell pool when it is missing, probe it when it is not"""
+    while True:
+        await asyncio.sleep(settings.DELL_DB_HEALTH_INTERVAL_SECONDS)
+        try:
+            if dell_async_pool is None:
+                await _open_dell_pool()
+            else:
+                await _probe_dell_pool()
+        except Exception as e:
+            logger.error(f"Dell pool monitor error: {e}")
+
+
+async def init_async_pools():
+    """Initialize async connection pools for both databases"""
+    global local_async_pool, _dell_monitor_task
+
+    try:
+        # Local database pool
+        local_async_pool = AsyncConnectionPool(
+            conninfo=_conninfo(
+                settings.DATABASE_HOST,
+                settings.DATABASE_PORT,
+                settings.DATABASE_NAME,
+                settings.DATABASE_USER,
+                settings.DATABASE_PASSWORD
+            ),
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            kwargs={"cursor_factory": TracedAsyncCursor},
+            timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            max_waiting=settings.DB_POOL_MAX_WAITING,
+            max_lifetime=settings.DB_POOL_MAX_LIFETIME_SECONDS,
+            max_idle=settings.DB_POOL_MAX_IDLE_SECONDS,
+            check=_check_connection(),
+            name="local",
+            open=False
+        )
+        await local_async_pool.open(wait=True)
+        logger.info("Local async connection pool initialized")
+
+        # Dell server database pool (via reverse SSH) - optional
+        await _open_dell_pool()
+        _dell_monitor_task = asyncio.create_task(_monitor_dell_pool())
+
+    except Exception as e:
+        logger.error(f"Error initializing local async connection pool: {e}")
+        raise
+
+
+async def close_async_pools():
+    """Close all async connection pools"""
+    global local_async_pool, dell_async_pool, _dell_monitor_task
+
+    if _dell_monitor_task:
+        _dell_monitor_task.cancel()
+        try:
+            await _dell_monitor_task
+        except asyncio.CancelledError:
+            pass
+        _dell_monitor_task = None
+
+    if local_async_pool:
+        await local_async_pool.close()
+        logger.info("Local async connection pool closed")
+
+    if dell_async_pool:
+        await dell_async_pool.close()
+        dell_async_pool = None
+        logger.info("Dell async connection pool closed")
+
+
+@asynccontextmanager
+async def get_db_connection(use_dell_server=False):
+    """
+    Async context manager for database connections with automatic cleanup
+
+    Args:
+        use_dell_server: If True, connect to Dell server database
+
+    Raises:
+        DatabaseUnavailableError: If the Dell pool is down or its breaker is open
+    """
+    if not use_dell_server:
+        async with local_pool_metrics.checkout(local_async_pool) as conn:
+            try:
+                yield conn
+            except Exception as e:
+                await conn.rollback()
+                logger.error(f"Database error: {e}")
+                raise
+        return
+
+    if dell_async_pool is None:
+        raise DatabaseUnavailableError("Dell server database connection not available. Please check SSH tunnel.")
+    if not dell_breaker.allow():
+        raise DatabaseUnavailableError("Dell server database circuit is open. Please check SSH tunnel.")
+
+    try:
+        async with dell_pool_metrics.checkout(dell_async_pool) as conn:
+            try:
+                yield conn
+            except Exception as e:
+                await conn.rollback()
+                logger.error(f"Database error: {e}")
+                raise
+    except (psycopg.OperationalError, PoolTimeout):
+        dell_breaker.record_failure()
+        raise
+    except Exception:
+        # The server answered; the error is in the query, not the link
+        dell_breaker.record_success()
+        raise
+    dell_breaker.record_success()
+
+
+@asynccontextmanager
+async def get_db_cursor(use_dell_server=False, commit=True):
+    """
+    Async context manager for database cursor with automatic commit/rollback
+
+    Args:
+        use_dell_server: If True, connect to Dell server database
+        commit: If True, commit transaction on success
+    """
+    async with get_db_connection(use_dell_server) as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            if commit:
+                await conn.commit()
+            else:
+                await conn.rollback()
+        except Exception as e:
+            await conn.rollback()
+            logger.error(f"Cursor error: {e}")
+            raise
+        finally:
+            await cursor.close()
+
+
+async def execute_query(query: str, params: tuple = None, use_dell_server=False, fetch=True):
+    """
+    Execute a database query without blocking the event loop
+
+    Args:
+        query: SQL query string
+        params: Query parameters
+        use_dell_server: If True, execute on Dell server database
+        fetch: If True, fetch and return results
+
+    Returns:
+        Query results if fetch=True, otherwise None
+    """
+    async with get_db_cursor(use_dell_server) as cursor:
+        await cursor.execute(query, params)
+        if fetch:
+            return await cursor.fetchall()
+        return None
+
+
+async def execute_many(query: str, params_list: list, use_dell_server=False):
+    """
+    Execute multiple queries efficiently (pipelined by psycopg)
+
+    Args:
+        query: SQL query string
+        params_list: List of parameter tuples
+        use_dell_server: If True, execute on Dell server database
+    """
+    async with get_db_cursor(use_dell_server) as cursor:
+        await cursor.executemany(query, params_list)
+
+
+class PreparedStatement:
+    """A named query and its execution metrics"""
+
+    __slots__ = ("name", "query", "calls", "errors", "total_ms")
+
+    def __init__(self, name: str, query: str):
+        self.name = name
+        self.query = query
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+
+class StatementRegistry:
+    """Hot queries by name, prepared on every pooled connection that runs them"""
+
+    def __init__(self):
+        self._statements: Dict[str, PreparedStatement] = {}
+
+    def register(self, name: str, query: str) -> str:
+        """
+        Register a query under a name
+
+        Returns:
+            The name, for use with execute_statement()
+
+        Raises:
+            ValueError: If the name is already taken by a different query
+        """
+        existing = self._statements.get(name)
+        if existing is not None and existing.query != query:
+            raise ValueError(f"Statement {name} is already registered with a different query")
+        if existing is None:
+            self._statements[name] = PreparedStatement(name, query)
+        return name
+
+    def get(self, name: str) -> PreparedStatement:
+        return self._statements[name]
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "calls": stmt.calls,
+                "errors": stmt.errors,
+                "total_ms": round(stmt.total_ms, 2),
+                "avg_ms": round(stmt.total_ms / stmt.calls, 3) if stmt.calls else 0,
+            }
+            for name, stmt in sorted(self._statements.items())
+        }
+
+
+statements = StatementRegistry()
+
+
+def _collect_statement_metrics():
+    """Export per-statement calls and execution time at scrape time"""
+    stats = statements.stats()
+    return [
+        ("db_statement_calls_total", "counter", "Executions of each prepared statement", [
+            ("db_statement_calls_total", {"statement": name}, s["calls"]) for name, s in stats.items()
+        ]),
+        ("db_statement_errors_total", "counter", "Failed executions of each prepared statement", [
+            ("db_statement_errors_total", {"statement": name}, s["errors"]) for name, s in stats.items()
+        ]),
+        ("db_statement_seconds_total", "counter", "Cumulative execution time of each prepared statement", [
+            ("db_statement_seconds_total", {"statement": name}, s["total_ms"] / 1000)
+            for name, s in stats.items()
+        ]),
+    ]
+
+
+registry.add_collector(_collect_statement_metrics)
+
+
+async def execute_statement(name: str, params: tuple = None, use_dell_server=False, fetch=True):
+    """
+    Execute a registered statement, preparing it on the connection if needed
+
+    psycopg keeps the prepared statement per connection, so each pooled
+    connection parses and plans the query once and reuses the plan after.
+
+    Args:
+        name: Name the query was registered under
+        params: Query parameters
+        use_dell_server: If True, execute on Dell server database
+        fetch: If True, fetch and return results
+
+    Returns:
+        Query results if fetch=True, otherwise None
+    """
+    stmt = statements.get(name)
+    async with get_db_cursor(use_dell_server) as cursor:
+        # Timed from checkout, so pool waits are not counted against the query
+        start = time.perf_counter()
+        try:
+            await cursor.execute(stmt.query, params, prepare=True)
+            return await cursor.fetchall() if fetch else None
+        except Exception:
+            stmt.errors += 1
+            raise
+        finally:
+            stmt.calls += 1
+            stmt.total_ms += (time.perf_counter() - start) * 1000
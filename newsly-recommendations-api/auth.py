@@ -1,6 +1,10 @@
 """Authentication and authorization utilities"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
@@ -14,6 +18,84 @@ logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 
+class TokenCache:
+    """
+    Bounded LRU cache of verified JWT payloads
+
+    Keyed by a SHA-256 digest of the token so raw tokens are never held in
+    memory. Entries expire at the token's own exp claim, capped by
+    max_ttl_seconds, so a cached payload is never served past its expiry.
+    Access is guarded by a lock, so the cache is safe to share with code
+    running in the threadpool.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_ttl_seconds: int = 300):
+        self.max_entries = max_entries
+        self.max_ttl_seconds = max_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return the cached payload for a token, or None"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, token: str, payload: dict):
+        """Cache a verified payload until its exp claim"""
+        now = time.time()
+        expires_at = now + self.max_ttl_seconds
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        if expires_at <= now:
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+token_cache = TokenCache(
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    max_ttl_seconds=settings.TOKEN_CACHE_TTL_SECONDS
+)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     # Truncate password to 72 bytes for bcrypt
@@ -25,7 +107,7 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     # Bcrypt has a 72-byte limit, so truncate if necessary
     password_bytes = password.encode('utf-8')[:72]
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -79,10 +161,13 @@ def verify_token(token: str) -> dict:
         )
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """
     Dependency to get current authenticated user from token
 
+    Declared async so FastAPI runs it on the event loop rather than in the
+    threadpool; a cache hit then costs no thread handoff.
+
     Args:
         credentials: HTTP Bearer credentials
 
@@ -93,7 +178,10 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         HTTPException: If authentication fails
     """
     token = credentials.credentials
-    payload = verify_token(token)
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verify_token(token)
+        token_cache.put(token, payload)
 
     user_id = payload.get("sub")
     if user_id is None:
@@ -106,6 +194,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         "user_id": int(user_id),
         "email": payload.get("email"),
         "name": payload.get("name"),
+        "token": token,
     }
 
 
@@ -0,0 +1,285 @@
+"""
+Closed-loop load driver for the API
+
+Runs each scenario in turn for a fixed duration with a fixed number of
+concurrent virtual users, each sending its next request as soon as the
+previous one completes, and writes p50/p95/p99 latency and throughput
+per scenario to a JSON file. Pass --compare with an earlier result to
+report regressions; the exit status is 1 if any scenario's p95 latency
+or throughput regressed by more than --max-regression percent.
+
+Virtual users are the seeded bench users (benchmarks/seed.py). Access
+tokens are minted with the API's SECRET_KEY, so the driver needs the same
+.env as the server; each virtual user sends its own X-Forwarded-For so
+rate limits apply per user, as they would for real clients.
+
+    python benchmarks/load.py --base-url http://localhost:8001 \\
+        --concurrency 32 --duration 30 --output benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+API_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_DIR))
+
+import httpx  # noqa: E402
+import psycopg  # noqa: E402
+from auth import create_access_token  # noqa: E402
+from config import settings  # noqa: E402
+from benchmarks.seed import BENCH_ARTICLE_ID_START, BENCH_EMAIL_PATTERN, BENCH_PASSWORD  # noqa: E402
+
+SCENARIOS = ("recommendations", "interactions", "stats", "login")
+
+
+class VirtualUser:
+    """One seeded user with its token and client address"""
+
+    def __init__(self, index: int, user_id: int, email: str, name: str):
+        self.user_id = user_id
+        self.email = email
+        self.token = create_access_token({"sub": str(user_id), "email": email, "name": name})
+        self.address = f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+        self.next_cursor: Optional[str] = None
+
+    def headers(self, authenticated: bool = True) -> dict:
+        headers = {"X-Forwarded-For": self.address}
+        if authenticated:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+
+def load_users(limit: int) -> List[VirtualUser]:
+    """Read the seeded bench users from the local database"""
+    with psycopg.connect(
+        host=settings.DATABASE_HOST,
+        port=settings.DATABASE_PORT,
+        dbname=settings.DATABASE_NAME,
+        user=settings.DATABASE_USER,
+        password=settings.DATABASE_PASSWORD
+    ) as conn:
+        rows = conn.execute(
+            "SELECT id, email, name FROM users WHERE email LIKE %s ORDER BY id LIMIT %s",
+            (BENCH_EMAIL_PATTERN, limit)
+        ).fetchall()
+    if not rows:
+        raise SystemExit("No bench users found; run benchmarks/seed.py first")
+    return [VirtualUser(i, *row) for i, row in enumerate(rows)]
+
+
+async def send(client: httpx.AsyncClient, scenario: str, user: VirtualUser, articles: int) -> httpx.Response:
+    """Send one request of the given scenario as user"""
+    if scenario == "recommendations":
+        # Alternate a first page with a keyset seek to the next one
+        params = {"limit": 20}
+        if user.next_cursor:
+            params["cursor"] = user.next_cursor
+        response = await client.get("/recommendations", params=params, headers=user.headers())
+        user.next_cursor = None if user.next_cursor else response.headers.get("X-Next-Cursor")
+        return response
+
+    if scenario == "interactions":
+        return await client.post("/interactions", headers=user.headers(), json={
+            "article_id": BENCH_ARTICLE_ID_START + random.randrange(articles),
+            "interaction_type": random.choice(("view", "view", "view", "click", "like")),
+            "time_spent_seconds": random.randint(5, 300),
+            "completion_rate": round(random.random(), 2),
+            "position_in_feed": random.randint(1, 20),
+        })
+
+    if scenario == "stats":
+        return await client.get("/stats", headers=user.headers())
+
+    if scenario == "login":
+        return await client.post(
+            "/auth/login", headers=user.headers(authenticated=False),
+            json={"email": user.email, "password": BENCH_PASSWORD}
+        )
+
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    # Round away float noise first so 0.07 * 100 ranks 7, not 8
+    rank = max(1, math.ceil(round(fraction * len(sorted_values), 9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: str,
+    users: List[VirtualUser],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    articles: int
+) -> dict:
+    """Drive one scenario and summarize its latencies"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors = 0
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    async def worker(index: int):
+        nonlocal errors
+        position = index
+        while True:
+            start = time.perf_counter()
+            if start >= stop_at:
+                return
+            user = users[position % len(users)]
+            position += concurrency
+            try:
+                response = await send(client, scenario, user, articles)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            end = time.perf_counter()
+            if start < measure_from:
+                continue
+            statuses[status] += 1
+            if status.startswith("2"):
+                latencies.append((end - start) * 1000)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+    latencies.sort()
+    completed = len(latencies)
+    return {
+        "requests": completed + errors,
+        "ok": completed,
+        "errors": errors,
+        "status_codes": dict(sorted(statuses.items())),
+        "throughput_rps": round(completed / duration, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "mean": round(sum(latencies) / completed, 2) if completed else 0.0,
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> bool:
+    """
+    Print per-scenario changes against a baseline
+
+    Returns:
+        True if any scenario regressed by more than max_regression percent
+    """
+    regressed = False
+    print(f"{'scenario':<16} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16} {'req/s':>16}")
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+
+        def change(new: float, old: float) -> float:
+            return (new - old) / old * 100 if old else 0.0
+
+        cells = []
+        for key in ("p50", "p95", "p99"):
+            new, old = result["latency_ms"][key], base["latency_ms"][key]
+            cells.append(f"{new:.1f} ({change(new, old):+.0f}%)")
+        new_rps, old_rps = result["throughput_rps"], base["throughput_rps"]
+        cells.append(f"{new_rps:.0f} ({change(new_rps, old_rps):+.0f}%)")
+        print(f"{name:<16} " + " ".join(f"{cell:>16}" for cell in cells))
+
+        if (change(result["latency_ms"]["p95"], base["latency_ms"]["p95"]) > max_regression
+                or -change(new_rps, old_rps) > max_regression):
+            regressed = True
+            print(f"  {name} regressed by more than {max_regression:.0f}%")
+    return regressed
+
+
+async def main(args) -> int:
+    users = load_users(args.users)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {scenario}; choose from {', '.join(SCENARIOS)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results: Dict[str, dict] = {}
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        for scenario in scenarios:
+            results[scenario] = await run_scenario(
+                client, scenario, users, args.concurrency, args.duration, args.warmup, args.articles
+            )
+            summary = results[scenario]
+            print(
+                f"{scenario:<16} {summary['throughput_rps']:>8} req/s  "
+                f"p50 {summary['latency_ms']['p50']} ms  p95 {summary['latency_ms']['p95']} ms  "
+                f"p99 {summary['latency_ms']['p99']} ms  errors {summary['errors']}"
+            )
+
+    output = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "warmup_seconds": args.warmup,
+        "virtual_users": len(users),
+        "client": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "scenarios": results,
+    }
+    path = Path(args.output)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(output, indent=2) + "\n")
+    print(f"Wrote {path}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(output, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API and record latency percentiles")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent virtual users per scenario")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before each scenario")
+    parser.add_argument("--users", type=int, default=1000, help="bench users to cycle through")
+    parser.add_argument("--articles", type=int, default=20000, help="article count used when seeding")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", default=str(API_DIR / "benchmarks" / "results" / "latest.json"))
+    parser.add_argument("--compare", help="earlier result JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=20, help="allowed p95/throughput regression, percent")
+
+    sys.exit(asyncio.run(main(parser.parse_args())))
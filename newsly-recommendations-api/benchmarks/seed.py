@@ -0,0 +1,183 @@
+"""
+Seed the local database with benchmark data
+
+Creates bench users (bench_user_<n>@example.com, all sharing one
+password), ranked recommendations, interactions and cached article
+metadata, all generated server-side with generate_series so millions of
+rows load in seconds. Previous bench data is replaced; other rows are
+left alone. Random values come from a fixed seed, so runs are repeatable.
+
+    python benchmarks/seed.py --apply-schema
+    python benchmarks/seed.py --users 5000 --recommendations-per-user 100
+
+Connection settings come from .env like the API itself.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_DIR))
+
+import psycopg  # noqa: E402
+from async_database import close_async_pools, get_db_cursor, init_async_pools  # noqa: E402
+from config import settings  # noqa: E402
+from password_hasher import password_hasher  # noqa: E402
+from recommendation_stats import reconcile_stats  # noqa: E402
+
+logger = logging.getLogger("benchmarks.seed")
+
+BENCH_EMAIL_PATTERN = "bench_user_%@example.com"
+BENCH_PASSWORD = "BenchPassword1"
+# Bench articles live far above real Dell article IDs
+BENCH_ARTICLE_ID_START = 10_000_000
+
+
+def _statements(sql: str) -> list:
+    """
+    Split a SQL file into statements
+
+    CREATE INDEX CONCURRENTLY must be sent on its own, outside the implicit
+    transaction of a multi-statement query. Files with dollar-quoted
+    function bodies have no such statements and are sent whole.
+    """
+    if "$$" in sql:
+        return [sql]
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith("--")]
+    return [statement for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+async def apply_schema():
+    """Apply schema.sql and every migration, in order (all are idempotent)"""
+    files = [API_DIR / "schema.sql"] + sorted((API_DIR / "migrations").glob("*.sql"))
+    async with await psycopg.AsyncConnection.connect(
+        host=settings.DATABASE_HOST,
+        port=settings.DATABASE_PORT,
+        dbname=settings.DATABASE_NAME,
+        user=settings.DATABASE_USER,
+        password=settings.DATABASE_PASSWORD,
+        autocommit=True
+    ) as conn:
+        for path in files:
+            for statement in _statements(path.read_text()):
+                await conn.execute(statement)
+            logger.info(f"Applied {path.relative_to(API_DIR)}")
+
+
+async def seed(users: int, recommendations_per_user: int, interactions_per_user: int, articles: int):
+    """Replace the bench rows with freshly generated ones"""
+    password_hash = await password_hasher.hash(BENCH_PASSWORD)
+
+    async with get_db_cursor() as cursor:
+        start = time.perf_counter()
+        await cursor.execute("SELECT setseed(0.42)")
+
+        await cursor.execute("SELECT id FROM users WHERE email LIKE %s", (BENCH_EMAIL_PATTERN,))
+        old_ids = [row[0] for row in await cursor.fetchall()]
+        if old_ids:
+            for table in ("user_recommendations", "user_interactions", "user_recommendation_stats"):
+                await cursor.execute(f"DELETE FROM {table} WHERE user_id = ANY(%s)", (old_ids,))
+            await cursor.execute("DELETE FROM users WHERE id = ANY(%s)", (old_ids,))
+            logger.info(f"Removed {len(old_ids)} previous bench users and their rows")
+
+        await cursor.execute("""
+            INSERT INTO article_cache (article_id, title, source, url, published_at, description, expires_at)
+            SELECT %s + g,
+                   'Benchmark article ' || g,
+                   'bench',
+                   'https://example.com/articles/' || g,
+                   NOW() - g * INTERVAL '1 minute',
+                   'Seeded for benchmarks',
+                   NOW() + INTERVAL '30 days'
+            FROM generate_series(0, %s - 1) g
+            ON CONFLICT (article_id) DO UPDATE SET expires_at = EXCLUDED.expires_at
+        """, (BENCH_ARTICLE_ID_START, articles))
+
+        await cursor.execute("""
+            INSERT INTO users (email, name, password_hash, oauth_provider, email_verified, primary_interests)
+            SELECT format('bench_user_%%s@example.com', g), format('Bench User %%s', g), %s,
+                   'email', TRUE, ARRAY['technology', 'science']
+            FROM generate_series(1, %s) g
+        """, (password_hash, users))
+
+        # Stepping by a prime keeps each user's article IDs distinct
+        await cursor.execute("""
+            INSERT INTO user_recommendations (
+                user_id, article_id, relevance_score, recommendation_reason,
+                served, served_at, clicked, clicked_at, created_at
+            )
+            SELECT u.id,
+                   %(start)s + (u.id * 7919 + n * 104729) %% %(articles)s,
+                   random(),
+                   'benchmark',
+                   n %% 2 = 0, CASE WHEN n %% 2 = 0 THEN NOW() END,
+                   n %% 20 = 0, CASE WHEN n %% 20 = 0 THEN NOW() END,
+                   NOW() - n * INTERVAL '1 minute'
+            FROM users u
+            CROSS JOIN generate_series(1, %(per_user)s) n
+            WHERE u.email LIKE %(pattern)s
+        """, {
+            "start": BENCH_ARTICLE_ID_START, "articles": articles,
+            "per_user": recommendations_per_user, "pattern": BENCH_EMAIL_PATTERN
+        })
+
+        await cursor.execute("""
+            INSERT INTO user_interactions (
+                user_id, article_id, interaction_type, time_spent_seconds,
+                completion_rate, scroll_depth, position_in_feed, device_type, created_at
+            )
+            SELECT u.id,
+                   %(start)s + (u.id * 6151 + n * 7907) %% %(articles)s,
+                   (ARRAY['view', 'view', 'view', 'click', 'like', 'share', 'hide', 'bookmark'])[1 + n %% 8],
+                   (random() * 300)::int,
+                   random(),
+                   random(),
+                   1 + n %% 50,
+                   'bench',
+                   NOW() - n * INTERVAL '1 hour'
+            FROM users u
+            CROSS JOIN generate_series(1, %(per_user)s) n
+            WHERE u.email LIKE %(pattern)s
+        """, {
+            "start": BENCH_ARTICLE_ID_START, "articles": articles,
+            "per_user": interactions_per_user, "pattern": BENCH_EMAIL_PATTERN
+        })
+
+        logger.info(
+            f"Inserted {users} users, {users * recommendations_per_user} recommendations, "
+            f"{users * interactions_per_user} interactions and {articles} articles "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+    await reconcile_stats()
+
+    async with get_db_cursor() as cursor:
+        for table in ("users", "user_recommendations", "user_interactions", "article_cache", "user_recommendation_stats"):
+            await cursor.execute(f"ANALYZE {table}")
+
+
+async def main(args):
+    if args.apply_schema:
+        await apply_schema()
+
+    await init_async_pools()
+    try:
+        await seed(args.users, args.recommendations_per_user, args.interactions_per_user, args.articles)
+    finally:
+        await close_async_pools()
+        password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the local database with benchmark data")
+    parser.add_argument("--apply-schema", action="store_true", help="apply schema.sql and migrations first")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--recommendations-per-user", type=int, default=100)
+    parser.add_argument("--interactions-per-user", type=int, default=40)
+    parser.add_argument("--articles", type=int, default=20000)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+"""
+Circuit breaker for calls to the Dell server
+
+After failure_threshold consecutive failures the breaker opens and calls
+are refused immediately instead of waiting on a dead SSH tunnel. Once
+reset_timeout_seconds have passed it lets a single trial call through
+(half-open); success closes it again, failure re-opens it.
+"""
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open trial call"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        # Metrics
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+            return HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed now"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        # A trial that never reported back (e.g. cancelled) stops blocking
+        # after another reset timeout
+        now = time.monotonic()
+        if state == HALF_OPEN and (
+            not self._trial_in_flight or now - self._trial_started >= self.reset_timeout_seconds
+        ):
+            self._trial_in_flight = True
+            self._trial_started = now
+            return True
+        self.rejected += 1
+        return False
+
+    def check(self):
+        """Like allow(), but raise CircuitOpenError when the call is refused"""
+        if not self.allow():
+            retry_after = max(0.0, self._opened_at + self.reset_timeout_seconds - time.monotonic())
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        if self._state != CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self._state = CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._state != CLOSED or self._failures >= self.failure_threshold:
+            if self._state == CLOSED:
+                self.opened += 1
+                logger.warning(f"{self.name} circuit opened after {self._failures} consecutive failures")
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
@@ -17,10 +17,32 @@ class Settings(BaseSettings):
     DATABASE_USER: str = os.getenv("DATABASE_USER", "newsly_user")
     DATABASE_PASSWORD: str = os.getenv("DATABASE_PASSWORD", "newsly_secure_2024")
 
+    # Connection pools
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+    DB_POOL_MAX_WAITING: int = int(os.getenv("DB_POOL_MAX_WAITING", "0"))
+    DB_POOL_MAX_LIFETIME_SECONDS: float = float(os.getenv("DB_POOL_MAX_LIFETIME_SECONDS", "1800"))
+    DB_POOL_MAX_IDLE_SECONDS: float = float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300"))
+    DB_POOL_CHECK_CONNECTIONS: bool = os.getenv("DB_POOL_CHECK_CONNECTIONS", "true").lower() == "true"
+    DELL_DB_POOL_MIN_SIZE: int = int(os.getenv("DELL_DB_POOL_MIN_SIZE", "1"))
+    DELL_DB_POOL_MAX_SIZE: int = int(os.getenv("DELL_DB_POOL_MAX_SIZE", "10"))
+    DELL_DB_POOL_MAX_LIFETIME_SECONDS: float = float(os.getenv("DELL_DB_POOL_MAX_LIFETIME_SECONDS", "600"))
+
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10080"))
+    TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+    PASSWORD_HASH_USE_PROCESSES: bool = os.getenv("PASSWORD_HASH_USE_PROCESSES", "false").lower() == "true"
 
     # Dell Server Configuration
     USE_DELL_SERVER: bool = os.getenv("USE_DELL_SERVER", "false").lower() == "true"
@@ -32,6 +54,28 @@ class Settings(BaseSettings):
     DELL_SERVER_DB_NAME: str = os.getenv("DELL_SERVER_DB_NAME", "personalized_news")
     DELL_SERVER_DB_USER: str = os.getenv("DELL_SERVER_DB_USER", "news_user")
     DELL_SERVER_DB_PASSWORD: str = os.getenv("DELL_SERVER_DB_PASSWORD", "campuslens2024")
+    DELL_DB_CONNECT_TIMEOUT_SECONDS: int = int(os.getenv("DELL_DB_CONNECT_TIMEOUT_SECONDS", "3"))
+    DELL_DB_CHECKOUT_TIMEOUT_SECONDS: float = float(os.getenv("DELL_DB_CHECKOUT_TIMEOUT_SECONDS", "5"))
+    DELL_DB_HEALTH_INTERVAL_SECONDS: float = float(os.getenv("DELL_DB_HEALTH_INTERVAL_SECONDS", "10"))
+    DELL_DB_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("DELL_DB_CIRCUIT_FAILURE_THRESHOLD", "3"))
+    DELL_DB_CIRCUIT_RESET_SECONDS: float = float(os.getenv("DELL_DB_CIRCUIT_RESET_SECONDS", "15"))
+
+    # Outbox relay for Dell user writes
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+    OUTBOX_POLL_INTERVAL_SECONDS: float = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+    OUTBOX_BACKOFF_SECONDS: float = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "5"))
+
+    # Dell Server API client
+    DELL_API_TIMEOUT_SECONDS: float = float(os.getenv("DELL_API_TIMEOUT_SECONDS", "10"))
+    DELL_API_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("DELL_API_CONNECT_TIMEOUT_SECONDS", "2"))
+    DELL_API_REGENERATE_TIMEOUT_SECONDS: float = float(os.getenv("DELL_API_REGENERATE_TIMEOUT_SECONDS", "30"))
+    DELL_API_MAX_CONNECTIONS: int = int(os.getenv("DELL_API_MAX_CONNECTIONS", "50"))
+    DELL_API_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("DELL_API_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    DELL_API_RETRIES: int = int(os.getenv("DELL_API_RETRIES", "2"))
+    DELL_API_BACKOFF_SECONDS: float = float(os.getenv("DELL_API_BACKOFF_SECONDS", "0.2"))
+    DELL_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("DELL_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    DELL_CIRCUIT_RESET_SECONDS: float = float(os.getenv("DELL_CIRCUIT_RESET_SECONDS", "30"))
 
     # CORS
     CORS_ORIGINS: List[str] = [
@@ -42,12 +86,58 @@ class Settings(BaseSettings):
         "http://newsliy.org"
     ]
 
+    # Metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    QUERY_TRACE_SLOW_REQUEST_MS: float = float(os.getenv("QUERY_TRACE_SLOW_REQUEST_MS", "500"))
+    QUERY_TRACE_MAX_QUERIES: int = int(os.getenv("QUERY_TRACE_MAX_QUERIES", "20"))
+    QUERY_TRACE_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("QUERY_TRACE_N_PLUS_ONE_THRESHOLD", "5"))
+
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
     RATE_LIMIT_PER_HOUR: int = int(os.getenv("RATE_LIMIT_PER_HOUR", "1000"))
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # 'memory', 'shared' or 'postgres'
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    RATE_LIMIT_SHM_PATH: str = os.getenv("RATE_LIMIT_SHM_PATH", "/dev/shm/newsly_rate_limits")
+    RATE_LIMIT_SHM_SLOTS: int = int(os.getenv("RATE_LIMIT_SHM_SLOTS", "65536"))
+    RATE_LIMIT_PERSIST: bool = os.getenv("RATE_LIMIT_PERSIST", "false").lower() == "true"
+    RATE_LIMIT_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("RATE_LIMIT_FLUSH_INTERVAL_SECONDS", "10"))
 
     # Cache
     CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", "86400"))
+    ARTICLE_METADATA_CACHE_MAX_ENTRIES: int = int(os.getenv("ARTICLE_METADATA_CACHE_MAX_ENTRIES", "50000"))
+    FEED_CACHE_MAX_ROWS: int = int(os.getenv("FEED_CACHE_MAX_ROWS", "200000"))
+    FEED_CACHE_MAX_ROWS_PER_USER: int = int(os.getenv("FEED_CACHE_MAX_ROWS_PER_USER", "500"))
+    FEED_CACHE_TTL_SECONDS: int = int(os.getenv("FEED_CACHE_TTL_SECONDS", "300"))
+
+    # Write-behind flushing of served recommendation marks
+    SERVED_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("SERVED_FLUSH_INTERVAL_SECONDS", "2"))
+    SERVED_FLUSH_BATCH_SIZE: int = int(os.getenv("SERVED_FLUSH_BATCH_SIZE", "1000"))
+
+    # Dell recommendation sync
+    SYNC_LOOKBACK_DAYS: int = int(os.getenv("SYNC_LOOKBACK_DAYS", "7"))
+    SYNC_MAX_ROWS_PER_USER: int = int(os.getenv("SYNC_MAX_ROWS_PER_USER", "100"))
+    SYNC_FETCH_SIZE: int = int(os.getenv("SYNC_FETCH_SIZE", "500"))
+    SYNC_SCHEDULER_ENABLED: bool = os.getenv("SYNC_SCHEDULER_ENABLED", "true").lower() == "true"
+    SYNC_INTERVAL_SECONDS: float = float(os.getenv("SYNC_INTERVAL_SECONDS", "300"))
+    SYNC_USER_INTERVAL_SECONDS: float = float(os.getenv("SYNC_USER_INTERVAL_SECONDS", "900"))
+    SYNC_BATCH_SIZE: int = int(os.getenv("SYNC_BATCH_SIZE", "50"))
+    SYNC_CONCURRENCY: int = int(os.getenv("SYNC_CONCURRENCY", "4"))
+    SYNC_JITTER: float = float(os.getenv("SYNC_JITTER", "0.2"))
+    SYNC_ACTIVE_DAYS: int = int(os.getenv("SYNC_ACTIVE_DAYS", "30"))
+    SYNC_WATERMARK_OVERLAP_SECONDS: float = float(os.getenv("SYNC_WATERMARK_OVERLAP_SECONDS", "300"))
+    SYNC_MODE: str = os.getenv("SYNC_MODE", "per_user")  # "per_user" or "change_feed"
+    SYNC_WATERMARK_OVERLAP_IDS: int = int(os.getenv("SYNC_WATERMARK_OVERLAP_IDS", "200"))
+
+    # Recommendation stats
+    STATS_RECONCILER_ENABLED: bool = os.getenv("STATS_RECONCILER_ENABLED", "false").lower() == "true"
+    STATS_RECONCILE_INTERVAL_SECONDS: float = float(os.getenv("STATS_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+    # Interactions
+    INTERACTION_BATCH_MAX_EVENTS: int = int(os.getenv("INTERACTION_BATCH_MAX_EVENTS", "500"))
+    INTERACTION_BUFFER_MAX_SIZE: int = int(os.getenv("INTERACTION_BUFFER_MAX_SIZE", "10000"))
+    INTERACTION_BUFFER_BATCH_SIZE: int = int(os.getenv("INTERACTION_BUFFER_BATCH_SIZE", "500"))
+    INTERACTION_BUFFER_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("INTERACTION_BUFFER_FLUSH_INTERVAL_SECONDS", "1"))
+    INTERACTION_SPILL_PATH: str = os.getenv("INTERACTION_SPILL_PATH", "interaction_spill.jsonl")
 
     # Onboarding password
     ONBOARDING_PASSWORD: str = os.getenv("ONBOARDING_PASSWORD", "rocky")
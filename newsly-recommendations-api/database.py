@@ -1,12 +1,26 @@
-"""Database connection management with connection pooling"""
+"""
+Database connection management with connection pooling
+
+Deprecated: only main_old.py still uses these synchronous psycopg2 pools.
+The API runs on the psycopg 3 pools in async_database.py, and the pool
+settings (DB_POOL_*, DELL_DB_POOL_*, DELL_DB_CONNECT_TIMEOUT_SECONDS) apply
+there, not here. Use async_database for new code.
+"""
 import psycopg2
 from psycopg2 import pool
 from contextlib import contextmanager
 from config import settings
 import logging
+import warnings
 
 logger = logging.getLogger(__name__)
 
+warnings.warn(
+    "database.py is deprecated; use async_database.py",
+    DeprecationWarning,
+    stacklevel=2
+)
+
 # Connection pools for both databases
 local_connection_pool = None
 dell_connection_pool = None
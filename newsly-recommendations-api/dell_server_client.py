@@ -0,0 +1,200 @@
+"""
+HTTP client for the Dell server API
+
+One httpx.AsyncClient is shared by every request, so calls reuse pooled
+keep-alive connections through the SSH tunnel instead of opening a new
+TCP connection each time. Every call has a timeout, transient failures
+are retried with exponential backoff, and a circuit breaker refuses
+calls outright while the Dell server is unreachable, so a dead tunnel
+costs nothing instead of tying up coroutines until they time out.
+"""
+import asyncio
+import random
+import time
+from typing import Optional
+import httpx
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from config import settings
+from metrics import dell_api_request_duration
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DellServerError(Exception):
+    """The Dell server could not be reached or returned an error"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DellServerClient:
+    """Pooled async client for the Dell server API"""
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout_seconds: float = 10,
+        connect_timeout_seconds: float = 2,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        retries: int = 2,
+        backoff_seconds: float = 0.2,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.breaker = breaker or CircuitBreaker("dell_api")
+        self._client: Optional[httpx.AsyncClient] = None
+        # Metrics
+        self.calls = 0
+        self.failures = 0
+        self.retried = 0
+        self.total_ms = 0.0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, timeout=self.timeout, limits=self.limits
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        idempotent: bool,
+        token: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request through the breaker, retrying transient failures
+
+        Non-idempotent requests are only retried when the connection could
+        not be established, i.e. the server never saw them.
+
+        Raises:
+            DellServerError: On a refused call, exhausted retries or a 5xx
+        """
+        try:
+            self.breaker.check()
+        except CircuitOpenError as e:
+            dell_api_request_duration.observe(0.0, method, path, "rejected")
+            raise DellServerError(str(e)) from e
+
+        headers = kwargs.pop("headers", {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(timeout, connect=self.timeout.connect)
+
+        attempt = 0
+        start = time.perf_counter()
+        outcome = "error"
+        self.calls += 1
+        try:
+            while True:
+                try:
+                    response = await self.client.request(method, path, headers=headers, **kwargs)
+                    if response.status_code < 500:
+                        self.breaker.record_success()
+                        outcome = "ok"
+                        return response
+                    error = DellServerError(
+                        f"Dell server returned {response.status_code} for {method} {path}",
+                        response.status_code
+                    )
+                    retryable = idempotent
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                    # Never sent, so even non-idempotent requests are safe to retry
+                    error = DellServerError(f"Could not connect to Dell server: {e!r}")
+                    retryable = True
+                except httpx.TransportError as e:
+                    error = DellServerError(f"Dell server request failed: {e!r}")
+                    retryable = idempotent
+
+                if not retryable or attempt >= self.retries:
+                    self.failures += 1
+                    self.breaker.record_failure()
+                    raise error
+
+                attempt += 1
+                self.retried += 1
+                delay = self.backoff_seconds * 2 ** (attempt - 1)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+        finally:
+            elapsed = time.perf_counter() - start
+            self.total_ms += elapsed * 1000
+            dell_api_request_duration.observe(elapsed, method, path, outcome)
+
+    async def register_user(self, email: str, password: str, name: str) -> Optional[dict]:
+        """
+        Create the user's account on the Dell server
+
+        Returns:
+            The Dell auth response, or None if Dell rejected the registration
+        """
+        response = await self._request(
+            "POST", "/auth/register", idempotent=False,
+            json={"email": email, "password": password, "name": name}
+        )
+        if response.status_code >= 400:
+            logger.warning(f"Dell server rejected registration of {email}: {response.status_code} {response.text[:200]}")
+            return None
+        return response.json()
+
+    async def regenerate_recommendations(self, user_token: str) -> dict:
+        """
+        Ask the Dell server to regenerate the user's recommendations
+
+        Raises:
+            DellServerError: If the Dell server is unavailable or refuses
+        """
+        response = await self._request(
+            "POST", "/recommendations/regenerate", idempotent=True,
+            token=user_token, timeout=settings.DELL_API_REGENERATE_TIMEOUT_SECONDS
+        )
+        if response.status_code >= 400:
+            raise DellServerError(
+                f"Dell server refused regeneration: {response.status_code}", response.status_code
+            )
+        return response.json()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retried": self.retried,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0,
+            "breaker": self.breaker.stats(),
+        }
+
+
+dell_client = DellServerClient(
+    settings.DELL_SERVER_API_URL,
+    timeout_seconds=settings.DELL_API_TIMEOUT_SECONDS,
+    connect_timeout_seconds=settings.DELL_API_CONNECT_TIMEOUT_SECONDS,
+    max_connections=settings.DELL_API_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.DELL_API_MAX_KEEPALIVE_CONNECTIONS,
+    retries=settings.DELL_API_RETRIES,
+    backoff_seconds=settings.DELL_API_BACKOFF_SECONDS,
+    breaker=CircuitBreaker(
+        "dell_api",
+        failure_threshold=settings.DELL_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout_seconds=settings.DELL_CIRCUIT_RESET_SECONDS
+    )
+)
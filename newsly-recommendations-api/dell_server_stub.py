@@ -0,0 +1,63 @@
+"""
+Local stand-in for the Dell server API
+
+Implements the endpoints dell_server_client calls so the API can be run
+and exercised without the SSH tunnel. Latency and failures can be
+injected to watch the client's timeouts, retries and circuit breaker:
+
+    STUB_LATENCY_SECONDS=0.5 STUB_FAILURE_RATE=0.3 \
+        uvicorn dell_server_stub:app --port 8000
+"""
+import asyncio
+import os
+import random
+from fastapi import FastAPI, Header, HTTPException
+from pydantic import BaseModel
+
+LATENCY_SECONDS = float(os.getenv("STUB_LATENCY_SECONDS", "0"))
+FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", "0"))
+
+app = FastAPI(title="Dell Server API stub")
+
+users = {}
+
+
+class RegisterRequest(BaseModel):
+    email: str
+    password: str
+    name: str
+
+
+async def simulate():
+    if LATENCY_SECONDS:
+        await asyncio.sleep(LATENCY_SECONDS)
+    if random.random() < FAILURE_RATE:
+        raise HTTPException(status_code=503, detail="Injected failure")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy", "users": len(users)}
+
+
+@app.post("/auth/register")
+async def register(data: RegisterRequest):
+    await simulate()
+    if data.email in users:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    user_id = len(users) + 1
+    users[data.email] = user_id
+    return {
+        "access_token": f"stub-token-{user_id}",
+        "token_type": "bearer",
+        "user_id": user_id,
+        "name": data.name
+    }
+
+
+@app.post("/recommendations/regenerate")
+async def regenerate(authorization: str = Header(None)):
+    await simulate()
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return {"status": "success", "recommendations_generated": random.randint(20, 100)}
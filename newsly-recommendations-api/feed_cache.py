@@ -0,0 +1,132 @@
+"""In-process cache of each user's ranked recommendation feed
+
+A user's feed only changes when recommendations are synced or generated
+(interactions do not filter or reorder it), so GET /recommendations can
+serve pages out of memory between those events. Callers on those write paths
+invalidate the user's entry explicitly; the TTL bounds staleness for
+changes made by other worker processes.
+"""
+import bisect
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FeedEntry:
+    """
+    A user's ranked feed rows, in (relevance_score, created_at, id) DESC order
+
+    Rows are (id, article_id, relevance_score, recommendation_reason,
+    created_at); article fields are hydrated separately per page.
+    """
+
+    __slots__ = ("rows", "complete", "expires_at")
+
+    def __init__(self, rows: Tuple[tuple, ...], complete: bool, expires_at: float):
+        self.rows = rows
+        # False when the feed was truncated at the per-user row cap
+        self.complete = complete
+        self.expires_at = expires_at
+
+    @property
+    def article_ids(self) -> List[int]:
+        return [row[1] for row in self.rows]
+
+    def page(self, offset: int, limit: int) -> Optional[List[tuple]]:
+        """Rows for an OFFSET page, or None if it runs past a truncated feed"""
+        end = offset + limit
+        if end > len(self.rows) and not self.complete:
+            return None
+        return list(self.rows[offset:end])
+
+    def after(self, cursor_key: tuple, limit: int) -> Optional[List[tuple]]:
+        """Rows sorting after a keyset cursor, or None if they are not all cached"""
+        start = bisect.bisect_left(
+            self.rows, True, key=lambda row: (row[2], row[4], row[0]) < cursor_key
+        )
+        return self.page(start, limit)
+
+
+class FeedCache:
+    """LRU of FeedEntry objects bounded by the total number of cached rows"""
+
+    def __init__(self, max_rows: int = 200_000, max_rows_per_user: int = 500, ttl_seconds: int = 300):
+        self.max_rows = max_rows
+        self.max_rows_per_user = max_rows_per_user
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._rows = 0
+        self._entries: "OrderedDict[int, FeedEntry]" = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[FeedEntry]:
+        entry = self._entries.get(user_id)
+
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._remove(user_id)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry
+
+    def put(self, user_id: int, rows: Sequence[tuple]) -> FeedEntry:
+        """
+        Cache a user's ranked rows
+
+        Args:
+            user_id: Local user ID
+            rows: Up to max_rows_per_user + 1 rows; the extra row only
+                signals that the feed continues past the cap
+        """
+        self._remove(user_id)
+
+        complete = len(rows) <= self.max_rows_per_user
+        entry = FeedEntry(
+            tuple(rows[:self.max_rows_per_user]),
+            complete,
+            time.monotonic() + self.ttl_seconds
+        )
+        self._entries[user_id] = entry
+        self._rows += len(entry.rows)
+
+        while self._rows > self.max_rows and len(self._entries) > 1:
+            evicted_id, _ = next(iter(self._entries.items()))
+            self._remove(evicted_id)
+
+        return entry
+
+    def invalidate(self, user_id: int):
+        """Drop a user's feed after a sync, generation or interaction"""
+        if self._remove(user_id):
+            self.invalidations += 1
+
+    def _remove(self, user_id: int) -> bool:
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return False
+        self._rows -= len(entry.rows)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._entries),
+            "rows": self._rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+feed_cache = FeedCache(
+    max_rows=settings.FEED_CACHE_MAX_ROWS,
+    max_rows_per_user=settings.FEED_CACHE_MAX_ROWS_PER_USER,
+    ttl_seconds=settings.FEED_CACHE_TTL_SECONDS
+)
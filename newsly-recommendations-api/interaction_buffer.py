@@ -0,0 +1,340 @@
+"""Buffered interaction ingest with COPY-based bulk flushes
+
+POST /interactions acknowledges as soon as an event is queued here. A
+background task drains the queue into user_interactions with COPY FROM
+STDIN, either every flush interval or whenever a full batch is waiting.
+Batches that cannot be written (database slow or down, or the queue is
+full) are appended to a local JSON-lines spill file and replayed once
+the database accepts writes again. Spilled lines that cannot be parsed
+are moved to a .bad file next to it instead of blocking the replay.
+
+All workers append to the same spill file under an exclusive flock. A
+replay locks the file and renames it to a name of its own
+(<spill>.replay.<pid>.<suffix>), so no two processes replay the same
+rows; replay files left by a process that died are adopted the same
+way once nobody holds their lock. Rows are copied from the end of the
+file and the file is truncated after each committed chunk, so what is
+left on disk is always what has not been copied yet: a failed replay
+keeps only those rows, and a crash repeats at most the chunk that was
+in flight.
+"""
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+from async_database import get_db_cursor
+from config import settings
+from interactions import INTERACTION_COLUMNS, mark_clicked
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InteractionBuffer:
+    """Bounded in-process queue of interaction rows flushed with COPY"""
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval_seconds: float = 1.0,
+        spill_path: str = "interaction_spill.jsonl"
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.spill_path = spill_path
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        # True while the loop is only waiting for rows, so it is safe to cancel
+        self._waiting = False
+        # Metrics
+        self.accepted = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.quarantined = 0
+        self.flush_seconds = 0.0
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        return self._queue
+
+    async def submit(self, row: tuple):
+        """Queue an interaction row (INTERACTION_COLUMNS order) for the next flush"""
+        try:
+            self.queue.put_nowait(row)
+            self.accepted += 1
+        except asyncio.QueueFull:
+            # The flusher is behind; keep the event on disk instead
+            await self._spill([row])
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write (or spill) everything still queued"""
+        self._closing = True
+        if self._task:
+            # Interrupt a wait for rows, but let a flush in progress finish
+            if self._waiting:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.error(f"Interaction flush loop failed: {e}")
+            self._task = None
+
+        while not self.queue.empty():
+            await self._flush(self._drain(self.batch_size))
+
+    def _drain(self, limit: int) -> List[tuple]:
+        batch = []
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await self._run_once()
+            except Exception as e:
+                # Keep the flusher alive; a dead loop would fill the queue
+                logger.error(f"Interaction flush loop error: {e}")
+                await asyncio.sleep(self.flush_interval_seconds)
+
+    async def _run_once(self):
+        """Collect one batch, flush it, then replay any spilled rows"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval_seconds
+        self._waiting = True
+        try:
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                batch.extend(self._drain(self.batch_size - len(batch)))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if not self._closing:
+                await self._flush(batch)
+                raise
+            # stop() interrupted the wait; flush what was dequeued and exit
+        finally:
+            self._waiting = False
+
+        # Only replay spilled rows while the database is taking writes
+        if (not batch or await self._flush(batch)) and not self._closing:
+            await self._replay_spill()
+
+    async def _flush(self, batch: Sequence[tuple]) -> bool:
+        """COPY a batch into user_interactions; spill it on failure"""
+        if not batch:
+            return True
+
+        start = time.perf_counter()
+        try:
+            await self._copy(batch)
+        except Exception as e:
+            logger.error(f"Interaction flush of {len(batch)} rows failed, spilling to disk: {e}")
+            await self._spill(batch)
+            return False
+        except asyncio.CancelledError:
+            # The COPY transaction is rolled back; keep the rows on disk
+            await self._spill(batch)
+            raise
+
+        self.flush_seconds += time.perf_counter() - start
+        self.flushed += len(batch)
+        self.flushes += 1
+        return True
+
+    @staticmethod
+    async def _copy(batch: Sequence[tuple]):
+        clicks = {(row[0], row[1]) for row in batch if row[2] == "click"}
+        copy_sql = f"COPY user_interactions ({', '.join(INTERACTION_COLUMNS)}) FROM STDIN"
+
+        async with get_db_cursor() as cursor:
+            async with cursor.copy(copy_sql) as copy:
+                for row in batch:
+                    await copy.write_row(row)
+            await mark_clicked(cursor, clicks)
+
+    async def _spill(self, rows: Sequence[tuple]):
+        """Append rows to the spill file, durably"""
+        data = "".join(
+            json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in row]) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+        def write():
+            while True:
+                with open(self.spill_path, "a+b") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    # A replay may have claimed the file between open and lock
+                    if _is_current(self.spill_path, f.fileno()):
+                        # Keep a line torn by a crashed writer from swallowing this one
+                        size = os.fstat(f.fileno()).st_size
+                        if size and os.pread(f.fileno(), 1, size - 1) != b"\n":
+                            f.write(b"\n")
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                        return
+
+        try:
+            await asyncio.to_thread(write)
+            self.spilled += len(rows)
+        except Exception as e:
+            self.dropped += len(rows)
+            logger.error(f"Could not spill {len(rows)} interactions, dropping them: {e}")
+
+    def _claim_spill(self) -> Optional[Tuple[int, str]]:
+        """
+        Lock a spill or orphaned replay file and rename it for this replay
+
+        Returns:
+            (locked file descriptor, new path), or None if there is nothing
+            to replay that another process is not already replaying
+        """
+        # Replay files first: they are older than anything still in the spill file
+        for path in sorted(glob.glob(glob.escape(self.spill_path) + ".replay*")) + [self.spill_path]:
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # The owner may have finished and removed it before we locked it
+                if _is_current(path, fd):
+                    replay_path = f"{self.spill_path}.replay.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+                    os.replace(path, replay_path)
+                    return fd, replay_path
+            except BlockingIOError:
+                pass
+            os.close(fd)
+        return None
+
+    def _load_replay(self, fd: int) -> Tuple[List[tuple], List[int], int]:
+        """
+        Parse a claimed replay file, moving unreadable lines to the .bad file
+
+        Returns:
+            (rows, byte offset of each row's line, number of lines quarantined)
+        """
+        with open(fd, "r+b", closefd=False) as f:
+            lines = f.read().splitlines(keepends=True)
+            rows, good, bad = [], [], []
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    values = json.loads(line)
+                    values[-1] = datetime.fromisoformat(values[-1])
+                except (ValueError, TypeError, IndexError, KeyError):
+                    bad.append(line if line.endswith(b"\n") else line + b"\n")
+                    continue
+                rows.append(tuple(values))
+                good.append(line if line.endswith(b"\n") else line + b"\n")
+
+            if bad:
+                with open(self.spill_path + ".bad", "ab") as quarantine:
+                    quarantine.writelines(bad)
+                    quarantine.flush()
+                    os.fsync(quarantine.fileno())
+                f.seek(0)
+                f.writelines(good)
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+
+        offsets, position = [], 0
+        for line in good:
+            offsets.append(position)
+            position += len(line)
+        return rows, offsets, len(bad)
+
+    @staticmethod
+    def _truncate(fd: int, length: int):
+        os.ftruncate(fd, length)
+        os.fsync(fd)
+
+    async def _replay_spill(self):
+        """Move spilled rows back into the database once it is reachable"""
+        claimed = await asyncio.to_thread(self._claim_spill)
+        if claimed is None:
+            return
+        fd, replay_path = claimed
+
+        copied = 0
+        try:
+            rows, offsets, bad = await asyncio.to_thread(self._load_replay, fd)
+            if bad:
+                self.quarantined += bad
+                logger.error(f"Moved {bad} unreadable spilled interactions to {self.spill_path}.bad")
+
+            # Copy from the tail so each committed chunk can be cut off the file
+            end = len(rows)
+            while end > 0:
+                start = max(0, end - self.batch_size)
+                await self._copy(rows[start:end])
+                await asyncio.to_thread(self._truncate, fd, offsets[start])
+                copied += end - start
+                end = start
+            os.remove(replay_path)
+        except Exception as e:
+            # The file now holds only the rows not copied; this or another worker retries it
+            logger.warning(f"Spill replay paused after {copied} rows, rest kept in {replay_path}: {e}")
+            return
+        finally:
+            self.replayed += copied
+            # Closing releases the lock, so the file can be adopted again
+            os.close(fd)
+
+        logger.info(f"Replayed {copied} spilled interactions")
+
+    def stats(self) -> dict:
+        depth = self.queue.qsize()
+        return {
+            "depth": depth,
+            "fill_ratio": round(depth / self.max_size, 3),
+            "accepted": self.accepted,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "quarantined": self.quarantined,
+            "rows_per_second": round(self.flushed / self.flush_seconds, 1) if self.flush_seconds else 0,
+        }
+
+
+def _is_current(path: str, fd: int) -> bool:
+    """Whether path still names the file open as fd"""
+    try:
+        return os.stat(path).st_ino == os.fstat(fd).st_ino
+    except FileNotFoundError:
+        return False
+
+
+interaction_buffer = InteractionBuffer(
+    max_size=settings.INTERACTION_BUFFER_MAX_SIZE,
+    batch_size=settings.INTERACTION_BUFFER_BATCH_SIZE,
+    flush_interval_seconds=settings.INTERACTION_BUFFER_FLUSH_INTERVAL_SECONDS,
+    spill_path=settings.INTERACTION_SPILL_PATH
+)
@@ -0,0 +1,89 @@
+"""Set-based writes for user interaction events
+
+Interaction rows are tuples in INTERACTION_COLUMNS order. Any number of
+events, from any number of users, are written with one multi-row INSERT
+and one UPDATE for the clicks among them.
+"""
+from typing import Iterable, Sequence, Tuple
+from async_database import get_db_cursor
+from recommendation_stats import STATS_ADD_CLICKED
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_COLUMNS = (
+    "user_id", "article_id", "interaction_type",
+    "time_spent_seconds", "completion_rate", "scroll_depth",
+    "position_in_feed", "created_at"
+)
+
+
+async def insert_interaction_rows(cursor, rows: Sequence[tuple]):
+    """Insert interaction rows with a single INSERT ... SELECT FROM unnest()"""
+    columns = list(zip(*rows))
+    query = """
+        INSERT INTO user_interactions (
+            user_id, article_id, interaction_type,
+            time_spent_seconds, completion_rate, scroll_depth,
+            position_in_feed, created_at
+        )
+        SELECT * FROM unnest(
+            %s::int[], %s::int[], %s::text[],
+            %s::int[], %s::real[], %s::real[],
+            %s::int[], %s::timestamptz[]
+        )
+    """
+    await cursor.execute(query, [list(column) for column in columns])
+
+
+async def mark_clicked(cursor, pairs: Iterable[Tuple[int, int]]):
+    """Flag recommendations as clicked for a set of (user_id, article_id) pairs"""
+    pairs = list(pairs)
+    if not pairs:
+        return
+
+    user_ids, article_ids = zip(*pairs)
+    # Only first clicks count towards clicked_count
+    query = """
+        WITH prev AS (
+            SELECT r.id, r.clicked AS was_clicked
+            FROM user_recommendations r
+            JOIN unnest(%s::int[], %s::int[]) AS c(user_id, article_id)
+                ON r.user_id = c.user_id AND r.article_id = c.article_id
+            ORDER BY r.id
+            FOR UPDATE OF r
+        ),
+        marked AS (
+            UPDATE user_recommendations r
+            SET clicked = TRUE, clicked_at = NOW()
+            FROM prev p
+            WHERE r.id = p.id
+            RETURNING r.user_id, p.was_clicked
+        ),
+        transitions AS (
+            SELECT user_id FROM marked WHERE was_clicked IS NOT TRUE
+        )
+    """ + STATS_ADD_CLICKED
+    await cursor.execute(query, (list(user_ids), list(article_ids)))
+
+
+async def write_interactions(rows: Sequence[tuple]) -> int:
+    """
+    Write interaction rows and apply their clicks in one transaction
+
+    Args:
+        rows: Tuples in INTERACTION_COLUMNS order
+
+    Returns:
+        Number of interactions written
+    """
+    if not rows:
+        return 0
+
+    clicks = {(row[0], row[1]) for row in rows if row[2] == "click"}
+
+    async with get_db_cursor() as cursor:
+        await insert_interaction_rows(cursor, rows)
+        await mark_clicked(cursor, clicks)
+
+    return len(rows)
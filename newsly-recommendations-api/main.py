@@ -3,22 +3,39 @@ Newsly Recommendations API v2
 Secure, scalable FastAPI with Google OAuth and dual-database sync
 All queries use parameterized statements to prevent SQL injection
 """
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from pydantic import BaseModel, EmailStr, Field, validator
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import base64
+import json
 import logging
+import math
 import re
 
 from config import settings
-from database import init_connection_pools, close_connection_pools, execute_query
-from auth import create_access_token, get_current_user
-from user_service import UserService
+from async_database import (
+    init_async_pools, close_async_pools, execute_statement, statements,
+    dell_breaker, dell_database_status, pool_stats
+)
+from auth import create_access_token, get_current_user, token_cache
+from user_service import UserService, user_profile_cache
 from rate_limiter import RateLimiter
+from password_hasher import password_hasher
+from feed_cache import feed_cache
+from article_metadata_cache import article_metadata_cache, hydrate_articles
+from write_behind import served_queue
+from interactions import write_interactions
+from interaction_buffer import interaction_buffer
+from recommendation_stats import stats_reconciler
+from sync_scheduler import sync_scheduler
+from outbox_relay import outbox_relay
 from oauth import oauth
-from dell_server_client import dell_client
+from dell_server_client import dell_client, DellServerError
+from metrics import MetricsMiddleware, registry
+from query_tracing import QueryTracingMiddleware
 
 # Configure logging
 logging.basicConfig(
@@ -41,6 +58,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
+)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Outermost, so the metrics middleware can read each request's trace
+app.add_middleware(
+    QueryTracingMiddleware,
+    slow_request_ms=settings.QUERY_TRACE_SLOW_REQUEST_MS,
+    max_queries=settings.QUERY_TRACE_MAX_QUERIES,
+    n_plus_one_threshold=settings.QUERY_TRACE_N_PLUS_ONE_THRESHOLD
 )
 
 # Rate limiter
@@ -147,15 +176,31 @@ class InteractionCreate(BaseModel):
 async def startup_event():
     """Initialize connection pools on startup"""
     logger.info("Starting Newsly Recommendations API v2")
-    init_connection_pools()
+    await init_async_pools()
     logger.info("Connection pools initialized")
+    await rate_limiter.start()
+    await served_queue.start()
+    await interaction_buffer.start()
+    if settings.STATS_RECONCILER_ENABLED:
+        await stats_reconciler.start()
+    await outbox_relay.start()
+    if settings.SYNC_SCHEDULER_ENABLED:
+        await sync_scheduler.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close connection pools on shutdown"""
     logger.info("Shutting down Newsly Recommendations API")
-    close_connection_pools()
+    await rate_limiter.stop()
+    await served_queue.stop()
+    await interaction_buffer.stop()
+    await stats_reconciler.stop()
+    await outbox_relay.stop()
+    await sync_scheduler.stop()
+    await dell_client.close()
+    password_hasher.shutdown()
+    await close_async_pools()
     logger.info("Connection pools closed")
 
 
@@ -167,10 +212,114 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "service": "newsly-recommendations-api",
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "dell_database": dell_database_status(),
+        "dell_api": dell_client.breaker.state,
+        "pools": pool_stats(),
+        "background": {
+            "password_hasher": password_hasher.stats(),
+            "served_marks": served_queue.stats(),
+            "interactions": interaction_buffer.stats(),
+            "outbox": outbox_relay.stats(),
+        },
     }
 
 
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+HASH_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def collect_component_metrics():
+    """Export cache, queue and circuit breaker stats at scrape time"""
+    caches = {
+        "token": token_cache.stats(),
+        "user_profile": user_profile_cache.stats(),
+        "article_metadata": article_metadata_cache.stats(),
+        "feed": feed_cache.stats(),
+    }
+    breakers = {"dell_db": dell_breaker.state, "dell_api": dell_client.breaker.state}
+    queues = {
+        "interactions": interaction_buffer.queue.qsize(),
+        "served_marks": served_queue.depth,
+        "password_hash": password_hasher.pending,
+    }
+    hash_latencies = {
+        "hash": password_hasher.hash_stats,
+        "verify": password_hasher.verify_stats,
+        "end_to_end": password_hasher.wait_stats,
+    }
+    hash_samples = []
+    for operation, latency in hash_latencies.items():
+        for quantile, seconds in zip(HASH_QUANTILES, latency.quantiles(*HASH_QUANTILES)):
+            hash_samples.append(
+                ("password_hash_seconds", {"operation": operation, "quantile": str(quantile)}, seconds)
+            )
+        hash_samples.append(("password_hash_seconds_sum", {"operation": operation}, latency.total_seconds))
+        hash_samples.append(("password_hash_seconds_count", {"operation": operation}, latency.count))
+    served = served_queue.stats()
+    interactions = interaction_buffer.stats()
+    flushes = {
+        "served_marks": (served["flushes"], served_queue.total_flush_ms / 1000, served["flushed"]),
+        "interactions": (interactions["flushes"], interaction_buffer.flush_seconds, interactions["flushed"]),
+    }
+    interaction_outcomes = ("accepted", "spilled", "replayed", "dropped", "quarantined")
+    return [
+        ("cache_hits_total", "counter", "In-process cache hits", [
+            ("cache_hits_total", {"cache": name}, stats["hits"]) for name, stats in caches.items()
+        ]),
+        ("cache_misses_total", "counter", "In-process cache misses", [
+            ("cache_misses_total", {"cache": name}, stats["misses"]) for name, stats in caches.items()
+        ]),
+        ("circuit_breaker_state", "gauge", "Circuit breaker state: 0 closed, 1 half-open, 2 open", [
+            ("circuit_breaker_state", {"breaker": name}, BREAKER_STATE_VALUES[state])
+            for name, state in breakers.items()
+        ]),
+        ("queue_depth", "gauge", "Items waiting in background queues", [
+            ("queue_depth", {"queue": name}, depth) for name, depth in queues.items()
+        ]),
+        ("password_hash_seconds", "summary",
+         "bcrypt latency over recent calls; end_to_end includes the wait for a worker", hash_samples),
+        ("password_hash_rejected_total", "counter", "Hashing requests rejected because the pool was full", [
+            ("password_hash_rejected_total", {}, password_hasher.rejected)
+        ]),
+        ("background_flushes_total", "counter", "Successful background queue flushes", [
+            ("background_flushes_total", {"queue": name}, count) for name, (count, _, _) in flushes.items()
+        ]),
+        ("background_flush_seconds_total", "counter", "Time spent in successful background queue flushes", [
+            ("background_flush_seconds_total", {"queue": name}, seconds)
+            for name, (_, seconds, _) in flushes.items()
+        ]),
+        ("background_rows_flushed_total", "counter", "Rows written by background queue flushes", [
+            ("background_rows_flushed_total", {"queue": name}, rows) for name, (_, _, rows) in flushes.items()
+        ]),
+        ("served_marks_dropped_total", "counter", "Served marks dropped because the queue was full", [
+            ("served_marks_dropped_total", {}, served["dropped"])
+        ]),
+        ("outbox_failed_events", "gauge", "Dead-lettered outbox events awaiting an operator", [
+            ("outbox_failed_events", {}, outbox_relay.failed_events)
+        ]),
+        ("outbox_dead_lettered_total", "counter", "Outbox events this process dead-lettered", [
+            ("outbox_dead_lettered_total", {}, outbox_relay.dead_lettered)
+        ]),
+        ("interaction_buffer_rows_total", "counter",
+         "Interaction rows queued, spilled to disk, replayed from disk, dropped or quarantined", [
+            ("interaction_buffer_rows_total", {"outcome": outcome}, interactions[outcome])
+            for outcome in interaction_outcomes
+        ]),
+    ]
+
+
+registry.add_collector(collect_component_metrics)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus metrics for this worker process"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 # Authentication endpoints
 @app.post("/auth/verify-password")
 async def verify_password_endpoint(data: PasswordVerification):
@@ -183,12 +332,29 @@ async def verify_password_endpoint(data: PasswordVerification):
     )
 
 
+async def register_on_dell_server(email: str, password: str, name: str):
+    """Create the user's Dell API account (runs after the response is sent)"""
+    try:
+        dell_auth = await dell_client.register_user(email=email, password=password, name=name)
+        if dell_auth:
+            logger.info(f"User {email} successfully registered on Dell server")
+        else:
+            logger.warning(f"Failed to register {email} on Dell server - will retry on first login")
+    except Exception as dell_error:
+        logger.error(f"Dell server registration failed for {email}: {dell_error}")
+        # Registration already succeeded locally - Dell sync can happen later
+
+
 @app.post("/auth/register")
-async def register(user: UserRegister, _: None = Depends(rate_limiter)):
+async def register(
+    user: UserRegister,
+    background_tasks: BackgroundTasks,
+    _: None = Depends(rate_limiter)
+):
     """Register a new user with email and password"""
     try:
         # Check if user exists
-        existing_user = UserService.get_user_by_email(user.email)
+        existing_user = await UserService.get_user_by_email(user.email)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -196,27 +362,16 @@ async def register(user: UserRegister, _: None = Depends(rate_limiter)):
             )
 
         # Create user on Oracle database (with SQL injection protection in UserService)
-        new_user = UserService.create_user(
+        new_user = await UserService.create_user(
             email=user.email,
             name=user.name,
             password=user.password,
             oauth_provider='email'
         )
 
-        # Register user on Dell server for recommendations
-        try:
-            dell_auth = await dell_client.register_user(
-                email=user.email,
-                password=user.password,
-                name=user.name
-            )
-            if dell_auth:
-                logger.info(f"User {user.email} successfully registered on Dell server")
-            else:
-                logger.warning(f"Failed to register {user.email} on Dell server - will retry on first login")
-        except Exception as dell_error:
-            logger.error(f"Dell server registration failed for {user.email}: {dell_error}")
-            # Continue with registration - Dell sync can happen later
+        # Register user on Dell server for recommendations once the
+        # response has been sent, so registration only waits on the local DB
+        background_tasks.add_task(register_on_dell_server, user.email, user.password, user.name)
 
         # Create access token
         access_token = create_access_token(
@@ -250,7 +405,7 @@ async def login(credentials: UserLogin, _: None = Depends(rate_limiter)):
     """Login with email and password"""
     try:
         # Verify credentials (protected against SQL injection)
-        user = UserService.verify_credentials(credentials.email, credentials.password)
+        user = await UserService.verify_credentials(credentials.email, credentials.password)
 
         if not user:
             raise HTTPException(
@@ -325,11 +480,11 @@ async def google_callback(request: Request):
         picture = user_info.get('picture')
 
         # Check if user exists
-        user = UserService.get_user_by_oauth('google', google_id)
+        user = await UserService.get_user_by_oauth('google', google_id)
 
         if not user:
             # Check if email exists with different provider
-            existing_email_user = UserService.get_user_by_email(email)
+            existing_email_user = await UserService.get_user_by_email(email)
             if existing_email_user:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -337,7 +492,7 @@ async def google_callback(request: Request):
                 )
 
             # Create new user
-            user = UserService.create_user(
+            user = await UserService.create_user(
                 email=email,
                 name=name,
                 oauth_provider='google',
@@ -373,7 +528,7 @@ async def google_callback(request: Request):
 async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """Get current user information"""
     # Get full user profile
-    user = UserService.get_user_by_email(current_user['email'])
+    user = await UserService.get_user_by_email(current_user['email'])
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -416,7 +571,7 @@ async def update_profile(
             return {"message": "No fields to update"}
 
         # Update profile (with SQL injection protection)
-        success = UserService.update_profile(current_user['user_id'], profile_data)
+        success = await UserService.update_profile(current_user['user_id'], profile_data)
 
         if not success:
             raise HTTPException(
@@ -437,72 +592,139 @@ async def update_profile(
 
 
 # Recommendations endpoints
+# Article fields are hydrated from article_metadata_cache, not joined here
+RECOMMENDATION_COLUMNS = """
+    SELECT
+        r.id,
+        r.article_id,
+        r.relevance_score,
+        r.recommendation_reason,
+        r.created_at
+    FROM user_recommendations r
+"""
+
+RECOMMENDATION_ORDER = "ORDER BY r.relevance_score DESC, r.created_at DESC, r.id DESC"
+
+# Feed queries run on every cache miss; prepared once per pooled connection
+FEED_WINDOW_QUERY = statements.register("feed_window", RECOMMENDATION_COLUMNS + """
+    WHERE r.user_id = %s
+    """ + RECOMMENDATION_ORDER + " LIMIT %s")
+FEED_AFTER_CURSOR_QUERY = statements.register("feed_after_cursor", RECOMMENDATION_COLUMNS + """
+    WHERE r.user_id = %s
+      AND (r.relevance_score, r.created_at, r.id) < (%s::real, %s, %s)
+    """ + RECOMMENDATION_ORDER + " LIMIT %s")
+FEED_OFFSET_QUERY = statements.register("feed_offset", RECOMMENDATION_COLUMNS + """
+    WHERE r.user_id = %s
+    """ + RECOMMENDATION_ORDER + " LIMIT %s OFFSET %s")
+
+
+def encode_feed_cursor(relevance_score: float, created_at: datetime, rec_id: int) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    raw = json.dumps([relevance_score, created_at.isoformat(), rec_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip("=")
+
+
+def decode_feed_cursor(cursor: str) -> tuple:
+    """Decode a cursor into (relevance_score, created_at, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        relevance_score, created_at, rec_id = json.loads(base64.urlsafe_b64decode(padded))
+        relevance_score, created_at = float(relevance_score), datetime.fromisoformat(created_at)
+        # Feed rows carry aware timestamps; a naive one cannot be compared with them
+        if created_at.tzinfo is None or not math.isfinite(relevance_score):
+            raise ValueError("Cursor key out of range")
+        return relevance_score, created_at, int(rec_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+async def load_feed_page(user_id: int, offset: int, limit: int, cursor_key: Optional[tuple] = None) -> list:
+    """
+    Return one page of a user's ranked feed, from the feed cache if possible
+
+    On a cache miss the top FEED_CACHE_MAX_ROWS_PER_USER rows are loaded in
+    one query and cached; pages beyond that window go to the database.
+    """
+    entry = feed_cache.get(user_id)
+    if entry is None:
+        rows = await execute_statement(FEED_WINDOW_QUERY, (user_id, feed_cache.max_rows_per_user + 1))
+        entry = feed_cache.put(user_id, rows)
+
+    if cursor_key:
+        page_rows = entry.after(cursor_key, limit)
+    else:
+        page_rows = entry.page(offset, limit)
+    if page_rows is not None:
+        return page_rows
+
+    # Parameterized queries to prevent SQL injection
+    if cursor_key:
+        return await execute_statement(FEED_AFTER_CURSOR_QUERY, (user_id, *cursor_key, limit))
+    return await execute_statement(FEED_OFFSET_QUERY, (user_id, limit, offset))
+
+
 @app.get("/recommendations", response_model=List[RecommendationResponse])
 async def get_recommendations(
+    response: Response,
     page: int = 1,
     limit: int = 20,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     _: None = Depends(rate_limiter)
 ):
-    """Get personalized recommendations for current user"""
+    """
+    Get personalized recommendations for current user
+
+    Pass the X-Next-Cursor header of the previous page as `cursor` to seek
+    directly to the next page; `page` is kept for older clients and pages
+    with OFFSET.
+    """
     try:
         user_id = current_user["user_id"]
+
+        cursor_key = decode_feed_cursor(cursor) if cursor else None
         offset = (page - 1) * limit
 
-        # Parameterized query to prevent SQL injection
-        query = """
-            SELECT
-                r.id,
-                r.article_id,
-                r.relevance_score,
-                r.recommendation_reason,
-                a.title as article_title,
-                a.source as article_source,
-                a.url as article_url,
-                a.description as article_description,
-                r.created_at,
-                a.published_at
-            FROM user_recommendations r
-            LEFT JOIN article_cache a ON r.article_id = a.article_id
-            WHERE r.user_id = %s
-            ORDER BY r.relevance_score DESC, r.created_at DESC
-            LIMIT %s OFFSET %s
-        """
-        recommendations = execute_query(query, (user_id, limit, offset))
-
-        if not recommendations:
-            # If no local recommendations, sync from Dell server
-            await sync_recommendations_from_dell(user_id)
-            recommendations = execute_query(query, (user_id, limit, offset))
-
-        # Mark as served (parameterized query)
+        recommendations = await load_feed_page(user_id, offset, limit, cursor_key)
+
+        if not recommendations and not cursor and page == 1:
+            # No local recommendations yet: sync from Dell server in the
+            # background rather than making this request wait for it
+            sync_scheduler.request(user_id)
+
+        if recommendations and len(recommendations) == limit:
+            last = recommendations[-1]
+            response.headers["X-Next-Cursor"] = encode_feed_cursor(last[2], last[4], last[0])
+
+        # Mark as served in the background (bulk UPDATE per flush)
         if recommendations:
-            rec_ids = [rec[0] for rec in recommendations]
-            mark_served_query = """
-                UPDATE user_recommendations
-                SET served = TRUE, served_at = NOW()
-                WHERE id = ANY(%s)
-            """
-            execute_query(mark_served_query, (rec_ids,), fetch=False)
+            served_queue.add(rec[0] for rec in recommendations)
 
         # Format response
+        articles = await hydrate_articles(rec[1] for rec in recommendations)
         results = []
         for rec in recommendations:
+            article = articles.get(rec[1])
             results.append({
                 "id": rec[0],
                 "article_id": rec[1],
                 "relevance_score": rec[2],
                 "recommendation_reason": rec[3],
-                "article_title": rec[4],
-                "article_source": rec[5],
-                "article_url": rec[6],
-                "article_description": rec[7],
-                "created_at": rec[8],
-                "published_at": rec[9]
+                "article_title": article.title if article else None,
+                "article_source": article.source if article else None,
+                "article_url": article.url if article else None,
+                "article_description": article.description if article else None,
+                "created_at": rec[4],
+                "published_at": article.published_at if article else None
             })
 
         return results
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching recommendations: {e}")
         raise HTTPException(
@@ -511,6 +733,20 @@ async def get_recommendations(
         )
 
 
+def interaction_row(user_id: int, interaction: InteractionCreate, created_at: datetime) -> tuple:
+    """Build a user_interactions row in INTERACTION_COLUMNS order"""
+    return (
+        user_id,
+        interaction.article_id,
+        interaction.interaction_type,
+        interaction.time_spent_seconds,
+        interaction.completion_rate,
+        interaction.scroll_depth,
+        interaction.position_in_feed,
+        created_at
+    )
+
+
 @app.post("/interactions")
 async def record_interaction(
     interaction: InteractionCreate,
@@ -521,37 +757,8 @@ async def record_interaction(
     try:
         user_id = current_user["user_id"]
 
-        # Insert interaction (parameterized query)
-        insert_query = """
-            INSERT INTO user_interactions (
-                user_id, article_id, interaction_type,
-                time_spent_seconds, completion_rate, scroll_depth,
-                position_in_feed, created_at
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-        """
-        execute_query(
-            insert_query,
-            (
-                user_id,
-                interaction.article_id,
-                interaction.interaction_type,
-                interaction.time_spent_seconds,
-                interaction.completion_rate,
-                interaction.scroll_depth,
-                interaction.position_in_feed
-            ),
-            fetch=False
-        )
-
-        # If it's a click, update recommendation table
-        if interaction.interaction_type == "click":
-            update_query = """
-                UPDATE user_recommendations
-                SET clicked = TRUE, clicked_at = NOW()
-                WHERE user_id = %s AND article_id = %s
-            """
-            execute_query(update_query, (user_id, interaction.article_id), fetch=False)
+        # Queued for the next COPY flush; clicks are applied with it
+        await interaction_buffer.submit(interaction_row(user_id, interaction, datetime.now(timezone.utc)))
 
         return {"status": "success", "message": "Interaction recorded"}
 
@@ -563,6 +770,53 @@ async def record_interaction(
         )
 
 
+@app.post("/interactions/batch")
+async def record_interactions_batch(
+    interactions: List[InteractionCreate],
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(rate_limiter)
+):
+    """Record many interactions with one multi-row insert"""
+    if not interactions:
+        return {"status": "success", "recorded": 0}
+
+    if len(interactions) > settings.INTERACTION_BATCH_MAX_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.INTERACTION_BATCH_MAX_EVENTS} interactions per batch"
+        )
+
+    try:
+        user_id = current_user["user_id"]
+        created_at = datetime.now(timezone.utc)
+
+        recorded = await write_interactions(
+            [interaction_row(user_id, interaction, created_at) for interaction in interactions]
+        )
+
+        return {"status": "success", "recorded": recorded}
+
+    except Exception as e:
+        logger.error(f"Error recording interaction batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to record interactions"
+        )
+
+
+# Primary-key lookup on the incrementally maintained counters
+USER_STATS_QUERY = statements.register("user_stats", """
+    SELECT
+        total_recommendations,
+        served_count,
+        clicked_count,
+        ROUND((relevance_score_sum / NULLIF(total_recommendations, 0))::numeric, 3),
+        last_recommendation_at
+    FROM user_recommendation_stats
+    WHERE user_id = %s
+""")
+
+
 @app.get("/stats")
 async def get_user_stats(
     current_user: dict = Depends(get_current_user),
@@ -572,18 +826,7 @@ async def get_user_stats(
     try:
         user_id = current_user["user_id"]
 
-        # Parameterized query
-        query = """
-            SELECT
-                total_recommendations,
-                served_count,
-                clicked_count,
-                avg_relevance_score,
-                last_recommendation_at
-            FROM recommendation_stats
-            WHERE user_id = %s
-        """
-        result = execute_query(query, (user_id,))
+        result = await execute_statement(USER_STATS_QUERY, (user_id,))
 
         if result:
             return {
@@ -636,8 +879,15 @@ async def generate_recommendations(
         )
 
         logger.info(f"Dell server generated recommendations: {result}")
+        feed_cache.invalidate(current_user['user_id'])
         return result
 
+    except DellServerError as e:
+        logger.error(f"Dell server unavailable for recommendation generation: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Recommendation service is temporarily unavailable"
+        )
     except Exception as e:
         logger.error(f"Error generating recommendations from Dell server: {e}")
         raise HTTPException(
@@ -646,42 +896,6 @@ async def generate_recommendations(
         )
 
 
-async def sync_recommendations_from_dell(user_id: int) -> int:
-    """
-    Fetch recommendations from Dell server API and cache locally
-    This is called when user has no local recommendations
-    """
-    try:
-        logger.info(f"Syncing recommendations from Dell server for user {user_id}")
-
-        # Get user's token (we need to fetch/create Dell server token)
-        # For now, we'll need to get the user's email and create a session
-        user_query = "SELECT email FROM users WHERE id = %s"
-        user_data = execute_query(user_query, (user_id,))
-
-        if not user_data:
-            logger.error(f"User {user_id} not found in database")
-            return 0
-
-        user_email = user_data[0][0]
-
-        # TODO: Implement proper token management between Oracle and Dell servers
-        # For now, we'll assume the user is authenticated on Dell server
-        # In production, you should:
-        # 1. Store Dell server token in Oracle database
-        # 2. Refresh Dell token when needed
-        # 3. Handle authentication errors gracefully
-
-        logger.warning("Dell server sync requires SSH tunnel and proper authentication")
-        logger.info("Please ensure SSH tunnel is running: ssh -L 8001:localhost:8000 -J opc@129.153.226.112 campuslens@localhost -p 3333")
-
-        return 0
-
-    except Exception as e:
-        logger.error(f"Error syncing from Dell server: {e}")
-        return 0
-
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
@@ -0,0 +1,268 @@
+"""
+Prometheus metrics for the API
+
+Counters, gauges and histograms are plain Python numbers updated on the
+event loop thread. An update never awaits between reading and writing a
+value, so recording a sample needs no lock. render() produces the
+Prometheus text format served at /metrics; components that already keep
+their own stats() are exported at scrape time through collectors.
+
+MetricsMiddleware labels requests by route template (/recommendations,
+not /recommendations?page=2), so label cardinality stays bounded.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+from starlette.routing import Match
+from query_tracing import add_query_listener, current_trace
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (sample name, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+# (name, type, help, samples) as returned by collectors
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label values"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        return [
+            (self.name, dict(zip(self.labelnames, labels)), value)
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, per label values"""
+
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram:
+    """Bucketed distribution of observations per label values"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        for labels, (counts, total, count) in self._values.items():
+            base = dict(zip(self.labelnames, labels))
+            samples.extend(histogram_samples(self.name, base, self.buckets, counts, total))
+        return samples
+
+
+def histogram_samples(
+    name: str,
+    labels: Dict[str, str],
+    buckets: Iterable[float],
+    counts: List[int],
+    total: float
+) -> List[Sample]:
+    """
+    Build the cumulative _bucket, _sum and _count samples of a histogram
+
+    Args:
+        name: Metric name
+        labels: Labels shared by every sample
+        buckets: Bucket upper bounds
+        counts: Non-cumulative count per bucket, with the +Inf bucket last
+        total: Sum of all observations
+    """
+    samples = []
+    cumulative = 0
+    for bound, bucket_count in zip(list(buckets) + [float("inf")], counts):
+        cumulative += bucket_count
+        samples.append((f"{name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+    samples.append((f"{name}_sum", labels, total))
+    samples.append((f"{name}_count", labels, cumulative))
+    return samples
+
+
+class MetricsRegistry:
+    """Metrics owned by the API plus collectors for component stats"""
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Register a function returning metric families at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        families = [(m.name, m.type, m.documentation, m.samples()) for m in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+
+        lines = []
+        for name, metric_type, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response is sent", ("method", "route")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("method", "route")
+)
+http_request_db_time = registry.histogram(
+    "http_request_db_seconds", "Time each HTTP request spent in database queries", ("method", "route")
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "Database statement execution latency", ("database",)
+)
+add_query_listener(lambda database, seconds: db_query_duration.observe(seconds, database))
+rate_limit_decision_duration = registry.histogram(
+    "rate_limit_decision_seconds", "Time taken to reach a rate limit decision", ("backend",)
+)
+rate_limit_decisions = registry.counter(
+    "rate_limit_decisions_total", "Rate limit decisions; exceeded decisions name the window", ("decision",)
+)
+dell_api_request_duration = registry.histogram(
+    "dell_api_request_duration_seconds", "Dell server API call latency, including retries",
+    ("method", "path", "outcome")
+)
+
+
+def route_template(scope) -> str:
+    """Path template of the route matching a request, or "unmatched" """
+    partial = None
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        start = time.perf_counter()
+        status_code = 500
+        finished = False
+        http_requests_in_flight.inc(method, route)
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            http_requests_in_flight.dec(method, route)
+            http_requests.inc(method, route, str(status_code))
+            http_request_duration.observe(time.perf_counter() - start, method, route)
+            # Query time comes from the request's trace (query_tracing)
+            trace = current_trace()
+            http_request_db_time.observe(trace.db_seconds if trace else 0.0, method, route)
+
+        async def send_with_metrics(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            # Background tasks run after this; they are not part of the latency
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            finish()
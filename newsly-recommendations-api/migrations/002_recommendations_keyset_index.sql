@@ -0,0 +1,10 @@
+-- Migration 002: Composite index for keyset pagination of GET /recommendations
+-- The feed is ordered by (relevance_score DESC, created_at DESC, id DESC); this
+-- index lets a cursor seek straight to the next page instead of scanning and
+-- discarding every earlier row with OFFSET.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_recommendations_user_keyset
+    ON user_recommendations(user_id, relevance_score DESC, created_at DESC, id DESC);
+
+-- Superseded: the keyset index has the same leading columns
+DROP INDEX CONCURRENTLY IF EXISTS idx_user_recommendations_user_score;
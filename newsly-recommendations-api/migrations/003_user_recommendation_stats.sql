@@ -0,0 +1,42 @@
+-- Migration 003: Incrementally maintained per-user recommendation counters
+-- GET /stats previously aggregated the whole of user_recommendations through
+-- the recommendation_stats view on every call. The counters below are updated
+-- by the write paths instead and read with a primary-key lookup.
+
+CREATE TABLE IF NOT EXISTS user_recommendation_stats (
+    user_id INTEGER PRIMARY KEY,
+    total_recommendations INTEGER NOT NULL DEFAULT 0,
+    served_count INTEGER NOT NULL DEFAULT 0,
+    clicked_count INTEGER NOT NULL DEFAULT 0,
+    relevance_score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    last_recommendation_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Backfill from existing recommendations (same query as reconcile_stats())
+BEGIN;
+LOCK TABLE user_recommendation_stats IN SHARE ROW EXCLUSIVE MODE;
+INSERT INTO user_recommendation_stats (
+    user_id, total_recommendations, served_count, clicked_count,
+    relevance_score_sum, last_recommendation_at, updated_at
+)
+SELECT
+    user_id,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE served = TRUE),
+    COUNT(*) FILTER (WHERE clicked = TRUE),
+    COALESCE(SUM(relevance_score), 0),
+    MAX(created_at),
+    NOW()
+FROM user_recommendations
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET
+    total_recommendations = EXCLUDED.total_recommendations,
+    served_count = EXCLUDED.served_count,
+    clicked_count = EXCLUDED.clicked_count,
+    relevance_score_sum = EXCLUDED.relevance_score_sum,
+    last_recommendation_at = EXCLUDED.last_recommendation_at,
+    updated_at = NOW();
+COMMIT;
+
+GRANT ALL PRIVILEGES ON user_recommendation_stats TO newsly_user;
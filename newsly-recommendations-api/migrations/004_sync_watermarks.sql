@@ -0,0 +1,14 @@
+-- Migration 004: High-water marks for incremental Dell replication
+-- The change feed stores the highest Dell user_recommendations.id it has
+-- copied here, in the same transaction as the copied rows, and only pulls
+-- rows above it on the next run. Deleting a scope's row forces a full
+-- resync for it.
+
+CREATE TABLE IF NOT EXISTS sync_watermarks (
+    scope TEXT PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    last_created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+GRANT ALL PRIVILEGES ON sync_watermarks TO newsly_user;
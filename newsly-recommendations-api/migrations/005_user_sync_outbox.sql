@@ -0,0 +1,32 @@
+-- Migration 005: Transactional outbox for Dell user writes
+-- UserService inserts an event here in the same transaction as each users
+-- insert or profile update; outbox_relay.py applies the events to the Dell
+-- users_personalized table and marks them processed.
+
+CREATE TABLE IF NOT EXISTS user_sync_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    event_type TEXT NOT NULL,  -- 'user_created', 'profile_updated'
+    payload JSONB NOT NULL DEFAULT '{}',
+    idempotency_key TEXT UNIQUE NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    processed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- The relay only ever scans pending events
+CREATE INDEX IF NOT EXISTS idx_user_sync_outbox_pending
+    ON user_sync_outbox(user_id, id) WHERE processed_at IS NULL;
+
+-- Cleanup function for relayed events
+CREATE OR REPLACE FUNCTION cleanup_processed_outbox()
+RETURNS void AS $$
+BEGIN
+    DELETE FROM user_sync_outbox WHERE processed_at < NOW() - INTERVAL '7 days';
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT ALL PRIVILEGES ON user_sync_outbox TO newsly_user;
+GRANT ALL PRIVILEGES ON SEQUENCE user_sync_outbox_id_seq TO newsly_user;
@@ -0,0 +1,8 @@
+-- Migration 006: Dead-letter state for the user sync outbox
+-- Events that exhaust OUTBOX_MAX_ATTEMPTS are marked failed instead of
+-- staying pending, so they no longer block later events for the same user.
+-- To retry failed events:
+--   UPDATE user_sync_outbox SET failed_at = NULL, attempts = 0, next_attempt_at = NOW()
+--   WHERE failed_at IS NOT NULL AND processed_at IS NULL;
+
+ALTER TABLE user_sync_outbox ADD COLUMN IF NOT EXISTS failed_at TIMESTAMP WITH TIME ZONE;
@@ -0,0 +1,8 @@
+-- Migration 007: Sync claim lease on users
+-- The background scheduler claims due users by setting sync_claimed_at and
+-- releases them after the batch. last_synced_at is only advanced by a
+-- completed sync, in the same transaction as the copied rows, so a worker
+-- that dies mid-sync no longer skips the rows it never copied. A claim left
+-- behind by such a worker expires after SYNC_USER_INTERVAL_SECONDS.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS sync_claimed_at TIMESTAMP WITH TIME ZONE;
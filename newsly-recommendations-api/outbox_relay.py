@@ -0,0 +1,346 @@
+"""
+Transactional outbox relay for Dell user writes
+
+UserService records a user_sync_outbox event in the same local
+transaction as each users insert or profile update, so a committed local
+change is never lost and registration no longer waits on the Dell
+database. This relay drains the outbox to users_personalized in batches:
+
+- Events are claimed with FOR UPDATE SKIP LOCKED, oldest first, and only
+  the oldest pending event per user, so a user's events apply in order.
+- Each event is applied in its own Dell transaction and is idempotent:
+  creates reuse an existing users_personalized row with the same email,
+  and profile updates copy the user's current local values.
+- Failed events are retried with exponential backoff up to
+  OUTBOX_MAX_ATTEMPTS, keeping the last error for inspection. Events that
+  exhaust their attempts are dead-lettered (failed_at is set, and an
+  error is logged) so they stop blocking the user's later events.
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+from async_database import dell_database_available, get_db_connection, get_db_cursor
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+USER_CREATED = "user_created"
+PROFILE_UPDATED = "profile_updated"
+
+# Profile columns that also exist on users_personalized
+DELL_PROFILE_FIELDS = (
+    "name", "age_range", "education_level", "primary_interests",
+    "secondary_interests", "political_orientation", "credibility_threshold"
+)
+
+ENQUEUE_QUERY = """
+    INSERT INTO user_sync_outbox (user_id, event_type, payload, idempotency_key)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (idempotency_key) DO NOTHING
+"""
+
+CLAIM_QUERY = """
+    SELECT o.id, o.user_id, o.event_type, o.payload, o.attempts
+    FROM user_sync_outbox o
+    WHERE o.processed_at IS NULL
+      AND o.failed_at IS NULL
+      AND o.next_attempt_at <= NOW()
+      AND NOT EXISTS (
+          SELECT 1 FROM user_sync_outbox p
+          WHERE p.user_id = o.user_id AND p.processed_at IS NULL AND p.failed_at IS NULL AND p.id < o.id
+      )
+    ORDER BY o.id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+RECORD_FAILURES_QUERY = """
+    UPDATE user_sync_outbox o
+    SET attempts = o.attempts + 1,
+        last_error = f.error,
+        next_attempt_at = NOW() + make_interval(
+            secs => LEAST(%(backoff)s * power(2, o.attempts), 3600)
+        ),
+        failed_at = CASE WHEN o.attempts + 1 >= %(max_attempts)s THEN NOW() END
+    FROM unnest(%(ids)s::bigint[], %(errors)s::text[]) AS f(id, error)
+    WHERE o.id = f.id
+    RETURNING o.id, o.user_id, o.event_type, o.failed_at IS NOT NULL
+"""
+
+# Dead-letters events left over from a higher OUTBOX_MAX_ATTEMPTS, then counts failed events
+DEAD_LETTER_QUERY = """
+    WITH exhausted AS (
+        UPDATE user_sync_outbox
+        SET failed_at = NOW()
+        WHERE processed_at IS NULL AND failed_at IS NULL AND attempts >= %s
+        RETURNING id
+    )
+    -- The count cannot see the rows updated above, so they are added
+    SELECT
+        (SELECT COUNT(*) FROM exhausted),
+        (SELECT COUNT(*) FROM exhausted)
+        + (SELECT COUNT(*) FROM user_sync_outbox WHERE processed_at IS NULL AND failed_at IS NOT NULL)
+"""
+
+DELL_CREATE_QUERY = """
+    WITH existing AS (
+        SELECT id FROM users_personalized WHERE email = %s ORDER BY id LIMIT 1
+    ),
+    created AS (
+        INSERT INTO users_personalized (email, name, password_hash, created_at)
+        SELECT %s, %s, %s, NOW()
+        WHERE NOT EXISTS (SELECT 1 FROM existing)
+        RETURNING id
+    )
+    SELECT id FROM created
+    UNION ALL
+    SELECT id FROM existing
+"""
+
+
+async def enqueue_user_event(cursor, user_id: int, event_type: str, payload, idempotency_key: str):
+    """
+    Record an outbox event inside the caller's transaction
+
+    Args:
+        cursor: Cursor of the transaction making the local change
+        user_id: Local user ID
+        event_type: USER_CREATED or PROFILE_UPDATED
+        payload: Jsonb-wrapped event data
+        idempotency_key: Unique key; a repeated key is ignored
+    """
+    await cursor.execute(ENQUEUE_QUERY, (user_id, event_type, payload, idempotency_key))
+
+
+class OutboxRelay:
+    """Background task draining user_sync_outbox to the Dell database"""
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        poll_interval_seconds: float = 1.0,
+        max_attempts: int = 10,
+        backoff_seconds: float = 5.0,
+        dead_letter_check_seconds: float = 60.0
+    ):
+        self.batch_size = batch_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.dead_letter_check_seconds = dead_letter_check_seconds
+        self._next_dead_letter_check = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        # Metrics
+        self.relayed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        # Failed (dead-lettered) events in the table, as of the last check
+        self.failed_events = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+
+    def notify(self):
+        """Wake the relay after committing new events"""
+        self._wakeup.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._closing = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                # Keep draining while full batches come back
+                while not self._closing and await self.relay_batch() >= self.batch_size:
+                    pass
+                if time.monotonic() >= self._next_dead_letter_check:
+                    self._next_dead_letter_check = time.monotonic() + self.dead_letter_check_seconds
+                    await self.check_dead_letters()
+            except Exception as e:
+                logger.error(f"Outbox relay error: {e}")
+
+    async def check_dead_letters(self) -> int:
+        """
+        Dead-letter events past max_attempts and refresh the failed count
+
+        Returns:
+            Number of failed events waiting for an operator
+        """
+        async with get_db_cursor() as cursor:
+            await cursor.execute(DEAD_LETTER_QUERY, (self.max_attempts,))
+            exhausted, failed_events = await cursor.fetchone()
+
+        if exhausted:
+            self.dead_lettered += exhausted
+            logger.error(f"Outbox relay: dead-lettered {exhausted} events past {self.max_attempts} attempts")
+        if failed_events and failed_events != self.failed_events:
+            logger.error(
+                f"Outbox relay: {failed_events} failed events need attention "
+                f"(see last_error in user_sync_outbox WHERE failed_at IS NOT NULL)"
+            )
+        self.failed_events = failed_events
+        return failed_events
+
+    async def relay_batch(self) -> int:
+        """
+        Claim and apply one batch of outbox events
+
+        Returns:
+            Number of events claimed
+        """
+        if not dell_database_available():
+            return 0
+
+        start = time.perf_counter()
+        async with get_db_cursor() as cursor:
+            await cursor.execute(CLAIM_QUERY, (self.batch_size,))
+            events = await cursor.fetchall()
+            if not events:
+                return 0
+
+            await cursor.execute(
+                f"""
+                SELECT id, email, name, password_hash, dell_server_user_id, {', '.join(DELL_PROFILE_FIELDS)}
+                FROM users WHERE id = ANY(%s)
+                """,
+                (list({event[1] for event in events}),)
+            )
+            columns = [c.name for c in cursor.description]
+            users = {row[0]: dict(zip(columns, row)) for row in await cursor.fetchall()}
+
+            done, failures, dell_ids = await self._apply(events, users)
+
+            if done:
+                await cursor.execute(
+                    "UPDATE user_sync_outbox SET processed_at = NOW(), last_error = NULL WHERE id = ANY(%s)",
+                    (done,)
+                )
+            dead = []
+            if failures:
+                await cursor.execute(RECORD_FAILURES_QUERY, {
+                    "backoff": self.backoff_seconds,
+                    "max_attempts": self.max_attempts,
+                    "ids": list(failures.keys()),
+                    "errors": list(failures.values()),
+                })
+                dead = [row[:3] for row in await cursor.fetchall() if row[3]]
+            if dell_ids:
+                await cursor.execute("""
+                    UPDATE users u
+                    SET dell_server_user_id = d.dell_id
+                    FROM unnest(%s::int[], %s::int[]) AS d(id, dell_id)
+                    WHERE u.id = d.id
+                """, (list(dell_ids.keys()), list(dell_ids.values())))
+
+        if dell_ids:
+            # Imported here: user_service imports this module
+            from user_service import user_profile_cache
+            user_profile_cache.invalidate(dell_ids.keys())
+
+        self.batches += 1
+        self.relayed += len(done)
+        self.failed += len(failures)
+        self.last_batch_ms = (time.perf_counter() - start) * 1000
+        if failures:
+            logger.warning(f"Outbox relay: {len(done)} events applied, {len(failures)} failed")
+        if dead:
+            self.dead_lettered += len(dead)
+            self.failed_events += len(dead)
+            for event_id, user_id, event_type in dead:
+                logger.error(
+                    f"Outbox event {event_id} ({event_type} for user {user_id}) failed "
+                    f"{self.max_attempts} times and was dead-lettered: {failures[event_id]}"
+                )
+        return len(events)
+
+    async def _apply(self, events, users: Dict[int, dict]):
+        """Apply claimed events on the Dell database, one transaction each"""
+        done, failures, dell_ids = [], {}, {}
+
+        try:
+            async with get_db_connection(use_dell_server=True) as dell_conn:
+                for event_id, user_id, event_type, payload, _ in events:
+                    user = users.get(user_id)
+                    if user is None:
+                        # User deleted locally; nothing left to sync
+                        done.append(event_id)
+                        continue
+                    try:
+                        async with dell_conn.transaction():
+                            dell_id = await self._apply_event(dell_conn, event_type, payload, user)
+                    except Exception as e:
+                        failures[event_id] = str(e)[:500]
+                        continue
+                    done.append(event_id)
+                    if dell_id and dell_id != user["dell_server_user_id"]:
+                        dell_ids[user_id] = dell_id
+                        user["dell_server_user_id"] = dell_id
+        except Exception as e:
+            # Dell unreachable: everything not yet applied is retried later
+            applied = set(done)
+            for event in events:
+                if event[0] not in applied:
+                    failures.setdefault(event[0], str(e)[:500])
+
+        return done, failures, dell_ids
+
+    @staticmethod
+    async def _apply_event(dell_conn, event_type: str, payload: dict, user: dict) -> Optional[int]:
+        if event_type == USER_CREATED:
+            row = await (await dell_conn.execute(
+                DELL_CREATE_QUERY,
+                (user["email"], user["email"], user["name"], user["password_hash"])
+            )).fetchone()
+            logger.info(f"Synced user {user['email']} to Dell server (ID: {row[0]})")
+            return row[0]
+
+        if event_type == PROFILE_UPDATED:
+            if not user["dell_server_user_id"]:
+                raise Exception("User has no Dell server account yet")
+            fields = [f for f in DELL_PROFILE_FIELDS if f in payload.get("fields", [])]
+            if fields:
+                set_clause = ", ".join(f"{field} = %s" for field in fields)
+                await dell_conn.execute(
+                    f"UPDATE users_personalized SET {set_clause} WHERE id = %s",
+                    [user[field] for field in fields] + [user["dell_server_user_id"]]
+                )
+            return None
+
+        raise Exception(f"Unknown outbox event type {event_type}")
+
+    def stats(self) -> dict:
+        return {
+            "relayed": self.relayed,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+            "failed_events": self.failed_events,
+            "batches": self.batches,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+        }
+
+
+outbox_relay = OutboxRelay(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval_seconds=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    backoff_seconds=settings.OUTBOX_BACKOFF_SECONDS
+)
@@ -0,0 +1,148 @@
+"""Async password hashing on a bounded worker pool
+
+bcrypt is deliberately slow (~200ms per call at cost 12), so hashing and
+verification run on a thread or process pool instead of the event loop.
+The number of in-flight calls is capped; once the pool and its queue are
+full, callers get a 429 instead of piling up behind a login burst.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from auth import get_password_hash, verify_password
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_hash(password: str) -> Tuple[str, float]:
+    """Hash a password and report the time spent in bcrypt"""
+    start = time.perf_counter()
+    hashed = get_password_hash(password)
+    return hashed, time.perf_counter() - start
+
+
+def _timed_verify(plain_password: str, hashed_password: str) -> Tuple[bool, float]:
+    """Verify a password and report the time spent in bcrypt"""
+    start = time.perf_counter()
+    valid = verify_password(plain_password, hashed_password)
+    return valid, time.perf_counter() - start
+
+
+class LatencyStats:
+    """Call count and latency summary over a window of recent samples"""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self._recent.append(seconds)
+
+    def quantiles(self, *fractions: float) -> Tuple[float, ...]:
+        """Latency at each fraction of the recent window, in seconds"""
+        recent = sorted(self._recent)
+        if not recent:
+            return tuple(0.0 for _ in fractions)
+        return tuple(recent[min(len(recent) - 1, int(p * len(recent)))] for p in fractions)
+
+    def snapshot(self) -> dict:
+        p50, p95, p99 = self.quantiles(0.50, 0.95, 0.99)
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_seconds / self.count * 1000, 2) if self.count else 0,
+            "p50_ms": round(p50 * 1000, 2),
+            "p95_ms": round(p95 * 1000, 2),
+            "p99_ms": round(p99 * 1000, 2),
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+class PasswordHasher:
+    """Bounded async front-end for bcrypt hashing and verification"""
+
+    def __init__(self, workers: int = 4, max_queue: int = 32, use_processes: bool = False):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self.use_processes = use_processes
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+        # Time spent in bcrypt itself, per operation
+        self.hash_stats = LatencyStats()
+        self.verify_stats = LatencyStats()
+        # Queue wait plus bcrypt time, as seen by the request
+        self.wait_stats = LatencyStats()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _submit(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning(f"Password hashing pool saturated ({self.pending} in flight)")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many authentication requests. Please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+            self.wait_stats.observe(time.perf_counter() - start)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password without blocking the event loop"""
+        hashed, seconds = await self._submit(_timed_hash, password)
+        self.hash_stats.observe(seconds)
+        return hashed
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password without blocking the event loop"""
+        valid, seconds = await self._submit(_timed_verify, plain_password, hashed_password)
+        self.verify_stats.observe(seconds)
+        return valid
+
+    def stats(self) -> dict:
+        return {
+            "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+            "workers": self.workers,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "hash": self.hash_stats.snapshot(),
+            "verify": self.verify_stats.snapshot(),
+            "end_to_end": self.wait_stats.snapshot(),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES
+)
@@ -0,0 +1,205 @@
+"""
+Per-request database query tracing
+
+Pooled connections create TracedAsyncCursor cursors, so every statement
+(from execute_query(), execute_statement() or a cursor opened in
+get_db_cursor()) is timed and charged to the current request through a
+contextvar. QueryTracingMiddleware opens one RequestTrace per request;
+when a request is slow, runs many queries, or repeats the same query
+shape (an N+1 candidate, e.g. one lookup per row of a list), it logs a
+single JSON line with the query count, DB time and slowest statement.
+"""
+import json
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+from psycopg import AsyncCursor
+import logging
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+@lru_cache(maxsize=1024)
+def query_shape(sql: str) -> str:
+    """Normalize a statement so calls differing only in literals compare equal"""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _sql_text(query) -> str:
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    return str(query)
+
+
+class RequestTrace:
+    """Queries run on behalf of one HTTP request"""
+
+    __slots__ = ("queries", "db_seconds", "slowest_seconds", "slowest_sql", "shapes")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_sql = ""
+        # query shape -> executions in this request
+        self.shapes: Dict[str, int] = {}
+
+    def record(self, sql: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_sql = sql
+        shape = query_shape(sql)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def n_plus_one_candidates(self, threshold: int) -> Dict[str, int]:
+        """Query shapes executed at least threshold times"""
+        if threshold <= 0:
+            return {}
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+_paused: ContextVar[bool] = ContextVar("query_tracing_paused", default=False)
+_listeners: List[Callable[[str, float], None]] = []
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """Trace of the request being handled, or None outside a request"""
+    return _current_trace.get()
+
+
+def add_query_listener(listener: Callable[[str, float], None]):
+    """Call listener(database, seconds) after every traced statement"""
+    _listeners.append(listener)
+
+
+@contextmanager
+def tracing_paused():
+    """Do not record statements run inside this block (e.g. pool health checks)"""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def record_query(database: str, query, seconds: float):
+    """Charge one statement to the current request and notify listeners"""
+    if _paused.get():
+        return
+    for listener in _listeners:
+        listener(database, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(_sql_text(query), seconds)
+
+
+class TracedAsyncCursor(AsyncCursor):
+    """Cursor timing each execute()/executemany() for the current request"""
+
+    database = "local"
+
+    async def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            record_query(self.database, query, time.perf_counter() - start)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            record_query(self.database, query, time.perf_counter() - start)
+
+
+class DellTracedAsyncCursor(TracedAsyncCursor):
+    database = "dell"
+
+
+def _truncate(sql: str, length: int = 300) -> str:
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    return sql if len(sql) <= length else sql[:length] + "..."
+
+
+class QueryTracingMiddleware:
+    """ASGI middleware opening a RequestTrace per request and logging outliers"""
+
+    def __init__(
+        self,
+        app,
+        slow_request_ms: float = 500,
+        max_queries: int = 20,
+        n_plus_one_threshold: int = 5
+    ):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.max_queries = max_queries
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        response_ms = None
+        status_code = 500
+
+        async def send_traced(message):
+            nonlocal response_ms, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            _current_trace.reset(token)
+            if response_ms is None:
+                response_ms = (time.perf_counter() - start) * 1000
+            self._report(scope, status_code, response_ms, trace)
+
+    def _report(self, scope, status_code: int, response_ms: float, trace: RequestTrace):
+        """Log the trace if the request crossed a threshold"""
+        candidates = trace.n_plus_one_candidates(self.n_plus_one_threshold)
+        slow = self.slow_request_ms > 0 and response_ms >= self.slow_request_ms
+        chatty = self.max_queries > 0 and trace.queries >= self.max_queries
+        if not (slow or chatty or candidates):
+            return
+
+        logger.warning("request_trace " + json.dumps({
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(response_ms, 2),
+            "queries": trace.queries,
+            "db_ms": round(trace.db_seconds * 1000, 2),
+            "slowest_ms": round(trace.slowest_seconds * 1000, 2),
+            "slowest_sql": _truncate(trace.slowest_sql),
+            "slow": slow,
+            "too_many_queries": chatty,
+            "n_plus_one": [
+                {"count": count, "sql": _truncate(shape)}
+                for shape, count in sorted(candidates.items(), key=lambda item: -item[1])
+            ],
+        }))
+
@@ -1,72 +1,135 @@
-"""Rate limiting middleware"""
+"""Rate limiting middleware with pluggable storage backends"""
+import asyncio
+import errno
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 from fastapi import Request, HTTPException, status
-from database import execute_query
+from async_database import execute_statement, statements
+from config import settings
+from metrics import rate_limit_decision_duration, rate_limit_decisions
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Window name -> window length in seconds
+WINDOW_SECONDS = {"minute": 60, "hour": 3600}
+# Window name -> position of its [window_index, current, previous] counters
+WINDOW_INDEX = {window: i for i, window in enumerate(WINDOW_SECONDS)}
+# Returned when a non-blocking lock attempt finds the lock taken
+_CONTENDED = object()
 
-class RateLimiter:
-    """Rate limiter using database storage"""
 
-    def __init__(self, requests_per_minute: int = 60, requests_per_hour: int = 1000):
-        self.requests_per_minute = requests_per_minute
-        self.requests_per_hour = requests_per_hour
+def _sliding_estimate(slots, base: int, length: int, now: float) -> float:
+    """Roll the window forward if needed and return the sliding count"""
+    index = int(now // length)
+    current_index = slots[base]
 
-    async def __call__(self, request: Request):
-        """Check rate limit for request"""
-        # Get identifier (user_id or IP address)
-        identifier = self._get_identifier(request)
-        endpoint = request.url.path
+    if index != current_index:
+        # Previous window only counts if it is the one immediately before
+        slots[base + 2] = slots[base + 1] if index == current_index + 1 else 0
+        slots[base + 1] = 0
+        slots[base] = index
 
-        # Check minute limit
-        if not self._check_limit(identifier, endpoint, "minute", self.requests_per_minute):
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Rate limit exceeded. Please try again later."
-            )
+    overlap = 1.0 - (now % length) / length
+    return slots[base + 2] * overlap + slots[base + 1]
 
-        # Check hour limit
-        if not self._check_limit(identifier, endpoint, "hour", self.requests_per_hour):
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Hourly rate limit exceeded. Please try again later."
-            )
 
-        # Record request
-        self._record_request(identifier, endpoint)
+def _apply_hit(slots, offset: int, limits: Tuple[Tuple[str, int], ...], now: float) -> Optional[str]:
+    """
+    Check every window of a counter record and count the request if allowed
 
-    def _get_identifier(self, request: Request) -> str:
-        """Get identifier for rate limiting (user_id or IP)"""
-        # Try to get user_id from request state (set by auth middleware)
-        if hasattr(request.state, "user") and request.state.user:
-            return f"user_{request.state.user.get('user_id')}"
+    Args:
+        slots: Mutable sequence holding [window_index, current, previous] per window
+        offset: Position of the first window counter in slots
+        limits: (window, limit) pairs, checked in order
+        now: Current unix time
 
-        # Fall back to IP address
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            return f"ip_{forwarded.split(',')[0].strip()}"
-        return f"ip_{request.client.host}"
+    Returns:
+        Name of the first exceeded window, or None if the request was counted
+    """
+    for window, limit in limits:
+        base = offset + 3 * WINDOW_INDEX[window]
+        if _sliding_estimate(slots, base, WINDOW_SECONDS[window], now) >= limit:
+            return window
+
+    for window, _ in limits:
+        slots[offset + 3 * WINDOW_INDEX[window] + 1] += 1
+    return None
+
+
+# Run on every rate-limited request; prepared once per pooled connection
+RATE_LIMIT_COUNT_QUERY = statements.register("rate_limit_count", """
+    SELECT COALESCE(SUM(request_count), 0) as total
+    FROM rate_limits
+    WHERE identifier = %s
+      AND endpoint = %s
+      AND window_start >= %s
+""")
+RATE_LIMIT_RECORD_QUERY = statements.register("rate_limit_record", """
+    INSERT INTO rate_limits (identifier, endpoint, request_count, window_start)
+    VALUES (%s, %s, 1, %s)
+    ON CONFLICT (identifier, endpoint, window_start)
+    DO UPDATE SET request_count = rate_limits.request_count + 1
+""")
+RATE_LIMIT_FLUSH_QUERY = statements.register("rate_limit_flush", """
+    INSERT INTO rate_limits (identifier, endpoint, request_count, window_start)
+    SELECT * FROM unnest(%s::text[], %s::text[], %s::int[], %s::timestamptz[])
+    ON CONFLICT (identifier, endpoint, window_start)
+    DO UPDATE SET request_count = rate_limits.request_count + EXCLUDED.request_count
+""")
+
+
+class RateLimitBackend:
+    """Base class for rate limit storage backends"""
+
+    async def start(self):
+        """Start any background work owned by the backend"""
 
-    def _check_limit(self, identifier: str, endpoint: str, window: str, limit: int) -> bool:
+    async def stop(self):
+        """Stop background work and flush pending state"""
+
+    async def hit(self, identifier: str, endpoint: str, limits: Tuple[Tuple[str, int], ...]) -> Optional[str]:
+        """
+        Check all windows and record the request if it is allowed
+
+        Args:
+            identifier: user_<id> or ip_<address>
+            endpoint: Request path
+            limits: (window, limit) pairs, checked in order
+
+        Returns:
+            Name of the first exceeded window, or None if the request is allowed
+        """
+        raise NotImplementedError
+
+
+class PostgresRateLimitBackend(RateLimitBackend):
+    """Rate limit backend that counts requests in the rate_limits table"""
+
+    async def hit(self, identifier: str, endpoint: str, limits: Tuple[Tuple[str, int], ...]) -> Optional[str]:
+        for window, limit in limits:
+            if not await self._check_limit(identifier, endpoint, window, limit):
+                return window
+
+        await self._record_request(identifier, endpoint)
+        return None
+
+    async def _check_limit(self, identifier: str, endpoint: str, window: str, limit: int) -> bool:
         """Check if request is within rate limit"""
         try:
             # Calculate window start time
-            if window == "minute":
-                window_start = datetime.now() - timedelta(minutes=1)
-            else:  # hour
-                window_start = datetime.now() - timedelta(hours=1)
+            window_start = datetime.now() - timedelta(seconds=WINDOW_SECONDS[window])
 
             # Count requests in window
-            query = """
-                SELECT COALESCE(SUM(request_count), 0) as total
-                FROM rate_limits
-                WHERE identifier = %s
-                  AND endpoint = %s
-                  AND window_start >= %s
-            """
-            result = execute_query(query, (identifier, endpoint, window_start))
+            result = await execute_statement(RATE_LIMIT_COUNT_QUERY, (identifier, endpoint, window_start))
 
             if result and len(result) > 0:
                 total_requests = result[0][0]
@@ -79,20 +142,352 @@ class RateLimiter:
             # On error, allow request (fail open for better UX)
             return True
 
-    def _record_request(self, identifier: str, endpoint: str):
+    async def _record_request(self, identifier: str, endpoint: str):
         """Record a request for rate limiting"""
         try:
             # Round to current minute for aggregation
             window_start = datetime.now().replace(second=0, microsecond=0)
 
-            query = """
-                INSERT INTO rate_limits (identifier, endpoint, request_count, window_start)
-                VALUES (%s, %s, 1, %s)
-                ON CONFLICT (identifier, endpoint, window_start)
-                DO UPDATE SET request_count = rate_limits.request_count + 1
-            """
-            execute_query(query, (identifier, endpoint, window_start), fetch=False)
+            await execute_statement(
+                RATE_LIMIT_RECORD_QUERY, (identifier, endpoint, window_start), fetch=False
+            )
 
         except Exception as e:
             logger.error(f"Error recording request: {e}")
             # Continue even if recording fails
+
+
+class RateLimitPersistence:
+    """
+    Write-behind persistence of request counts into rate_limits
+
+    Counts are aggregated per (identifier, endpoint, minute) in memory and
+    written with one multi-row upsert per flush interval.
+    """
+
+    def __init__(self, flush_interval_seconds: float = 10.0):
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending: Dict[Tuple[str, str, datetime], int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, identifier: str, endpoint: str):
+        """Count a request against the current minute"""
+        key = (identifier, endpoint, datetime.now().replace(second=0, microsecond=0))
+        self._pending[key] = self._pending.get(key, 0) + 1
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    async def flush(self):
+        """Write all pending counts in a single upsert"""
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        identifiers, endpoints, window_starts = zip(*pending.keys())
+
+        try:
+            await execute_statement(
+                RATE_LIMIT_FLUSH_QUERY,
+                (list(identifiers), list(endpoints), list(pending.values()), list(window_starts)),
+                fetch=False
+            )
+        except Exception as e:
+            logger.error(f"Error flushing rate limit counts ({len(pending)} rows dropped): {e}")
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    In-process sliding-window counter
+
+    Each (identifier, endpoint) keeps, per window, the current and previous
+    fixed-window counts; the sliding estimate weights the previous count by
+    how much of it still overlaps the window. Checks are O(1) and the number
+    of tracked keys is bounded, evicting the least recently seen first.
+    """
+
+    def __init__(self, max_keys: int = 100_000, persistence: Optional[RateLimitPersistence] = None):
+        self.max_keys = max_keys
+        self.persistence = persistence
+        # key -> flat [window_index, current, previous] per configured window
+        self._counters: "OrderedDict[Tuple[str, str], list]" = OrderedDict()
+
+    async def start(self):
+        if self.persistence:
+            await self.persistence.start()
+
+    async def stop(self):
+        if self.persistence:
+            await self.persistence.stop()
+
+    async def hit(self, identifier: str, endpoint: str, limits: Tuple[Tuple[str, int], ...]) -> Optional[str]:
+        now = time.time()
+        key = (identifier, endpoint)
+
+        slots = self._counters.get(key)
+        if slots is None:
+            slots = [0] * (3 * len(WINDOW_SECONDS))
+            self._counters[key] = slots
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        else:
+            self._counters.move_to_end(key)
+
+        exceeded = _apply_hit(slots, 0, limits, now)
+        if exceeded is None and self.persistence:
+            self.persistence.record(identifier, endpoint)
+        return exceeded
+
+
+class SharedMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Sliding-window counter shared by every worker process on the host
+
+    Counters live in a memory-mapped file (normally under /dev/shm) laid out
+    as a set-associative table: a key hashes to one bucket of a few slots,
+    the bucket is locked with an fcntl byte-range lock for the
+    read-modify-write, and a full bucket recycles its least recently seen
+    slot. Limits therefore hold across uvicorn/gunicorn workers without
+    touching Postgres.
+
+    The file name carries the table size and slot layout
+    (<path>.<slots>x<slot bytes>), so workers started with a different
+    RATE_LIMIT_SHM_SLOTS during a rolling restart map a new file instead
+    of resizing one that older workers still have mapped; an existing
+    file is never resized.
+
+    A bucket lock is held only while its slots are updated in memory (no
+    I/O, no awaits), so it is released within microseconds. The event loop
+    only ever tries locks without blocking; a contended hit waits for them
+    in a worker thread instead.
+    """
+
+    SLOTS_PER_BUCKET = 8
+    # key_hash, last_seen, then [window_index, current, previous] per window
+    SLOT = struct.Struct("<Qd" + "q" * (3 * len(WINDOW_SECONDS)))
+
+    def __init__(
+        self,
+        path: str,
+        slots: int = 65536,
+        persistence: Optional[RateLimitPersistence] = None
+    ):
+        self.buckets = max(1, slots // self.SLOTS_PER_BUCKET)
+        self.path = f"{path}.{self.buckets * self.SLOTS_PER_BUCKET}x{self.SLOT.size}"
+        self.bucket_size = self.SLOT.size * self.SLOTS_PER_BUCKET
+        self.persistence = persistence
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        # fcntl locks are per process, so threads in one worker also need this
+        self._thread_lock = threading.Lock()
+
+    def _open(self):
+        size = self.buckets * self.bucket_size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != size:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+                try:
+                    # Only size a file we just created; another size means
+                    # another layout that other workers may have mapped
+                    actual = os.fstat(fd).st_size
+                    if actual == 0:
+                        os.ftruncate(fd, size)
+                    elif actual != size:
+                        raise RuntimeError(
+                            f"{self.path} is {actual} bytes, expected {size}; refusing to resize a mapped table"
+                        )
+                finally:
+                    fcntl.lockf(fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._map = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        logger.info(f"Shared rate limit table mapped at {self.path} ({size} bytes)")
+
+    async def start(self):
+        if self._map is None:
+            self._open()
+        if self.persistence:
+            await self.persistence.start()
+
+    async def stop(self):
+        if self.persistence:
+            await self.persistence.stop()
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+            self._map = None
+            self._fd = None
+
+    @staticmethod
+    def _key_hash(identifier: str, endpoint: str) -> int:
+        digest = hashlib.blake2b(f"{identifier}\0{endpoint}".encode(), digest_size=8).digest()
+        # Zero marks an empty slot
+        return int.from_bytes(digest, "little") or 1
+
+    async def hit(self, identifier: str, endpoint: str, limits: Tuple[Tuple[str, int], ...]) -> Optional[str]:
+        if self._map is None:
+            self._open()
+
+        key_hash = self._key_hash(identifier, endpoint)
+        bucket_offset = (key_hash % self.buckets) * self.bucket_size
+
+        exceeded = self._locked_hit(bucket_offset, key_hash, limits, blocking=False)
+        if exceeded is _CONTENDED:
+            # Wait for the locks off the event loop
+            exceeded = await asyncio.to_thread(self._locked_hit, bucket_offset, key_hash, limits, True)
+
+        if exceeded is None and self.persistence:
+            self.persistence.record(identifier, endpoint)
+        return exceeded
+
+    def _locked_hit(
+        self,
+        bucket_offset: int,
+        key_hash: int,
+        limits: Tuple[Tuple[str, int], ...],
+        blocking: bool
+    ):
+        """
+        Apply a hit under the thread and bucket locks
+
+        Returns:
+            The exceeded window or None, or _CONTENDED if blocking is False
+            and a lock is held elsewhere
+        """
+        if not self._thread_lock.acquire(blocking=blocking):
+            return _CONTENDED
+        try:
+            try:
+                fcntl.lockf(
+                    self._fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB,
+                    self.bucket_size, bucket_offset
+                )
+            except OSError as e:
+                if not blocking and e.errno in (errno.EACCES, errno.EAGAIN):
+                    return _CONTENDED
+                raise
+            try:
+                return self._hit_bucket(bucket_offset, key_hash, limits)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.bucket_size, bucket_offset)
+        finally:
+            self._thread_lock.release()
+
+    def _hit_bucket(self, bucket_offset: int, key_hash: int, limits: Tuple[Tuple[str, int], ...]) -> Optional[str]:
+        """Find or claim the key's slot in a locked bucket and apply the hit"""
+        now = time.time()
+        target = None
+        oldest_offset, oldest_seen = bucket_offset, float("inf")
+
+        for i in range(self.SLOTS_PER_BUCKET):
+            offset = bucket_offset + i * self.SLOT.size
+            slot_hash, last_seen = struct.unpack_from("<Qd", self._map, offset)
+            if slot_hash == key_hash:
+                target = list(self.SLOT.unpack_from(self._map, offset))
+                break
+            if last_seen < oldest_seen:
+                oldest_offset, oldest_seen = offset, last_seen
+
+        if target is None:
+            # Claim an empty slot (last_seen 0) or recycle the idlest one
+            offset = oldest_offset
+            target = [key_hash] + [0] * (self.SLOT.size // 8 - 1)
+
+        target[1] = now
+        exceeded = _apply_hit(target, 2, limits, now)
+        self.SLOT.pack_into(self._map, offset, *target)
+        return exceeded
+
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    """Build the backend selected by RATE_LIMIT_BACKEND"""
+    if settings.RATE_LIMIT_BACKEND == "postgres":
+        return PostgresRateLimitBackend()
+
+    persistence = None
+    if settings.RATE_LIMIT_PERSIST:
+        persistence = RateLimitPersistence(settings.RATE_LIMIT_FLUSH_INTERVAL_SECONDS)
+
+    if settings.RATE_LIMIT_BACKEND == "shared":
+        return SharedMemoryRateLimitBackend(
+            settings.RATE_LIMIT_SHM_PATH,
+            settings.RATE_LIMIT_SHM_SLOTS,
+            persistence
+        )
+    return InMemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS, persistence)
+
+
+class RateLimiter:
+    """Rate limiter dependency backed by a pluggable storage backend"""
+
+    def __init__(
+        self,
+        requests_per_minute: int = 60,
+        requests_per_hour: int = 1000,
+        backend: Optional[RateLimitBackend] = None
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_hour = requests_per_hour
+        self.limits = (("minute", requests_per_minute), ("hour", requests_per_hour))
+        self.backend = backend or create_rate_limit_backend()
+        self.backend_name = type(self.backend).__name__
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    async def __call__(self, request: Request):
+        """Check rate limit for request"""
+        # Get identifier (user_id or IP address)
+        identifier = self._get_identifier(request)
+        endpoint = request.url.path
+
+        start = time.perf_counter()
+        exceeded = await self.backend.hit(identifier, endpoint, self.limits)
+        rate_limit_decision_duration.observe(time.perf_counter() - start, self.backend_name)
+        rate_limit_decisions.inc(exceeded or "allowed")
+
+        if exceeded == "minute":
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded. Please try again later."
+            )
+
+        if exceeded == "hour":
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Hourly rate limit exceeded. Please try again later."
+            )
+
+    def _get_identifier(self, request: Request) -> str:
+        """Get identifier for rate limiting (user_id or IP)"""
+        # Try to get user_id from request state (set by auth middleware)
+        if hasattr(request.state, "user") and request.state.user:
+            return f"user_{request.state.user.get('user_id')}"
+
+        # Fall back to IP address
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return f"ip_{forwarded.split(',')[0].strip()}"
+        return f"ip_{request.client.host}"
@@ -0,0 +1,169 @@
+"""
+Incrementally maintained per-user recommendation counters
+
+user_recommendation_stats replaces the recommendation_stats view on the
+read path: GET /stats becomes a primary-key lookup instead of a GROUP BY
+over user_recommendations. The write paths that insert recommendations or
+flip served/clicked apply their deltas in the same statement, and
+reconcile_stats() rebuilds every row in bulk to repair any drift.
+
+The rebuild blocks counter writes while it runs, so it belongs in one
+process, not every API worker: run it from cron or as its own service,
+or set STATS_RECONCILER_ENABLED=true to run it inside the API. An
+advisory lock keeps concurrent runs from rebuilding twice.
+
+Run directly to reconcile once (e.g. from cron), or every
+STATS_RECONCILE_INTERVAL_SECONDS with --loop:
+    python recommendation_stats.py
+    python recommendation_stats.py --loop
+"""
+import asyncio
+from typing import Optional
+from async_database import get_db_cursor
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Appended to a `WITH inserted AS (INSERT INTO user_recommendations ...
+# RETURNING user_id, relevance_score, created_at)` clause
+STATS_UPSERT_FROM_INSERTED = """
+    INSERT INTO user_recommendation_stats (
+        user_id, total_recommendations, relevance_score_sum, last_recommendation_at
+    )
+    SELECT user_id, COUNT(*), SUM(relevance_score), MAX(created_at)
+    FROM inserted
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_recommendations = user_recommendation_stats.total_recommendations + EXCLUDED.total_recommendations,
+        relevance_score_sum = user_recommendation_stats.relevance_score_sum + EXCLUDED.relevance_score_sum,
+        last_recommendation_at = GREATEST(user_recommendation_stats.last_recommendation_at, EXCLUDED.last_recommendation_at),
+        updated_at = NOW()
+"""
+
+# Appended to a CTE named `transitions` that yields one user_id per
+# recommendation whose flag went from FALSE to TRUE
+STATS_ADD_SERVED = """
+    INSERT INTO user_recommendation_stats (user_id, served_count)
+    SELECT user_id, COUNT(*) FROM transitions GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        served_count = user_recommendation_stats.served_count + EXCLUDED.served_count,
+        updated_at = NOW()
+"""
+
+STATS_ADD_CLICKED = """
+    INSERT INTO user_recommendation_stats (user_id, clicked_count)
+    SELECT user_id, COUNT(*) FROM transitions GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        clicked_count = user_recommendation_stats.clicked_count + EXCLUDED.clicked_count,
+        updated_at = NOW()
+"""
+
+# Advisory lock held for the rebuild transaction
+RECONCILE_LOCK_NAME = "recommendation_stats.reconcile"
+
+
+async def reconcile_stats() -> Optional[int]:
+    """
+    Rebuild every user's counters from user_recommendations
+
+    The counter table is locked against concurrent increments for the
+    duration, so writes that commit during the rebuild are applied on top
+    of it rather than lost.
+
+    Returns:
+        Number of users whose counters were rebuilt, or None if another
+        process is already reconciling
+    """
+    async with get_db_cursor() as cursor:
+        await cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (RECONCILE_LOCK_NAME,))
+        if not (await cursor.fetchone())[0]:
+            logger.info("Recommendation stats are being reconciled elsewhere, skipping")
+            return None
+        await cursor.execute("LOCK TABLE user_recommendation_stats IN SHARE ROW EXCLUSIVE MODE")
+        await cursor.execute("""
+            INSERT INTO user_recommendation_stats (
+                user_id, total_recommendations, served_count, clicked_count,
+                relevance_score_sum, last_recommendation_at, updated_at
+            )
+            SELECT
+                user_id,
+                COUNT(*),
+                COUNT(*) FILTER (WHERE served = TRUE),
+                COUNT(*) FILTER (WHERE clicked = TRUE),
+                COALESCE(SUM(relevance_score), 0),
+                MAX(created_at),
+                NOW()
+            FROM user_recommendations
+            GROUP BY user_id
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_recommendations = EXCLUDED.total_recommendations,
+                served_count = EXCLUDED.served_count,
+                clicked_count = EXCLUDED.clicked_count,
+                relevance_score_sum = EXCLUDED.relevance_score_sum,
+                last_recommendation_at = EXCLUDED.last_recommendation_at,
+                updated_at = NOW()
+        """)
+        rebuilt = cursor.rowcount
+        await cursor.execute("""
+            DELETE FROM user_recommendation_stats s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM user_recommendations r WHERE r.user_id = s.user_id
+            )
+        """)
+
+    logger.info(f"Reconciled recommendation stats for {rebuilt} users")
+    return rebuilt
+
+
+class StatsReconciler:
+    """Runs reconcile_stats() periodically"""
+
+    def __init__(self, interval_seconds: float = 3600):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await reconcile_stats()
+            except Exception as e:
+                logger.error(f"Error reconciling recommendation stats: {e}")
+
+
+stats_reconciler = StatsReconciler(settings.STATS_RECONCILE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    import sys
+    from async_database import init_async_pools, close_async_pools
+
+    async def main():
+        await init_async_pools()
+        try:
+            if "--loop" in sys.argv:
+                await stats_reconciler._run()
+            else:
+                await reconcile_stats()
+        finally:
+            await close_async_pools()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,431 @@
+"""
+Set-based recommendation sync from the Dell server
+
+A user's recent Dell recommendations are streamed through a server-side
+cursor and written locally in chunks: one multi-row upsert into
+article_cache and one into user_recommendations per chunk, all inside a
+single local transaction. Recommendations keep their Dell created_at, so
+re-syncing the same rows is a no-op instead of a duplicate insert.
+
+Alternatively, the change feed (pull_change_feed) replicates every user's
+new Dell rows at once by following a high-water mark on the Dell
+user_recommendations.id, stored in sync_watermarks in the same
+transaction as the rows it covers. Its cost scales with new data rather
+than with the lookback window; full_resync() rebuilds from the window and
+re-seeds the watermark when there is none or it can no longer be trusted.
+Both hold a session advisory lock for their whole run, so when every API
+worker runs the change feed only one of them pulls (or resyncs) at a time
+and the others skip the cycle.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from async_database import execute_query, get_db_connection, get_db_cursor
+from config import settings
+from article_metadata_cache import article_metadata_cache, upsert_article_cache
+from feed_cache import feed_cache
+from recommendation_stats import STATS_UPSERT_FROM_INSERTED
+import logging
+
+logger = logging.getLogger(__name__)
+
+DELL_RECOMMENDATION_COLUMNS = """
+    SELECT
+        r.article_id,
+        r.relevance_score,
+        r.score_breakdown::text,
+        r.recommendation_reason,
+        r.algorithm_version,
+        r.created_at,
+        a.title,
+        a.source,
+        a.url,
+        a.published_at,
+        a.description
+    FROM user_recommendations r
+    JOIN news_articles a ON r.article_id = a.id
+"""
+
+# Full window: the user's best SYNC_MAX_ROWS_PER_USER recommendations
+DELL_RECOMMENDATIONS_QUERY = DELL_RECOMMENDATION_COLUMNS + """
+    WHERE r.user_id = %s
+      AND r.created_at > NOW() - make_interval(days => %s)
+    ORDER BY r.relevance_score DESC
+    LIMIT %s
+"""
+
+# Incremental: every row created since the watermark, oldest first and
+# uncapped, so a burst larger than SYNC_MAX_ROWS_PER_USER is never skipped
+DELL_NEW_RECOMMENDATIONS_QUERY = DELL_RECOMMENDATION_COLUMNS + """
+    WHERE r.user_id = %s
+      AND r.created_at > GREATEST(NOW() - make_interval(days => %s), %s::timestamptz)
+    ORDER BY r.created_at, r.id
+"""
+
+RECOMMENDATION_UPSERT = """
+    WITH inserted AS (
+        INSERT INTO user_recommendations (
+            user_id, article_id, relevance_score, score_breakdown,
+            recommendation_reason, algorithm_version, created_at
+        )
+        SELECT %s::int, s.article_id, s.relevance_score, s.score_breakdown::jsonb,
+               s.recommendation_reason, s.algorithm_version, s.created_at
+        FROM unnest(
+            %s::int[], %s::real[], %s::text[], %s::text[], %s::text[], %s::timestamptz[]
+        ) AS s(article_id, relevance_score, score_breakdown,
+               recommendation_reason, algorithm_version, created_at)
+        ON CONFLICT (user_id, article_id, created_at) DO NOTHING
+        RETURNING user_id, relevance_score, created_at
+    ),
+    stats AS (""" + STATS_UPSERT_FROM_INSERTED + """)
+    SELECT COUNT(*) FROM inserted
+"""
+
+
+async def _write_chunk(cursor, user_id: int, rows: List[tuple], timings: Dict[str, float]) -> int:
+    """Upsert one chunk of Dell rows; returns the number of new recommendations"""
+    start = time.perf_counter()
+    await upsert_article_cache(cursor, ((row[0],) + row[6:11] for row in rows))
+    timings["article_upsert"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = [list(c) for c in zip(*(row[0:6] for row in rows))]
+    await cursor.execute(RECOMMENDATION_UPSERT, [user_id] + columns)
+    inserted = (await cursor.fetchone())[0]
+    timings["recommendation_upsert"] += time.perf_counter() - start
+
+    return inserted
+
+
+async def sync_user_recommendations(
+    user_id: int,
+    dell_user_id: Optional[int] = None,
+    since: Optional[datetime] = None
+) -> dict:
+    """
+    Copy a user's recent Dell recommendations into the local database
+
+    Args:
+        user_id: Local user ID
+        dell_user_id: The user's ID on the Dell server; looked up if omitted
+        since: Fetch every recommendation created after this time (still
+            bounded by SYNC_LOOKBACK_DAYS); None fetches the user's top
+            SYNC_MAX_ROWS_PER_USER recommendations in the whole window
+
+    Returns:
+        Dict with fetched/inserted/articles counts and per-phase timings_ms
+    """
+    timings = {
+        "lookup": 0.0, "fetch": 0.0, "article_upsert": 0.0,
+        "recommendation_upsert": 0.0, "commit": 0.0
+    }
+    result = {"user_id": user_id, "fetched": 0, "inserted": 0, "articles": 0}
+    started = time.perf_counter()
+
+    if dell_user_id is None:
+        rows = await execute_query("SELECT dell_server_user_id FROM users WHERE id = %s", (user_id,))
+        dell_user_id = rows[0][0] if rows else None
+        timings["lookup"] = time.perf_counter() - started
+        if dell_user_id is None:
+            logger.warning(f"User {user_id} has no Dell server account, skipping sync")
+            return {**result, "timings_ms": _to_ms(timings, started)}
+
+    article_ids = set()
+    async with get_db_connection(use_dell_server=True) as dell_conn:
+        try:
+            async with get_db_cursor() as cursor:
+                async with dell_conn.cursor(name=f"sync_user_{user_id}") as dell_cursor:
+                    start = time.perf_counter()
+                    if since is None:
+                        await dell_cursor.execute(
+                            DELL_RECOMMENDATIONS_QUERY,
+                            (dell_user_id, settings.SYNC_LOOKBACK_DAYS, settings.SYNC_MAX_ROWS_PER_USER)
+                        )
+                    else:
+                        # Streamed in SYNC_FETCH_SIZE chunks until exhausted
+                        await dell_cursor.execute(
+                            DELL_NEW_RECOMMENDATIONS_QUERY,
+                            (dell_user_id, settings.SYNC_LOOKBACK_DAYS, since)
+                        )
+                    while True:
+                        rows = await dell_cursor.fetchmany(settings.SYNC_FETCH_SIZE)
+                        timings["fetch"] += time.perf_counter() - start
+                        if not rows:
+                            break
+                        result["fetched"] += len(rows)
+                        article_ids.update(row[0] for row in rows)
+                        result["inserted"] += await _write_chunk(cursor, user_id, rows, timings)
+                        start = time.perf_counter()
+
+                await cursor.execute("UPDATE users SET last_synced_at = NOW() WHERE id = %s", (user_id,))
+                commit_start = time.perf_counter()
+            timings["commit"] = time.perf_counter() - commit_start
+        finally:
+            # The Dell side is read-only; end its snapshot
+            await dell_conn.rollback()
+
+    result["articles"] = len(article_ids)
+    article_metadata_cache.invalidate(article_ids)
+    if result["inserted"]:
+        feed_cache.invalidate(user_id)
+
+    result["timings_ms"] = _to_ms(timings, started)
+    logger.info(
+        f"Synced user {user_id}: {result['inserted']}/{result['fetched']} new recommendations, "
+        f"{result['articles']} articles, timings_ms={result['timings_ms']}"
+    )
+    return result
+
+
+def _to_ms(timings: Dict[str, float], started: float) -> Dict[str, float]:
+    timings_ms = {phase: round(seconds * 1000, 2) for phase, seconds in timings.items()}
+    timings_ms["total"] = round((time.perf_counter() - started) * 1000, 2)
+    return timings_ms
+
+
+CHANGE_FEED_SCOPE = "user_recommendations"
+
+DELL_CHANGES_QUERY = """
+    SELECT
+        r.id,
+        r.user_id,
+        r.article_id,
+        r.relevance_score,
+        r.score_breakdown::text,
+        r.recommendation_reason,
+        r.algorithm_version,
+        r.created_at,
+        a.title,
+        a.source,
+        a.url,
+        a.published_at,
+        a.description
+    FROM user_recommendations r
+    JOIN news_articles a ON r.article_id = a.id
+    WHERE r.id > %s
+      AND r.created_at > NOW() - make_interval(days => %s)
+    ORDER BY r.id
+    LIMIT %s
+"""
+
+# Dell user IDs are mapped to local users; rows for unlinked users are skipped
+CHANGES_UPSERT = """
+    WITH inserted AS (
+        INSERT INTO user_recommendations (
+            user_id, article_id, relevance_score, score_breakdown,
+            recommendation_reason, algorithm_version, created_at
+        )
+        SELECT u.id, s.article_id, s.relevance_score, s.score_breakdown::jsonb,
+               s.recommendation_reason, s.algorithm_version, s.created_at
+        FROM unnest(
+            %s::int[], %s::int[], %s::real[], %s::text[], %s::text[], %s::text[], %s::timestamptz[]
+        ) AS s(dell_user_id, article_id, relevance_score, score_breakdown,
+               recommendation_reason, algorithm_version, created_at)
+        JOIN users u ON u.dell_server_user_id = s.dell_user_id
+        ON CONFLICT (user_id, article_id, created_at) DO NOTHING
+        RETURNING user_id, relevance_score, created_at
+    ),
+    stats AS (""" + STATS_UPSERT_FROM_INSERTED + """)
+    SELECT user_id, COUNT(*) FROM inserted GROUP BY user_id
+"""
+
+STORE_WATERMARK = """
+    INSERT INTO sync_watermarks (scope, last_id, last_created_at, updated_at)
+    VALUES (%s, %s, %s, NOW())
+    ON CONFLICT (scope) DO UPDATE SET
+        last_id = GREATEST(sync_watermarks.last_id, EXCLUDED.last_id),
+        last_created_at = GREATEST(sync_watermarks.last_created_at, EXCLUDED.last_created_at),
+        updated_at = NOW()
+"""
+
+
+# Session advisory lock serializing pull_change_feed() and full_resync()
+CHANGE_FEED_LOCK_NAME = "recommendation_sync.change_feed"
+
+
+@asynccontextmanager
+async def change_feed_lock():
+    """
+    Try to take the change feed lock for the duration of the block
+
+    The lock is held by a pooled connection that sits idle (outside any
+    transaction) until the block exits; if the process dies, the server
+    releases it with the connection.
+
+    Yields:
+        True if this process holds the lock, False if another one does
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (CHANGE_FEED_LOCK_NAME,))
+        acquired = (await cursor.fetchone())[0]
+        await conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await conn.execute("SELECT pg_advisory_unlock(hashtext(%s))", (CHANGE_FEED_LOCK_NAME,))
+                await conn.commit()
+
+
+async def get_watermark(scope: str = CHANGE_FEED_SCOPE) -> Optional[tuple]:
+    """Return (last_id, last_created_at) for a scope, or None if never synced"""
+    rows = await execute_query(
+        "SELECT last_id, last_created_at FROM sync_watermarks WHERE scope = %s", (scope,)
+    )
+    return rows[0] if rows else None
+
+
+async def pull_change_feed() -> dict:
+    """
+    Replicate Dell recommendations created since the stored watermark
+
+    Reads from SYNC_WATERMARK_OVERLAP_IDS below the watermark, since Dell
+    IDs can commit out of order; re-read rows are ignored on insert. Falls
+    back to full_resync() when there is no watermark or the Dell table has
+    been rebuilt below it. Skipped if another process holds the change
+    feed lock.
+
+    Returns:
+        Dict with fetched/inserted/users counts, batches and timings_ms,
+        and skipped=True if another process was already pulling
+    """
+    async with change_feed_lock() as acquired:
+        if not acquired:
+            logger.info("Change feed is being pulled by another process, skipping")
+            return {"fetched": 0, "inserted": 0, "users": 0, "batches": 0, "skipped": True}
+        return await _pull_change_feed()
+
+
+async def _pull_change_feed() -> dict:
+    watermark = await get_watermark()
+    dell_max = (await execute_query(
+        "SELECT COALESCE(MAX(id), 0) FROM user_recommendations", use_dell_server=True
+    ))[0][0]
+
+    if watermark is None or dell_max < watermark[0]:
+        logger.warning(f"Change feed watermark {watermark} unusable (Dell max id {dell_max}), running full resync")
+        return await _full_resync(settings.SYNC_CONCURRENCY)
+
+    timings = {"fetch": 0.0, "write": 0.0}
+    result = {"fetched": 0, "inserted": 0, "users": 0, "batches": 0}
+    touched = set()
+    last_id = max(0, watermark[0] - settings.SYNC_WATERMARK_OVERLAP_IDS)
+    started = time.perf_counter()
+
+    while True:
+        start = time.perf_counter()
+        rows = await execute_query(
+            DELL_CHANGES_QUERY,
+            (last_id, settings.SYNC_LOOKBACK_DAYS, settings.SYNC_FETCH_SIZE),
+            use_dell_server=True
+        )
+        timings["fetch"] += time.perf_counter() - start
+        if not rows:
+            break
+
+        start = time.perf_counter()
+        async with get_db_cursor() as cursor:
+            await upsert_article_cache(cursor, ((row[2],) + row[8:13] for row in rows))
+            columns = [list(c) for c in zip(*(row[1:8] for row in rows))]
+            await cursor.execute(CHANGES_UPSERT, columns)
+            for user_id, inserted in await cursor.fetchall():
+                touched.add(user_id)
+                result["inserted"] += inserted
+            # Advance the watermark in the same transaction as the rows
+            last_id = rows[-1][0]
+            await cursor.execute(STORE_WATERMARK, (CHANGE_FEED_SCOPE, last_id, rows[-1][7]))
+        timings["write"] += time.perf_counter() - start
+        article_metadata_cache.invalidate(row[2] for row in rows)
+
+        result["fetched"] += len(rows)
+        result["batches"] += 1
+        if len(rows) < settings.SYNC_FETCH_SIZE:
+            break
+
+    for user_id in touched:
+        feed_cache.invalidate(user_id)
+
+    result["users"] = len(touched)
+    result["timings_ms"] = _to_ms(timings, started)
+    logger.info(
+        f"Change feed: {result['inserted']}/{result['fetched']} new recommendations for "
+        f"{result['users']} users up to id {last_id}, timings_ms={result['timings_ms']}"
+    )
+    return result
+
+
+async def full_resync(concurrency: Optional[int] = None) -> dict:
+    """
+    Resync every linked user's lookback window and re-seed the watermark
+
+    The watermark is taken before the per-user syncs start, so rows created
+    while they run are picked up by the next pull_change_feed(). A user whose
+    sync fails does not stop the others; failures are logged and returned,
+    and those users catch up on their next per-user or on-demand sync.
+
+    Args:
+        concurrency: Users synced at once; defaults to SYNC_CONCURRENCY
+
+    Returns:
+        Dict with users/inserted/failed counts, failed_users (user ID to
+        error), the new watermark and timings_ms, and skipped=True if
+        another process holds the change feed lock
+    """
+    async with change_feed_lock() as acquired:
+        if not acquired:
+            logger.info("Change feed is being pulled by another process, skipping full resync")
+            return {"users": 0, "inserted": 0, "failed": 0, "failed_users": {}, "watermark": None, "skipped": True}
+        return await _full_resync(concurrency)
+
+
+async def _full_resync(concurrency: Optional[int] = None) -> dict:
+    started = time.perf_counter()
+    dell_max, dell_max_created = (await execute_query(
+        "SELECT COALESCE(MAX(id), 0), MAX(created_at) FROM user_recommendations",
+        use_dell_server=True
+    ))[0]
+    users = await execute_query(
+        "SELECT id, dell_server_user_id FROM users WHERE is_active = TRUE AND dell_server_user_id IS NOT NULL"
+    )
+
+    semaphore = asyncio.Semaphore(concurrency or settings.SYNC_CONCURRENCY)
+
+    async def sync_one(user_id: int, dell_user_id: int) -> int:
+        async with semaphore:
+            return (await sync_user_recommendations(user_id, dell_user_id))["inserted"]
+
+    outcomes = await asyncio.gather(
+        *(sync_one(uid, dell_uid) for uid, dell_uid in users),
+        return_exceptions=True
+    )
+    inserted, failed_users = 0, {}
+    for (user_id, _), outcome in zip(users, outcomes):
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+        if isinstance(outcome, BaseException):
+            failed_users[user_id] = str(outcome)[:200]
+        else:
+            inserted += outcome
+
+    # Reset rather than GREATEST: a rebuilt Dell table restarts its IDs
+    async with get_db_cursor() as cursor:
+        await cursor.execute("DELETE FROM sync_watermarks WHERE scope = %s", (CHANGE_FEED_SCOPE,))
+        await cursor.execute(STORE_WATERMARK, (CHANGE_FEED_SCOPE, dell_max, dell_max_created))
+
+    result = {
+        "users": len(users) - len(failed_users),
+        "inserted": inserted,
+        "failed": len(failed_users),
+        "failed_users": failed_users,
+        "watermark": dell_max,
+        "timings_ms": {"total": round((time.perf_counter() - started) * 1000, 2)},
+    }
+    logger.info(f"Full resync: {result['inserted']} new recommendations for {result['users']} users, watermark {dell_max}")
+    if failed_users:
+        logger.error(
+            f"Full resync: {len(failed_users)} users failed, e.g. "
+            + ", ".join(f"{uid}: {error}" for uid, error in list(failed_users.items())[:5])
+        )
+    return result
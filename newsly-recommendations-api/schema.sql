@@ -78,12 +78,52 @@ CREATE TABLE IF NOT EXISTS rate_limits (
     UNIQUE(identifier, endpoint, window_start)
 );
 
+-- Per-user recommendation counters
+-- Maintained incrementally by the insert/served/clicked write paths so
+-- GET /stats is a primary-key lookup; rebuilt by recommendation_stats.py
+CREATE TABLE IF NOT EXISTS user_recommendation_stats (
+    user_id INTEGER PRIMARY KEY,
+    total_recommendations INTEGER NOT NULL DEFAULT 0,
+    served_count INTEGER NOT NULL DEFAULT 0,
+    clicked_count INTEGER NOT NULL DEFAULT 0,
+    relevance_score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    last_recommendation_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Incremental sync high-water marks
+-- Highest Dell row copied per replication scope (see recommendation_sync.py)
+CREATE TABLE IF NOT EXISTS sync_watermarks (
+    scope TEXT PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    last_created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Transactional outbox for Dell user writes
+-- Written in the same transaction as each users insert or profile update;
+-- drained by outbox_relay.py. Events that exhaust their retries get failed_at
+CREATE TABLE IF NOT EXISTS user_sync_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    event_type TEXT NOT NULL,  -- 'user_created', 'profile_updated'
+    payload JSONB NOT NULL DEFAULT '{}',
+    idempotency_key TEXT UNIQUE NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    processed_at TIMESTAMP WITH TIME ZONE,
+    failed_at TIMESTAMP WITH TIME ZONE
+);
+
 -- Performance Indexes
 -- Optimized for fast queries on user_id and created_at
 
 -- User recommendations indexes
 CREATE INDEX IF NOT EXISTS idx_user_recommendations_user_id ON user_recommendations(user_id);
-CREATE INDEX IF NOT EXISTS idx_user_recommendations_user_score ON user_recommendations(user_id, relevance_score DESC);
+-- Serves both OFFSET paging and keyset seeks on (relevance_score, created_at, id)
+CREATE INDEX IF NOT EXISTS idx_user_recommendations_user_keyset ON user_recommendations(user_id, relevance_score DESC, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_user_recommendations_served ON user_recommendations(served, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_user_recommendations_user_served ON user_recommendations(user_id, served, created_at DESC);
 
@@ -103,6 +143,9 @@ CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions(expires_at
 -- Rate limits indexes
 CREATE INDEX IF NOT EXISTS idx_rate_limits_identifier ON rate_limits(identifier, endpoint, window_start);
 
+-- Outbox indexes (the relay only ever scans pending events)
+CREATE INDEX IF NOT EXISTS idx_user_sync_outbox_pending ON user_sync_outbox(user_id, id) WHERE processed_at IS NULL;
+
 -- Automatic cleanup function for expired sessions
 CREATE OR REPLACE FUNCTION cleanup_expired_sessions()
 RETURNS void AS $$
@@ -127,7 +170,16 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Cleanup function for relayed outbox events
+CREATE OR REPLACE FUNCTION cleanup_processed_outbox()
+RETURNS void AS $$
+BEGIN
+    DELETE FROM user_sync_outbox WHERE processed_at < NOW() - INTERVAL '7 days';
+END;
+$$ LANGUAGE plpgsql;
+
 -- View for recommendation statistics
+-- Kept for ad-hoc queries; the API reads user_recommendation_stats instead
 CREATE OR REPLACE VIEW recommendation_stats AS
 SELECT
     user_id,
@@ -0,0 +1,253 @@
+"""
+Background Dell sync scheduler
+
+Keeps active users' local recommendations fresh so GET /recommendations
+never waits on a cross-server sync. Each cycle claims a batch of users that
+are due (never synced, or not synced for SYNC_USER_INTERVAL_SECONDS) with
+FOR UPDATE SKIP LOCKED, so several API workers or a standalone scheduler
+can run side by side without syncing the same user twice. A claim is a
+sync_claimed_at lease, released after the batch; last_synced_at is only
+advanced by a completed sync, so a crash mid-cycle never skips rows.
+Users are synced incrementally from their last_synced_at watermark with
+bounded concurrency, and cycles are spaced by a jittered interval.
+
+With SYNC_MODE=change_feed, each cycle instead replicates all users' new
+Dell rows past a global watermark (see recommendation_sync.pull_change_feed);
+an advisory lock lets only one process pull per cycle.
+
+Requests for a user with an empty feed jump the queue via request().
+
+Run standalone (with SYNC_SCHEDULER_ENABLED=false on the API workers):
+    python sync_scheduler.py
+    python sync_scheduler.py --full-resync
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from async_database import execute_query, dell_database_available
+from config import settings
+from recommendation_sync import full_resync, pull_change_feed, sync_user_recommendations
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLAIM_DUE_USERS_QUERY = """
+    WITH due AS (
+        SELECT id, dell_server_user_id, last_synced_at
+        FROM users
+        WHERE is_active = TRUE
+          AND dell_server_user_id IS NOT NULL
+          AND (last_synced_at IS NULL OR last_synced_at < NOW() - make_interval(secs => %s))
+          AND (last_login_at > NOW() - make_interval(days => %s) OR last_synced_at IS NULL)
+          -- Skip users another worker is syncing; an abandoned claim expires
+          AND (sync_claimed_at IS NULL OR sync_claimed_at < NOW() - make_interval(secs => %s))
+        ORDER BY last_synced_at ASC NULLS FIRST, last_login_at DESC NULLS LAST
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE users u
+    SET sync_claimed_at = NOW()
+    FROM due
+    WHERE u.id = due.id
+    RETURNING u.id, due.dell_server_user_id, due.last_synced_at
+"""
+
+RELEASE_CLAIMS_QUERY = "UPDATE users SET sync_claimed_at = NULL WHERE id = ANY(%s)"
+
+
+class SyncScheduler:
+    """Periodically syncs due users from the Dell server"""
+
+    def __init__(
+        self,
+        interval_seconds: float = 300,
+        user_interval_seconds: float = 900,
+        batch_size: int = 50,
+        concurrency: int = 4,
+        jitter: float = 0.2,
+        active_days: int = 30,
+        watermark_overlap_seconds: float = 300,
+        on_demand_cooldown_seconds: float = 60,
+        mode: str = "per_user"
+    ):
+        self.mode = mode
+        self.interval_seconds = interval_seconds
+        self.user_interval_seconds = user_interval_seconds
+        self.batch_size = batch_size
+        self.jitter = jitter
+        self.active_days = active_days
+        self.watermark_overlap = timedelta(seconds=watermark_overlap_seconds)
+        self.on_demand_cooldown_seconds = on_demand_cooldown_seconds
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight: Set[int] = set()
+        self._requested: Dict[int, float] = {}
+        self._on_demand: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        # Metrics
+        self.cycles = 0
+        self.synced_users = 0
+        self.inserted = 0
+        self.failures = 0
+        self.last_cycle_ms = 0.0
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._closing = True
+        tasks = list(self._on_demand)
+        if self._task:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def request(self, user_id: int):
+        """Sync a user in the background now, e.g. because their feed is empty"""
+        now = time.monotonic()
+        if user_id in self._in_flight or now - self._requested.get(user_id, 0) < self.on_demand_cooldown_seconds:
+            return
+        self._requested[user_id] = now
+        if len(self._requested) > 10000:
+            cutoff = now - self.on_demand_cooldown_seconds
+            self._requested = {uid: t for uid, t in self._requested.items() if t >= cutoff}
+
+        task = asyncio.create_task(self._sync_user(user_id))
+        self._on_demand.add(task)
+        task.add_done_callback(self._on_demand.discard)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.error(f"Sync cycle failed: {e}")
+            delay = self.interval_seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+            await asyncio.sleep(delay)
+
+    async def run_cycle(self) -> int:
+        """
+        Run one sync cycle in the configured SYNC_MODE
+
+        Returns:
+            Number of users synced or updated
+        """
+        if not dell_database_available():
+            logger.info("Dell server database unavailable, skipping sync cycle")
+            return 0
+
+        if self.mode == "change_feed":
+            start = time.perf_counter()
+            result = await pull_change_feed()
+            self.cycles += 1
+            self.inserted += result["inserted"]
+            self.failures += result.get("failed", 0)
+            self.last_cycle_ms = (time.perf_counter() - start) * 1000
+            return result["users"]
+        return await self.sync_due_users()
+
+    async def sync_due_users(self) -> int:
+        """
+        Claim and sync one batch of due users
+
+        Returns:
+            Number of users synced successfully
+        """
+        start = time.perf_counter()
+        due = await execute_query(
+            CLAIM_DUE_USERS_QUERY,
+            (self.user_interval_seconds, self.active_days, self.user_interval_seconds, self.batch_size)
+        )
+        try:
+            results = await asyncio.gather(*(
+                self._sync_user(user_id, dell_user_id, last_synced_at)
+                for user_id, dell_user_id, last_synced_at in due
+            ))
+        finally:
+            # Synced users advanced their own last_synced_at; failed ones are
+            # due again next cycle
+            if due:
+                await execute_query(RELEASE_CLAIMS_QUERY, ([row[0] for row in due],), fetch=False)
+
+        synced = sum(results)
+        self.cycles += 1
+        self.last_cycle_ms = (time.perf_counter() - start) * 1000
+        if due:
+            logger.info(f"Sync cycle: {synced}/{len(due)} users synced in {self.last_cycle_ms:.0f}ms")
+        return synced
+
+    async def _sync_user(
+        self,
+        user_id: int,
+        dell_user_id: Optional[int] = None,
+        last_synced_at: Optional[datetime] = None
+    ) -> bool:
+        if user_id in self._in_flight:
+            return False
+
+        # Re-read a little before the watermark to cover clock skew and
+        # late-committing Dell rows; overlapping rows are ignored on insert
+        since = last_synced_at - self.watermark_overlap if last_synced_at else None
+
+        self._in_flight.add(user_id)
+        try:
+            async with self._semaphore:
+                result = await sync_user_recommendations(user_id, dell_user_id, since)
+            self.synced_users += 1
+            self.inserted += result["inserted"]
+            return True
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Error syncing user {user_id}: {e}")
+            return False
+        finally:
+            self._in_flight.discard(user_id)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "cycles": self.cycles,
+            "synced_users": self.synced_users,
+            "inserted": self.inserted,
+            "failures": self.failures,
+            "in_flight": len(self._in_flight),
+            "last_cycle_ms": round(self.last_cycle_ms, 2),
+        }
+
+
+sync_scheduler = SyncScheduler(
+    interval_seconds=settings.SYNC_INTERVAL_SECONDS,
+    user_interval_seconds=settings.SYNC_USER_INTERVAL_SECONDS,
+    batch_size=settings.SYNC_BATCH_SIZE,
+    concurrency=settings.SYNC_CONCURRENCY,
+    jitter=settings.SYNC_JITTER,
+    active_days=settings.SYNC_ACTIVE_DAYS,
+    watermark_overlap_seconds=settings.SYNC_WATERMARK_OVERLAP_SECONDS,
+    mode=settings.SYNC_MODE
+)
+
+
+if __name__ == "__main__":
+    import sys
+    from async_database import init_async_pools, close_async_pools
+
+    async def main():
+        await init_async_pools()
+        try:
+            if "--full-resync" in sys.argv:
+                await full_resync(settings.SYNC_CONCURRENCY)
+            else:
+                await sync_scheduler._run()
+        finally:
+            await close_async_pools()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,84 @@
+"""Percentile and regression helpers of the benchmark load driver"""
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from benchmarks.load import compare, percentile
+
+
+def run(p50: float, p95: float, p99: float, rps: float) -> dict:
+    return {"latency_ms": {"p50": p50, "p95": p95, "p99": p99}, "throughput_rps": rps}
+
+
+def results(**scenarios) -> dict:
+    return {"scenarios": scenarios}
+
+
+class PercentileTests(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile(values, 1.0), 100)
+
+    def test_small_samples(self):
+        self.assertEqual(percentile([7.0], 0.99), 7.0)
+        self.assertEqual(percentile([1.0, 2.0], 0.50), 1.0)
+        self.assertEqual(percentile([1.0, 2.0], 0.95), 2.0)
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0], 0.0), 1.0)
+        self.assertEqual(percentile([float(v) for v in range(1, 101)], 0.07), 7.0)
+
+    def test_empty(self):
+        self.assertEqual(percentile([], 0.95), 0.0)
+
+
+class CompareTests(unittest.TestCase):
+    def compare(self, current: dict, baseline: dict, max_regression: float = 20) -> tuple:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            regressed = compare(current, baseline, max_regression)
+        return regressed, output.getvalue()
+
+    def test_within_tolerance(self):
+        regressed, output = self.compare(
+            results(stats=run(10, 20, 30, 900)), results(stats=run(10, 18, 30, 1000))
+        )
+        self.assertFalse(regressed)
+        self.assertIn("+11%", output)
+        self.assertIn("-10%", output)
+
+    def test_p95_regression(self):
+        regressed, output = self.compare(
+            results(stats=run(10, 25, 30, 1000)), results(stats=run(10, 20, 30, 1000))
+        )
+        self.assertTrue(regressed)
+        self.assertIn("stats regressed", output)
+
+    def test_throughput_regression(self):
+        regressed, _ = self.compare(
+            results(login=run(10, 20, 30, 700)), results(login=run(10, 20, 30, 1000))
+        )
+        self.assertTrue(regressed)
+
+    def test_improvements_never_regress(self):
+        regressed, _ = self.compare(
+            results(stats=run(5, 10, 15, 2000)), results(stats=run(10, 20, 30, 1000)), max_regression=0
+        )
+        self.assertFalse(regressed)
+
+    def test_scenarios_missing_from_the_baseline_are_skipped(self):
+        regressed, output = self.compare(
+            results(stats=run(10, 20, 30, 1000), login=run(1, 2, 3, 10)),
+            results(stats=run(10, 20, 30, 1000))
+        )
+        self.assertFalse(regressed)
+        self.assertNotIn("login", output)
+
+    def test_zero_baseline_is_not_a_regression(self):
+        regressed, _ = self.compare(results(stats=run(10, 20, 30, 1000)), results(stats=run(0, 0, 0, 0)))
+        self.assertFalse(regressed)
+
+
+if __name__ == "__main__":
+    unittest.main()
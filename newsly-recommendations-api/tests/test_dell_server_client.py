@@ -0,0 +1,207 @@
+"""Retries, timeouts and the circuit breaker of the Dell API client, against the stub server"""
+import asyncio
+import unittest
+from unittest import mock
+
+import httpx
+
+import circuit_breaker
+import dell_server_client
+import dell_server_stub
+from circuit_breaker import CircuitBreaker
+from dell_server_client import DellServerClient, DellServerError
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """Serves requests from the stub app, raising queued transport errors first"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.requests = []
+        self.app = httpx.ASGITransport(app=dell_server_stub.app)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.errors:
+            raise self.errors.pop(0)("injected", request=request)
+        return await self.app.handle_async_request(request)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DellServerClientTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        dell_server_stub.users.clear()
+        self.sleep = mock.AsyncMock()
+        for patcher in (
+            mock.patch.object(dell_server_client.asyncio, "sleep", self.sleep),
+            mock.patch.object(dell_server_stub, "LATENCY_SECONDS", 0),
+            mock.patch.object(dell_server_stub, "FAILURE_RATE", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def client(self, errors=(), retries: int = 2, breaker: CircuitBreaker = None) -> DellServerClient:
+        client = DellServerClient(
+            "http://dell.test", timeout_seconds=10, connect_timeout_seconds=2,
+            retries=retries, backoff_seconds=0.2,
+            breaker=breaker or CircuitBreaker("dell_api_test", failure_threshold=100)
+        )
+        self.transport = StubTransport(errors)
+        client._client = httpx.AsyncClient(
+            base_url=client.base_url, timeout=client.timeout, transport=self.transport
+        )
+        self.addAsyncCleanup(client.close)
+        return client
+
+    async def test_register_and_regenerate(self):
+        client = await self.client()
+        registered = await client.register_user("reader@example.com", "secret", "Reader")
+        self.assertEqual(registered["access_token"], "stub-token-1")
+        result = await client.regenerate_recommendations(registered["access_token"])
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(self.transport.requests[-1].headers["Authorization"], "Bearer stub-token-1")
+        self.assertEqual((client.calls, client.failures, client.retried), (2, 0, 0))
+
+    async def test_rejected_registration_is_not_an_error(self):
+        client = await self.client()
+        await client.register_user("reader@example.com", "secret", "Reader")
+        self.assertIsNone(await client.register_user("reader@example.com", "secret", "Reader"))
+        self.assertEqual(client.breaker.state, circuit_breaker.CLOSED)
+
+    async def test_timeouts(self):
+        client = await self.client()
+        await client.register_user("reader@example.com", "secret", "Reader")
+        self.assertEqual(self.transport.requests[-1].extensions["timeout"]["read"], 10)
+        await client.regenerate_recommendations("stub-token-1")
+        timeout = self.transport.requests[-1].extensions["timeout"]
+        self.assertEqual((timeout["read"], timeout["connect"]), (30, 2))
+
+    async def test_idempotent_request_retries_server_errors_with_jittered_backoff(self):
+        client = await self.client()
+        with mock.patch.object(dell_server_stub, "FAILURE_RATE", 1.0):
+            with self.assertRaises(DellServerError) as raised:
+                await client.regenerate_recommendations("stub-token-1")
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(len(self.transport.requests), 3)
+        first, second = (call.args[0] for call in self.sleep.await_args_list)
+        self.assertTrue(0.1 <= first <= 0.3)
+        self.assertTrue(0.2 <= second <= 0.6)
+        self.assertEqual((client.retried, client.failures), (2, 1))
+
+    async def test_non_idempotent_request_is_not_retried_after_it_was_sent(self):
+        for error in (httpx.ReadTimeout, httpx.RemoteProtocolError):
+            with self.subTest(error=error.__name__):
+                client = await self.client(errors=[error])
+                with self.assertRaises(DellServerError):
+                    await client.register_user("reader@example.com", "secret", "Reader")
+                self.assertEqual(len(self.transport.requests), 1)
+
+        client = await self.client()
+        with mock.patch.object(dell_server_stub, "FAILURE_RATE", 1.0):
+            with self.assertRaises(DellServerError):
+                await client.register_user("reader@example.com", "secret", "Reader")
+        self.assertEqual(len(self.transport.requests), 1)
+
+    async def test_non_idempotent_request_is_retried_when_never_sent(self):
+        for error in (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            with self.subTest(error=error.__name__):
+                dell_server_stub.users.clear()
+                client = await self.client(errors=[error])
+                registered = await client.register_user("reader@example.com", "secret", "Reader")
+                self.assertEqual(registered["user_id"], 1)
+                self.assertEqual(len(self.transport.requests), 2)
+
+    async def test_idempotent_request_retries_read_timeouts(self):
+        client = await self.client(errors=[httpx.ReadTimeout, httpx.ReadTimeout])
+        result = await client.regenerate_recommendations("stub-token-1")
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(client.retried, 2)
+
+    async def test_gives_up_after_the_configured_retries(self):
+        client = await self.client(errors=[httpx.ConnectError] * 3, retries=1)
+        with self.assertRaises(DellServerError):
+            await client.regenerate_recommendations("stub-token-1")
+        self.assertEqual(len(self.transport.requests), 2)
+
+
+class CircuitBreakerTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        # Replace the module reference, not time.monotonic, which the event loop uses too
+        patcher = mock.patch.object(circuit_breaker, "time", mock.Mock(monotonic=self.clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_open_half_open_closed(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout_seconds=30)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        self.clock.now += 30
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        # Only one trial call at a time
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        self.assertTrue(breaker.allow())
+        self.assertEqual((breaker.opened, breaker.rejected), (1, 2))
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=30)
+        breaker.record_failure()
+        self.clock.now += 30
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        self.clock.now += 29
+        with self.assertRaises(circuit_breaker.CircuitOpenError) as raised:
+            breaker.check()
+        self.assertAlmostEqual(raised.exception.retry_after, 1.0)
+
+    def test_abandoned_trial_stops_blocking(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=30)
+        breaker.record_failure()
+        self.clock.now += 30
+        self.assertTrue(breaker.allow())
+        self.clock.now += 30
+        self.assertTrue(breaker.allow())
+
+    async def test_client_trips_and_recovers(self):
+        dell_server_stub.users.clear()
+        breaker = CircuitBreaker("dell_api_test", failure_threshold=2, reset_timeout_seconds=30)
+        client = DellServerClient("http://dell.test", retries=0, breaker=breaker)
+        transport = StubTransport()
+        client._client = httpx.AsyncClient(base_url=client.base_url, transport=transport)
+        self.addAsyncCleanup(client.close)
+
+        with mock.patch.object(dell_server_stub, "FAILURE_RATE", 1.0):
+            for _ in range(2):
+                with self.assertRaises(DellServerError):
+                    await client.regenerate_recommendations("stub-token-1")
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+
+        # Refused without touching the server
+        with self.assertRaises(DellServerError):
+            await client.regenerate_recommendations("stub-token-1")
+        self.assertEqual(len(transport.requests), 2)
+
+        self.clock.now += 30
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        result = await client.regenerate_recommendations("stub-token-1")
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
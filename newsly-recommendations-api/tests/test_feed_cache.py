@@ -0,0 +1,92 @@
+"""Paging a cached feed by offset and by keyset cursor"""
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from feed_cache import FeedCache, FeedEntry
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def row(rec_id: int, score: float, minutes: int) -> tuple:
+    """(id, article_id, relevance_score, recommendation_reason, created_at)"""
+    return (rec_id, 1000 + rec_id, score, "test", BASE + timedelta(minutes=minutes))
+
+
+# Sorted by (relevance_score, created_at, id) descending, as the feed query returns
+ROWS = (
+    row(9, 0.9, 5),
+    row(8, 0.7, 9),
+    row(7, 0.7, 9),
+    row(6, 0.7, 3),
+    row(5, 0.5, 8),
+    row(4, 0.2, 1),
+)
+
+
+def key(r: tuple) -> tuple:
+    return (r[2], r[4], r[0])
+
+
+class FeedEntryTests(unittest.TestCase):
+    def test_after_returns_rows_following_the_cursor(self):
+        entry = FeedEntry(ROWS, complete=True, expires_at=0)
+        self.assertEqual(entry.after(key(ROWS[0]), 2), list(ROWS[1:3]))
+
+    def test_after_breaks_ties_on_created_at_then_id(self):
+        entry = FeedEntry(ROWS, complete=True, expires_at=0)
+        # Rows 8 and 7 share score and created_at; only id tells them apart
+        self.assertEqual([r[0] for r in entry.after(key(ROWS[1]), 3)], [7, 6, 5])
+        self.assertEqual([r[0] for r in entry.after(key(ROWS[2]), 3)], [6, 5, 4])
+
+    def test_after_a_cursor_for_a_row_no_longer_cached(self):
+        entry = FeedEntry(ROWS, complete=True, expires_at=0)
+        # The cursor's row was removed; paging resumes at the next lower key
+        cursor = (0.7, BASE + timedelta(minutes=5), 99)
+        self.assertEqual([r[0] for r in entry.after(cursor, 2)], [6, 5])
+
+    def test_after_the_last_row_of_a_complete_feed_is_empty(self):
+        entry = FeedEntry(ROWS, complete=True, expires_at=0)
+        self.assertEqual(entry.after(key(ROWS[-1]), 20), [])
+
+    def test_after_past_a_truncated_feed_falls_back(self):
+        entry = FeedEntry(ROWS, complete=False, expires_at=0)
+        self.assertEqual(len(entry.after(key(ROWS[0]), 5)), 5)
+        # Rows beyond the cached window must come from the database
+        self.assertIsNone(entry.after(key(ROWS[2]), 5))
+
+    def test_page_by_offset(self):
+        entry = FeedEntry(ROWS, complete=False, expires_at=0)
+        self.assertEqual(entry.page(2, 2), list(ROWS[2:4]))
+        self.assertIsNone(entry.page(4, 5))
+
+
+class FeedCacheTests(unittest.TestCase):
+    def test_put_marks_feeds_over_the_cap_incomplete(self):
+        cache = FeedCache(max_rows_per_user=4)
+        self.assertTrue(cache.put(1, ROWS[:4]).complete)
+        entry = cache.put(2, ROWS[:5])
+        self.assertFalse(entry.complete)
+        self.assertEqual(len(entry.rows), 4)
+
+    def test_evicts_least_recently_used_users_by_row_count(self):
+        cache = FeedCache(max_rows=8, max_rows_per_user=4)
+        cache.put(1, ROWS[:4])
+        cache.put(2, ROWS[:4])
+        cache.get(1)
+        cache.put(3, ROWS[:4])
+
+        self.assertIsNotNone(cache.get(1))
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.stats()["rows"], 8)
+
+    def test_invalidate(self):
+        cache = FeedCache()
+        cache.put(1, ROWS)
+        cache.invalidate(1)
+        cache.invalidate(1)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
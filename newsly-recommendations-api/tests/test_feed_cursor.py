@@ -0,0 +1,51 @@
+"""Encoding and validation of GET /recommendations keyset cursors"""
+import base64
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+
+from main import decode_feed_cursor, encode_feed_cursor
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+class FeedCursorTests(unittest.TestCase):
+    def assertRejected(self, cursor: str):
+        with self.assertRaises(HTTPException) as caught:
+            decode_feed_cursor(cursor)
+        self.assertEqual(caught.exception.status_code, 400)
+        self.assertEqual(caught.exception.detail, "Invalid cursor")
+
+    def test_round_trip(self):
+        created_at = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone(timedelta(hours=2)))
+        cursor = encode_feed_cursor(0.8125, created_at, 42)
+
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_feed_cursor(cursor), (0.8125, created_at, 42))
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_feed_cursor(0.1, datetime(2026, 1, 1, tzinfo=timezone.utc), 2 ** 40)
+        self.assertRegex(cursor, r"^[A-Za-z0-9_-]+$")
+
+    def test_rejects_malformed_cursors(self):
+        for cursor in ("", "not base64!", raw_cursor([0.5, "2026-01-01T00:00:00+00:00"]),
+                       raw_cursor({"score": 0.5}), raw_cursor([0.5, "yesterday", 1]),
+                       raw_cursor(["high", "2026-01-01T00:00:00+00:00", 1])):
+            with self.subTest(cursor=cursor):
+                self.assertRejected(cursor)
+
+    def test_rejects_naive_timestamps(self):
+        self.assertRejected(raw_cursor([0.5, "2026-01-01T00:00:00", 1]))
+
+    def test_rejects_non_finite_scores(self):
+        for score in ("nan", "inf", "-inf"):
+            with self.subTest(score=score):
+                self.assertRejected(raw_cursor([score, "2026-01-01T00:00:00+00:00", 1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
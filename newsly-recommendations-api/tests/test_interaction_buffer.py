@@ -0,0 +1,138 @@
+"""Spilling and replaying of the buffered interaction ingest"""
+import asyncio
+import glob
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from interaction_buffer import InteractionBuffer
+
+CREATED_AT = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def row(article_id: int) -> tuple:
+    return (1, article_id, "view", 30, 0.5, 3, CREATED_AT)
+
+
+class InteractionSpillTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.spill_path = os.path.join(self.directory, "spill.jsonl")
+
+    def buffer(self, copy=None, batch_size: int = 2) -> InteractionBuffer:
+        buffer = InteractionBuffer(batch_size=batch_size, spill_path=self.spill_path)
+        patcher = mock.patch.object(buffer, "_copy", copy or mock.AsyncMock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return buffer
+
+    def leftovers(self) -> list:
+        return sorted(os.path.basename(p) for p in glob.glob(self.spill_path + ".replay*"))
+
+    def test_spill_then_replay(self):
+        copied = []
+
+        async def copy(batch):
+            copied.extend(batch)
+
+        buffer = self.buffer(copy)
+        asyncio.run(buffer._spill([row(i) for i in range(5)]))
+        asyncio.run(buffer._replay_spill())
+
+        self.assertEqual(sorted(r[1] for r in copied), list(range(5)))
+        self.assertEqual(copied[0][-1], CREATED_AT)
+        self.assertEqual((buffer.spilled, buffer.replayed), (5, 5))
+        self.assertFalse(os.path.exists(self.spill_path))
+        self.assertEqual(self.leftovers(), [])
+
+    def test_concurrent_replays_copy_each_row_once(self):
+        copied = []
+
+        async def copy(batch):
+            await asyncio.sleep(0.01)
+            copied.extend(batch)
+
+        first, second = self.buffer(copy), self.buffer(copy)
+
+        async def scenario():
+            await first._spill([row(i) for i in range(7)])
+            await asyncio.gather(first._replay_spill(), second._replay_spill())
+
+        asyncio.run(scenario())
+        self.assertEqual(sorted(r[1] for r in copied), list(range(7)))
+        self.assertEqual(first.replayed + second.replayed, 7)
+        self.assertEqual(self.leftovers(), [])
+
+    def test_failed_replay_keeps_only_rows_not_copied(self):
+        calls = 0
+
+        async def copy(batch):
+            nonlocal calls
+            calls += 1
+            if calls == 2:
+                raise ConnectionError("database went away")
+
+        buffer = self.buffer(copy)
+        asyncio.run(buffer._spill([row(i) for i in range(5)]))
+        asyncio.run(buffer._replay_spill())
+
+        # The tail chunk [3, 4] committed; the rest stays on disk
+        self.assertEqual(buffer.replayed, 2)
+        [left] = self.leftovers()
+        with open(os.path.join(self.directory, left)) as f:
+            self.assertEqual([json.loads(line)[1] for line in f], [0, 1, 2])
+
+        copied = []
+
+        async def recovered(batch):
+            copied.extend(batch)
+
+        retry = self.buffer(recovered)
+        asyncio.run(retry._replay_spill())
+        self.assertEqual(sorted(r[1] for r in copied), [0, 1, 2])
+        self.assertEqual(self.leftovers(), [])
+
+    def test_adopts_replay_file_left_by_a_dead_process(self):
+        with open(self.spill_path + ".replay", "w") as f:
+            f.write(json.dumps([1, 9, "view", 30, 0.5, 3, CREATED_AT.isoformat()]) + "\n")
+        copied = []
+
+        async def copy(batch):
+            copied.extend(batch)
+
+        asyncio.run(self.buffer(copy)._replay_spill())
+        self.assertEqual([r[1] for r in copied], [9])
+        self.assertEqual(self.leftovers(), [])
+
+    def test_unreadable_lines_are_quarantined(self):
+        copied = []
+
+        async def copy(batch):
+            copied.extend(batch)
+
+        buffer = self.buffer(copy)
+        asyncio.run(buffer._spill([row(1)]))
+        with open(self.spill_path, "a") as f:
+            f.write("not json\n")
+            f.write('[1, 2, "view"')
+        asyncio.run(buffer._spill([row(2)]))
+        asyncio.run(buffer._replay_spill())
+
+        self.assertEqual(sorted(r[1] for r in copied), [1, 2])
+        self.assertEqual(buffer.quarantined, 2)
+        with open(self.spill_path + ".bad") as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+    def test_nothing_to_replay(self):
+        buffer = self.buffer()
+        asyncio.run(buffer._replay_spill())
+        buffer._copy.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""Sliding-window math of the in-memory and shared-memory rate limit backends"""
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from rate_limiter import InMemoryRateLimitBackend, SharedMemoryRateLimitBackend, WINDOW_SECONDS, _apply_hit
+
+MINUTE = (("minute", 3),)
+
+
+def new_slots() -> list:
+    return [0] * (3 * len(WINDOW_SECONDS))
+
+
+class ApplyHitTests(unittest.TestCase):
+    def test_counts_until_the_limit(self):
+        slots = new_slots()
+        now = 600.0
+        self.assertEqual([_apply_hit(slots, 0, MINUTE, now) for _ in range(4)], [None, None, None, "minute"])
+        # A rejected request is not counted
+        self.assertEqual(slots[1], 3)
+
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        slots = new_slots()
+        for _ in range(3):
+            _apply_hit(slots, 0, MINUTE, 600.0)
+
+        # 15s into the next window, 75% of the previous count still applies:
+        # 2.25 allows one request, 2.25 + 1 rejects the next
+        self.assertIsNone(_apply_hit(slots, 0, MINUTE, 675.0))
+        self.assertEqual(_apply_hit(slots, 0, MINUTE, 675.0), "minute")
+        # 45s in, only 25% does: 0.75 + 1 < 3
+        self.assertIsNone(_apply_hit(slots, 0, MINUTE, 705.0))
+        self.assertEqual(slots[:3], [11, 2, 3])
+
+    def test_previous_window_is_dropped_after_a_gap(self):
+        slots = new_slots()
+        for _ in range(3):
+            _apply_hit(slots, 0, MINUTE, 600.0)
+
+        # Two windows later nothing overlaps
+        self.assertIsNone(_apply_hit(slots, 0, MINUTE, 721.0))
+        self.assertEqual(slots[:3], [12, 1, 0])
+
+    def test_every_window_must_allow_the_request(self):
+        slots = new_slots()
+        limits = (("minute", 100), ("hour", 2))
+        self.assertIsNone(_apply_hit(slots, 0, limits, 10.0))
+        self.assertIsNone(_apply_hit(slots, 0, limits, 20.0))
+        self.assertEqual(_apply_hit(slots, 0, limits, 130.0), "hour")
+        # Neither window counted the rejected request
+        self.assertEqual(slots[1], 0)
+        self.assertEqual(slots[4], 2)
+
+
+class InMemoryBackendTests(unittest.TestCase):
+    def hit(self, backend, identifier, now, limits=MINUTE):
+        with mock.patch("rate_limiter.time.time", return_value=now):
+            return asyncio.run(backend.hit(identifier, "/recommendations", limits))
+
+    def test_keys_are_limited_independently(self):
+        backend = InMemoryRateLimitBackend()
+        for _ in range(3):
+            self.assertIsNone(self.hit(backend, "ip:1", 600.0))
+        self.assertEqual(self.hit(backend, "ip:1", 600.0), "minute")
+        self.assertIsNone(self.hit(backend, "ip:2", 600.0))
+
+    def test_least_recently_seen_key_is_evicted(self):
+        backend = InMemoryRateLimitBackend(max_keys=2)
+        for _ in range(3):
+            self.hit(backend, "ip:1", 600.0)
+        self.hit(backend, "ip:2", 600.0)
+        self.hit(backend, "ip:3", 600.0)
+
+        # ip:1 was evicted, so its count starts over
+        self.assertIsNone(self.hit(backend, "ip:1", 600.0))
+        self.assertEqual(len(backend._counters), 2)
+
+
+class SharedMemoryBackendTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "rate_limits")
+
+    def backend(self, slots: int = 64) -> SharedMemoryRateLimitBackend:
+        backend = SharedMemoryRateLimitBackend(self.path, slots)
+        asyncio.run(backend.start())
+        self.addCleanup(lambda: asyncio.run(backend.stop()))
+        return backend
+
+    def hit(self, backend, identifier, now, limits=MINUTE):
+        with mock.patch("rate_limiter.time.time", return_value=now):
+            return asyncio.run(backend.hit(identifier, "/recommendations", limits))
+
+    def test_workers_share_counts(self):
+        first, second = self.backend(), self.backend()
+        self.assertEqual(first.path, second.path)
+        for backend in (first, second, first):
+            self.assertIsNone(self.hit(backend, "ip:1", 600.0))
+        self.assertEqual(self.hit(second, "ip:1", 600.0), "minute")
+        self.assertIsNone(self.hit(second, "ip:2", 600.0))
+
+    def test_a_different_size_maps_a_different_file(self):
+        old, new = self.backend(64), self.backend(128)
+        self.assertNotEqual(old.path, new.path)
+        self.assertEqual(os.path.getsize(old.path), 8 * old.bucket_size)
+        self.assertEqual(os.path.getsize(new.path), 16 * new.bucket_size)
+
+    def test_refuses_to_resize_an_existing_table(self):
+        backend = SharedMemoryRateLimitBackend(self.path, 64)
+        with open(backend.path, "wb") as f:
+            f.write(b"\0" * 100)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(backend.start())
+        self.assertEqual(os.path.getsize(backend.path), 100)
+
+    def test_contended_hit_waits_off_the_event_loop(self):
+        backend = self.backend()
+
+        async def scenario():
+            backend._thread_lock.acquire()
+            hit = asyncio.create_task(backend.hit("ip:1", "/recommendations", MINUTE))
+            # The loop keeps running while the hit waits for the lock
+            await asyncio.sleep(0.05)
+            self.assertFalse(hit.done())
+            backend._thread_lock.release()
+            return await asyncio.wait_for(hit, 5)
+
+        self.assertIsNone(asyncio.run(scenario()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Expiry and eviction of the verified JWT payload cache"""
+import threading
+import time
+import unittest
+from unittest import mock
+
+from auth import TokenCache
+
+
+def at(now: float):
+    return mock.patch("auth.time.time", return_value=now)
+
+
+class TokenCacheTests(unittest.TestCase):
+    def test_hit_until_the_exp_claim(self):
+        cache = TokenCache(max_ttl_seconds=300)
+        payload = {"sub": "1", "exp": 1060}
+        with at(1000):
+            cache.put("token", payload)
+        with at(1059):
+            self.assertEqual(cache.get("token"), payload)
+        with at(1060):
+            self.assertIsNone(cache.get("token"))
+        self.assertEqual(cache.stats(), {"entries": 0, "hits": 1, "misses": 1})
+
+    def test_ttl_caps_long_lived_tokens(self):
+        cache = TokenCache(max_ttl_seconds=300)
+        with at(1000):
+            cache.put("token", {"sub": "1", "exp": 100_000})
+        with at(1299):
+            self.assertIsNotNone(cache.get("token"))
+        with at(1300):
+            self.assertIsNone(cache.get("token"))
+
+    def test_expired_tokens_are_not_cached(self):
+        cache = TokenCache()
+        with at(1000):
+            cache.put("token", {"sub": "1", "exp": 999})
+            self.assertIsNone(cache.get("token"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_threads_expiring_the_same_token(self):
+        # get_current_user may run in the threadpool. Make both threads read
+        # the entry, then pause inside the expiry check, so both try to drop it
+        cache = TokenCache()
+        with at(1000):
+            cache.put("token", {"sub": "1", "exp": 1010})
+
+        def slow_clock() -> float:
+            time.sleep(0.05)
+            return 2000.0
+
+        barrier = threading.Barrier(2)
+        results, errors = [], []
+
+        def worker():
+            barrier.wait()
+            try:
+                results.append(cache.get("token"))
+            except Exception as e:
+                errors.append(e)
+
+        with mock.patch("auth.time.time", side_effect=slow_clock):
+            threads = [threading.Thread(target=worker) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [None, None])
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_least_recently_used_token_is_evicted(self):
+        cache = TokenCache(max_entries=2)
+        with at(1000):
+            cache.put("a", {"sub": "1"})
+            cache.put("b", {"sub": "2"})
+            cache.get("a")
+            cache.put("c", {"sub": "3"})
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("c"))
+
+    def test_raw_tokens_are_not_stored(self):
+        cache = TokenCache()
+        with at(1000):
+            cache.put("secret-token", {"sub": "1"})
+        self.assertNotIn("secret-token", cache._entries)
+        self.assertTrue(all(isinstance(key, bytes) for key in cache._entries))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Invalidation and the generation guard of the user profile cache"""
+import asyncio
+import unittest
+from unittest import mock
+
+import user_service
+from user_service import UserProfileCache, UserService
+
+
+def user(user_id: int = 1, email: str = "reader@example.com", name: str = "Reader") -> dict:
+    return {"id": user_id, "email": email, "name": name}
+
+
+class UserProfileCacheTests(unittest.TestCase):
+    def test_lookup_by_id_and_email(self):
+        cache = UserProfileCache()
+        cache.put(user(), cache.generation)
+        self.assertEqual(cache.get_by_id(1)["name"], "Reader")
+        self.assertEqual(cache.get_by_email("reader@example.com")["id"], 1)
+        self.assertIsNone(cache.get_by_email("other@example.com"))
+
+    def test_returns_copies(self):
+        cache = UserProfileCache()
+        cache.put(user(), cache.generation)
+        cache.get_by_id(1)["name"] = "Changed"
+        self.assertEqual(cache.get_by_id(1)["name"], "Reader")
+
+    def test_row_loaded_before_an_invalidation_is_not_cached(self):
+        cache = UserProfileCache()
+        generation = cache.generation
+        # A profile update commits while the row is being read
+        cache.invalidate([1])
+        cache.put(user(name="Stale"), generation)
+        self.assertIsNone(cache.get_by_id(1))
+
+    def test_invalidate_by_id_or_email(self):
+        cache = UserProfileCache()
+        cache.put(user(1, "a@example.com"), cache.generation)
+        cache.put(user(2, "b@example.com"), cache.generation)
+
+        cache.invalidate([1])
+        cache.invalidate(email="b@example.com")
+        self.assertIsNone(cache.get_by_id(1))
+        self.assertIsNone(cache.get_by_id(2))
+        self.assertIsNone(cache.get_by_email("a@example.com"))
+
+    def test_email_change_drops_the_old_index_entry(self):
+        cache = UserProfileCache()
+        cache.put(user(1, "old@example.com"), cache.generation)
+        cache.put(user(1, "new@example.com"), cache.generation)
+        self.assertIsNone(cache.get_by_email("old@example.com"))
+        self.assertEqual(cache.get_by_email("new@example.com")["id"], 1)
+
+    def test_entries_expire(self):
+        cache = UserProfileCache(ttl_seconds=60)
+        with mock.patch("user_service.time.monotonic", return_value=100.0):
+            cache.put(user(), cache.generation)
+        with mock.patch("user_service.time.monotonic", return_value=159.0):
+            self.assertIsNotNone(cache.get_by_id(1))
+        with mock.patch("user_service.time.monotonic", return_value=160.0):
+            self.assertIsNone(cache.get_by_id(1))
+            self.assertIsNone(cache.get_by_email("reader@example.com"))
+
+    def test_least_recently_used_user_is_evicted(self):
+        cache = UserProfileCache(max_entries=2)
+        for user_id in (1, 2):
+            cache.put(user(user_id, f"{user_id}@example.com"), cache.generation)
+        cache.get_by_id(1)
+        cache.put(user(3, "3@example.com"), cache.generation)
+
+        self.assertIsNone(cache.get_by_id(2))
+        self.assertIsNone(cache.get_by_email("2@example.com"))
+        self.assertIsNotNone(cache.get_by_id(1))
+
+
+class GetUserByEmailTests(unittest.TestCase):
+    ROW = (1, "reader@example.com", "Reader", "hash", "email", None, None, True, True, None, [], [], None)
+
+    def test_concurrent_update_keeps_the_stale_row_out(self):
+        cache = UserProfileCache()
+
+        async def read_racing_an_update(*args, **kwargs):
+            cache.invalidate([1])
+            return [self.ROW]
+
+        with mock.patch.object(user_service, "user_profile_cache", cache), \
+                mock.patch.object(user_service, "execute_statement", side_effect=read_racing_an_update):
+            found = asyncio.run(UserService.get_user_by_email("reader@example.com"))
+
+        self.assertEqual(found["name"], "Reader")
+        self.assertIsNone(cache.get_by_id(1))
+
+    def test_second_lookup_is_served_from_the_cache(self):
+        cache = UserProfileCache()
+        load = mock.AsyncMock(return_value=[self.ROW])
+
+        with mock.patch.object(user_service, "user_profile_cache", cache), \
+                mock.patch.object(user_service, "execute_statement", load):
+            asyncio.run(UserService.get_user_by_email("reader@example.com"))
+            found = asyncio.run(UserService.get_user_by_email("reader@example.com"))
+
+        self.assertEqual(found["id"], 1)
+        self.assertEqual(load.await_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
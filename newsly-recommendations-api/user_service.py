@@ -3,19 +3,129 @@ User service for managing users with dual-database sync
 All queries use parameterized statements to prevent SQL injection
 """
 import logging
-from typing import Optional, Dict, Any
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterable, Tuple
 from datetime import datetime
-from database import execute_query, get_db_cursor
-from auth import get_password_hash, verify_password
+from psycopg.types.json import Jsonb
+from async_database import execute_statement, get_db_cursor, statements
+from config import settings
+from outbox_relay import PROFILE_UPDATED, USER_CREATED, enqueue_user_event, outbox_relay
+from password_hasher import password_hasher
 
 logger = logging.getLogger(__name__)
 
 
+class UserProfileCache:
+    """
+    Bounded LRU cache of user rows, keyed by user id with an email index
+
+    Entries expire after ttl_seconds and are dropped explicitly whenever
+    the row changes. Every invalidation bumps a generation counter; a
+    loader passes the generation it started at to put(), so a row read
+    before a concurrent update is never cached after it.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._ids_by_email: Dict[str, int] = {}
+
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached user with this email, or None"""
+        user_id = self._ids_by_email.get(email)
+        if user_id is None:
+            self.misses += 1
+            return None
+        return self.get_by_id(user_id)
+
+    def get_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached user with this id, or None"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            self._remove(user_id)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return dict(user)
+
+    def put(self, user: Dict[str, Any], generation: int):
+        """Cache a user row loaded while the cache was at generation"""
+        if generation != self.generation:
+            return
+
+        user_id = user["id"]
+        self._remove(user_id)
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, dict(user))
+        self._ids_by_email[user["email"]] = user_id
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_ids: Iterable[int] = (), email: Optional[str] = None):
+        """Drop cached users after their rows were written"""
+        self.generation += 1
+        for user_id in user_ids:
+            self._remove(user_id)
+        if email is not None:
+            user_id = self._ids_by_email.get(email)
+            if user_id is not None:
+                self._remove(user_id)
+
+    def _remove(self, user_id: int):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None and self._ids_by_email.get(entry[1]["email"]) == user_id:
+            del self._ids_by_email[entry[1]["email"]]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+user_profile_cache = UserProfileCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS
+)
+
+
+# Lookups run on every login and /auth/me miss; prepared once per pooled connection
+USER_BY_EMAIL_QUERY = statements.register("user_by_email", """
+    SELECT id, email, name, password_hash, oauth_provider, oauth_provider_id,
+           picture_url, email_verified, is_active, dell_server_user_id,
+           primary_interests, secondary_interests, created_at
+    FROM users
+    WHERE email = %s AND is_active = TRUE
+""")
+USER_BY_OAUTH_QUERY = statements.register("user_by_oauth", """
+    SELECT id, email, name, password_hash, oauth_provider, oauth_provider_id,
+           picture_url, email_verified, is_active, dell_server_user_id
+    FROM users
+    WHERE oauth_provider = %s AND oauth_provider_id = %s AND is_active = TRUE
+""")
+UPDATE_LAST_LOGIN_QUERY = statements.register(
+    "update_last_login", "UPDATE users SET last_login_at = NOW() WHERE id = %s"
+)
+
+
 class UserService:
     """Service for user management with Dell server sync"""
 
     @staticmethod
-    def create_user(
+    async def create_user(
         email: str,
         name: str,
         password: str = None,
@@ -26,12 +136,12 @@ class UserService:
         **profile_data
     ) -> Dict[str, Any]:
         """
-        Create user in local DB and sync to Dell server
+        Create user in local DB and queue its sync to Dell server
         Uses parameterized queries to prevent SQL injection
         """
         try:
             # Hash password if provided
-            password_hash = get_password_hash(password) if password else None
+            password_hash = await password_hasher.hash(password) if password else None
 
             # Insert into local database with parameterized query
             local_query = """
@@ -45,38 +155,32 @@ class UserService:
 
             email_verified = oauth_provider == 'google'  # Auto-verify Google emails
 
-            result = execute_query(
-                local_query,
-                (email, name, password_hash, oauth_provider, oauth_provider_id,
-                 oauth_access_token, picture_url, email_verified),
-                use_dell_server=False
-            )
+            # The Dell copy is written by the outbox relay, from an event
+            # committed atomically with the local row
+            async with get_db_cursor() as cursor:
+                await cursor.execute(
+                    local_query,
+                    (email, name, password_hash, oauth_provider, oauth_provider_id,
+                     oauth_access_token, picture_url, email_verified)
+                )
+                result = await cursor.fetchone()
+                if not result:
+                    raise Exception("Failed to create user in local database")
 
-            if not result:
-                raise Exception("Failed to create user in local database")
+                local_user_id, user_email, user_name, created_at = result
+                await enqueue_user_event(
+                    cursor, local_user_id, USER_CREATED, Jsonb({}), f"{USER_CREATED}:{local_user_id}"
+                )
 
-            local_user_id, user_email, user_name, created_at = result[0]
+            user_profile_cache.invalidate([local_user_id], email=user_email)
+            outbox_relay.notify()
             logger.info(f"Created local user: {user_email} (ID: {local_user_id})")
 
-            # Sync to Dell server
-            dell_user_id = UserService._sync_to_dell_server(
-                local_user_id, email, name, password_hash, profile_data
-            )
-
-            # Update local user with Dell ID
-            if dell_user_id:
-                update_query = """
-                    UPDATE users
-                    SET dell_server_user_id = %s, last_synced_at = NOW()
-                    WHERE id = %s
-                """
-                execute_query(update_query, (dell_user_id, local_user_id), fetch=False)
-
             return {
                 "id": local_user_id,
                 "email": user_email,
                 "name": user_name,
-                "dell_server_user_id": dell_user_id,
+                "dell_server_user_id": None,
                 "created_at": created_at
             }
 
@@ -85,56 +189,18 @@ class UserService:
             raise
 
     @staticmethod
-    def _sync_to_dell_server(
-        local_user_id: int,
-        email: str,
-        name: str,
-        password_hash: str = None,
-        profile_data: Dict = None
-    ) -> Optional[int]:
-        """Sync user to Dell server database (if available)"""
-        try:
-            # Check if Dell server is available
-            dell_query = """
-                INSERT INTO users_personalized (
-                    email, name, password_hash, created_at
-                )
-                VALUES (%s, %s, %s, NOW())
-                RETURNING id
-            """
-
-            result = execute_query(
-                dell_query,
-                (email, name, password_hash),
-                use_dell_server=True
-            )
-
-            if result:
-                dell_id = result[0][0]
-                logger.info(f"Synced user {email} to Dell server (ID: {dell_id})")
-                return dell_id
-
-        except Exception as e:
-            logger.warning(f"Could not sync to Dell server: {e}")
-            # Continue without Dell sync - graceful degradation
-            return None
-
-    @staticmethod
-    def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
-        """Get user by email using parameterized query"""
-        query = """
-            SELECT id, email, name, password_hash, oauth_provider, oauth_provider_id,
-                   picture_url, email_verified, is_active, dell_server_user_id,
-                   primary_interests, secondary_interests, created_at
-            FROM users
-            WHERE email = %s AND is_active = TRUE
-        """
+    async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
+        """Get user by email, from the profile cache or a parameterized query"""
+        user = user_profile_cache.get_by_email(email)
+        if user is not None:
+            return user
 
-        result = execute_query(query, (email,), use_dell_server=False)
+        generation = user_profile_cache.generation
+        result = await execute_statement(USER_BY_EMAIL_QUERY, (email,), use_dell_server=False)
 
         if result:
             row = result[0]
-            return {
+            user = {
                 "id": row[0],
                 "email": row[1],
                 "name": row[2],
@@ -149,20 +215,15 @@ class UserService:
                 "secondary_interests": row[11],
                 "created_at": row[12]
             }
+            user_profile_cache.put(user, generation)
+            return user
 
         return None
 
     @staticmethod
-    def get_user_by_oauth(provider: str, provider_id: str) -> Optional[Dict[str, Any]]:
+    async def get_user_by_oauth(provider: str, provider_id: str) -> Optional[Dict[str, Any]]:
         """Get user by OAuth provider and ID using parameterized query"""
-        query = """
-            SELECT id, email, name, password_hash, oauth_provider, oauth_provider_id,
-                   picture_url, email_verified, is_active, dell_server_user_id
-            FROM users
-            WHERE oauth_provider = %s AND oauth_provider_id = %s AND is_active = TRUE
-        """
-
-        result = execute_query(query, (provider, provider_id), use_dell_server=False)
+        result = await execute_statement(USER_BY_OAUTH_QUERY, (provider, provider_id), use_dell_server=False)
 
         if result:
             row = result[0]
@@ -182,9 +243,9 @@ class UserService:
         return None
 
     @staticmethod
-    def verify_credentials(email: str, password: str) -> Optional[Dict[str, Any]]:
+    async def verify_credentials(email: str, password: str) -> Optional[Dict[str, Any]]:
         """Verify user credentials"""
-        user = UserService.get_user_by_email(email)
+        user = await UserService.get_user_by_email(email)
 
         if not user:
             return None
@@ -193,20 +254,19 @@ class UserService:
             # OAuth-only user
             return None
 
-        if not verify_password(password, user['password_hash']):
+        if not await password_hasher.verify(password, user['password_hash']):
             return None
 
         # Update last login
-        update_query = "UPDATE users SET last_login_at = NOW() WHERE id = %s"
-        execute_query(update_query, (user['id'],), fetch=False)
+        await execute_statement(UPDATE_LAST_LOGIN_QUERY, (user['id'],), fetch=False)
 
         return user
 
     @staticmethod
-    def update_profile(user_id: int, profile_data: Dict[str, Any]) -> bool:
+    async def update_profile(user_id: int, profile_data: Dict[str, Any]) -> bool:
         """
         Update user profile with parameterized query
-        Also syncs to Dell server
+        Also queues the change for the Dell server
         """
         try:
             # Build update query dynamically but safely
@@ -235,54 +295,21 @@ class UserService:
                 WHERE id = %s
             """
 
-            execute_query(query, tuple(values), fetch=False)
-            logger.info(f"Updated profile for user {user_id}")
+            # Dell sync goes through the outbox, in the same transaction
+            async with get_db_cursor() as cursor:
+                await cursor.execute(query, tuple(values))
+                await enqueue_user_event(
+                    cursor, user_id, PROFILE_UPDATED,
+                    Jsonb({"fields": sorted(update_fields)}),
+                    f"{PROFILE_UPDATED}:{user_id}:{uuid.uuid4()}"
+                )
 
-            # Sync to Dell server if available
-            UserService._sync_profile_to_dell(user_id, update_fields)
+            user_profile_cache.invalidate([user_id])
+            outbox_relay.notify()
+            logger.info(f"Updated profile for user {user_id}")
 
             return True
 
         except Exception as e:
             logger.error(f"Error updating profile: {e}")
             return False
-
-    @staticmethod
-    def _sync_profile_to_dell(user_id: int, profile_data: Dict[str, Any]):
-        """Sync profile updates to Dell server"""
-        try:
-            # Get Dell server user ID
-            query = "SELECT dell_server_user_id FROM users WHERE id = %s"
-            result = execute_query(query, (user_id,), use_dell_server=False)
-
-            if not result or not result[0][0]:
-                return
-
-            dell_user_id = result[0][0]
-
-            # Update on Dell server (with fewer fields)
-            dell_fields = {
-                'name', 'age_range', 'education_level', 'primary_interests',
-                'secondary_interests', 'political_orientation', 'credibility_threshold'
-            }
-
-            update_fields = {k: v for k, v in profile_data.items() if k in dell_fields}
-
-            if not update_fields:
-                return
-
-            set_clause = ", ".join([f"{field} = %s" for field in update_fields.keys()])
-            values = list(update_fields.values())
-            values.append(dell_user_id)
-
-            dell_query = f"""
-                UPDATE users_personalized
-                SET {set_clause}
-                WHERE id = %s
-            """
-
-            execute_query(dell_query, tuple(values), use_dell_server=True, fetch=False)
-            logger.info(f"Synced profile to Dell server for user {user_id}")
-
-        except Exception as e:
-            logger.warning(f"Could not sync profile to Dell server: {e}")
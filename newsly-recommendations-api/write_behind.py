@@ -0,0 +1,159 @@
+"""Write-behind queue for marking recommendations as served
+
+GET /recommendations used to issue an UPDATE for every page it returned.
+Served IDs are now collected here and written with one bulk UPDATE per
+flush interval or batch, off the request path.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+from async_database import execute_query
+from config import settings
+from recommendation_stats import STATS_ADD_SERVED
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ServedMarkQueue:
+    """Collects served recommendation IDs and flushes them in bulk"""
+
+    def __init__(self, flush_interval_seconds: float = 2.0, batch_size: int = 1000, max_pending: int = 100_000):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        # recommendation id -> time it was served
+        self._pending: Dict[int, datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._closing = False
+        # Metrics
+        self.flushed = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def add(self, rec_ids: Iterable[int]):
+        """Queue recommendation IDs to be marked served"""
+        served_at = datetime.now(timezone.utc)
+        for rec_id in rec_ids:
+            if len(self._pending) >= self.max_pending and rec_id not in self._pending:
+                self.dropped += 1
+                continue
+            self._pending[rec_id] = served_at
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write everything still queued"""
+        self._closing = True
+        if self._task:
+            # Let the loop finish its current flush rather than cancelling it
+            # mid-write, after the batch has left _pending
+            self._wakeup.set()
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"Served mark flush loop failed: {e}")
+            self._task = None
+        while self._pending:
+            if not await self.flush():
+                break
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """Write one batch of served marks; returns False if the write failed"""
+        async with self._lock:
+            if not self._pending:
+                return True
+
+            batch = dict(list(self._pending.items())[:self.batch_size])
+            for rec_id in batch:
+                del self._pending[rec_id]
+
+            # Only rows that were not already served count towards served_count
+            query = """
+                WITH batch AS (
+                    SELECT * FROM unnest(%s::int[], %s::timestamptz[]) AS s(id, served_at)
+                ),
+                prev AS (
+                    SELECT r.id, r.served AS was_served
+                    FROM user_recommendations r
+                    JOIN batch b ON b.id = r.id
+                    ORDER BY r.id
+                    FOR UPDATE OF r
+                ),
+                marked AS (
+                    UPDATE user_recommendations r
+                    SET served = TRUE, served_at = b.served_at
+                    FROM batch b, prev p
+                    WHERE r.id = b.id AND p.id = r.id
+                    RETURNING r.user_id, p.was_served
+                ),
+                transitions AS (
+                    SELECT user_id FROM marked WHERE was_served IS NOT TRUE
+                )
+            """ + STATS_ADD_SERVED
+            start = time.perf_counter()
+            written = False
+            try:
+                await execute_query(query, (list(batch.keys()), list(batch.values())), fetch=False)
+                written = True
+            except Exception as e:
+                logger.error(f"Error flushing {len(batch)} served marks: {e}")
+                return False
+            finally:
+                if not written:
+                    # Put the batch back unless newer marks replaced it; this
+                    # also runs when the flush is cancelled
+                    for rec_id, served_at in batch.items():
+                        self._pending.setdefault(rec_id, served_at)
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.flushed += len(batch)
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+            return True
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "dropped": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+
+served_queue = ServedMarkQueue(
+    flush_interval_seconds=settings.SERVED_FLUSH_INTERVAL_SECONDS,
+    batch_size=settings.SERVED_FLUSH_BATCH_SIZE
+)